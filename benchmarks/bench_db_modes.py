@@ -0,0 +1,104 @@
+"""
+Benchmark: member-service concurrent-request throughput with the sync
+database engine (every request holds a threadpool slot) versus the opt-in
+async engine (DATABASE_ASYNC=true, asyncpg).
+
+Two copies of member-service are loaded in-process against the same
+temporary PostgreSQL database (from the optional `pgserver` package), one
+per mode, and driven directly through httpx.ASGITransport with a mix of
+GET /members/{id} and GET /members/?limit=20.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_db_modes.py --seconds 5 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+from load_harness import load_service, percentile, postgres_databases, sqlite_databases
+
+
+def load_modes(database_url):
+    mains = {}
+    for mode in ("sync", "async"):
+        os.environ["DATABASE_ASYNC"] = "true" if mode == "async" else "false"
+        mains[mode] = load_service(f"member_{mode}", "member-service", database_url)
+    logging.getLogger().setLevel(logging.WARNING)
+    return mains
+
+
+async def run_mode(main, seconds, concurrency):
+    from shared.auth import create_access_token
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'johndoe'})}"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://member-service", timeout=None) as client:
+        member_ids = [member["id"] for member in (await client.get("/members/", headers=headers)).json()]
+        deadline = time.perf_counter() + seconds
+        latencies = []
+        errors = 0
+
+        async def worker(n):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                n += 1
+                path = f"/members/{member_ids[n % len(member_ids)]}" if n % 2 else "/members/?limit=20"
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--database", choices=["postgres", "sqlite"], default="postgres",
+                        help="sqlite uses aiosqlite in async mode")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-db-modes-")
+    server = None
+    try:
+        server, databases = postgres_databases(workdir) if args.database == "postgres" else sqlite_databases(workdir)
+        mains = load_modes(databases["member"])
+        result = {
+            mode: asyncio.run(run_mode(main, args.seconds, args.concurrency))
+            for mode, main in mains.items()
+        }
+    finally:
+        if server is not None:
+            server.cleanup()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result.update(database=args.database, concurrency=args.concurrency)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: member-service login throughput, and the latency of an unrelated
+endpoint (GET /members/{id}) while a storm of logins is running.
+
+Runs member-service in-process against a temporary SQLite database. The
+"inline" mode reproduces the previous behaviour, where bcrypt ran directly on
+the event loop; "pool" uses the bounded password hashing pool.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_login_storm.py --seconds 5 --login-concurrency 16
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "member-service", "app")
+
+
+def load_member_service(database_url):
+    os.environ["DATABASE_URL"] = database_url
+    package = types.ModuleType("member_app")
+    package.__path__ = [SERVICE_DIR]
+    sys.modules["member_app"] = package
+    return importlib.import_module("member_app.main"), importlib.import_module("member_app.passwords")
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+async def run_mode(main, seconds, login_concurrency):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://member-service") as client:
+        login = {"username": "johndoe", "password": "testpassword123"}
+        token = (await client.post("/token", data=login)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        member_id = (await client.get("/members/", headers=headers)).json()[0]["id"]
+
+        deadline = time.perf_counter() + seconds
+        logins = 0
+        probe_latencies = []
+
+        async def login_worker():
+            nonlocal logins
+            while time.perf_counter() < deadline:
+                response = await client.post("/token", data=login)
+                if response.status_code == 200:
+                    logins += 1
+
+        async def probe_worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get(f"/members/{member_id}", headers=headers)
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(login_concurrency)), probe_worker())
+        elapsed = time.perf_counter() - started
+
+    return {
+        "logins_per_second": round(logins / elapsed, 1),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": percentile(probe_latencies, 50),
+        "probe_p99_ms": percentile(probe_latencies, 99),
+        "probe_mean_ms": round(statistics.mean(probe_latencies) * 1000, 2) if probe_latencies else None,
+    }
+
+
+async def run(seconds, login_concurrency):
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    main, passwords = load_member_service(f"sqlite:///{database.name}")
+    pooled_verify = passwords.verify_password
+
+    async def inline_verify(password, hashed_password):
+        return passwords.pwd_context.verify(password, hashed_password)
+
+    try:
+        passwords.verify_password = inline_verify
+        inline = await run_mode(main, seconds, login_concurrency)
+        passwords.verify_password = pooled_verify
+        pooled = await run_mode(main, seconds, login_concurrency)
+    finally:
+        os.unlink(database.name)
+    return {"inline": inline, "pool": pooled, "workers": passwords.PASSWORD_HASH_WORKERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    result = asyncio.run(run(args.seconds, args.login_concurrency))
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: gateway throughput with a fresh httpx client per request versus the
+pooled, long-lived upstream clients created in the gateway lifespan.
+
+A stub member-service is served by uvicorn on a local TCP port so connection
+setup is real. The gateway is driven in-process through httpx.ASGITransport.
+
+Usage:
+    PYTHONPATH=.:gateway-service python benchmarks/bench_upstream_pool.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_stub_upstream(port):
+    stub = FastAPI()
+    payload = [{"id": i, "login": f"member{i}", "first_name": "Bench"} for i in range(20)]
+
+    @stub.get("/members/")
+    async def members():
+        return payload
+
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def _drive(gateway_app, total, concurrency):
+    transport = httpx.ASGITransport(app=gateway_app)
+    headers = {"Authorization": "Bearer benchmark-token"}
+    remaining = iter(range(total))
+    errors = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                response = await client.get("/members/", headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {"requests": total, "errors": errors, "seconds": round(elapsed, 3), "rps": round(total / elapsed, 1)}
+
+
+async def run(total, concurrency):
+    from app import upstream
+    from app.main import app as gateway_app
+
+    # Without the lifespan every request builds (and tears down) its own client
+    per_request = await _drive(gateway_app, total, concurrency)
+
+    await upstream.startup()
+    try:
+        pooled = await _drive(gateway_app, total, concurrency)
+    finally:
+        await upstream.shutdown()
+
+    return {
+        "per_request_client": per_request,
+        "pooled_client": pooled,
+        "speedup": round(pooled["rps"] / per_request["rps"], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    port = _free_port()
+    os.environ["MEMBER_SERVICE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["FEEDBACK_SERVICE_URL"] = f"http://127.0.0.1:{port}"
+    server = _start_stub_upstream(port)
+    try:
+        result = asyncio.run(run(args.requests, args.concurrency))
+    finally:
+        server.should_exit = True
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
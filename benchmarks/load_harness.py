@@ -0,0 +1,283 @@
+"""
+Offline load harness: drives the gateway against member-service and
+feedback-service running in-process, with no Docker or network services.
+
+Both services are imported under their own package names and bound to a
+temporary database (SQLite by default, or a throwaway PostgreSQL cluster from
+the optional `pgserver` package with --database postgres). The gateway's
+upstream clients are routed to them through httpx.ASGITransport, so every
+request goes through the real gateway and service code.
+
+Each profile runs for a fixed time with a fixed number of concurrent workers
+and reports throughput, error count and p50/p95/p99 latency as JSON. Pass a
+previous result with --baseline to fail (exit code 1) when a profile's p95
+latency or throughput regresses by more than --tolerance.
+
+Usage:
+    PYTHONPATH=.:gateway-service python benchmarks/load_harness.py --profiles login-storm,list-reads,bulk-writes
+    PYTHONPATH=.:gateway-service python benchmarks/load_harness.py --output current.json --baseline previous.json
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+import uuid
+from collections import Counter, defaultdict
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("MEMBER_SERVICE_URL", "http://member-service")
+os.environ.setdefault("FEEDBACK_SERVICE_URL", "http://feedback-service")
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEEDED_LOGIN = {"username": "johndoe", "password": "testpassword123"}
+BULK_IMPORT_ROWS = 20  # members per POST /members/bulk request
+
+
+def load_service(package_name, service_dir, database_url):
+    """Import a service's app package under package_name, bound to database_url."""
+    os.environ["DATABASE_URL"] = database_url
+    package = types.ModuleType(package_name)
+    package.__path__ = [os.path.join(ROOT_DIR, service_dir, "app")]
+    sys.modules[package_name] = package
+    return importlib.import_module(f"{package_name}.main")
+
+
+def sqlite_databases(workdir):
+    return None, {
+        "member": f"sqlite:///{os.path.join(workdir, 'member.db')}",
+        "feedback": f"sqlite:///{os.path.join(workdir, 'feedback.db')}",
+    }
+
+
+def postgres_databases(workdir):
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--database postgres needs the pgserver package (pip install pgserver)")
+    server = pgserver.get_server(os.path.join(workdir, "pgdata"), cleanup_mode="stop")
+    for name in ("member_db", "feedback_db"):
+        server.psql(f"CREATE DATABASE {name};")
+    return server, {"member": server.get_uri("member_db"), "feedback": server.get_uri("feedback_db")}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+def summarize(latencies, statuses, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+# Each profile is a cycle of (operation name, request builder) pairs
+async def login(client, auth, n):
+    return await client.post("/token", data=SEEDED_LOGIN)
+
+
+async def list_members(client, auth, n):
+    return await client.get("/members/", headers=auth)
+
+
+async def get_member(client, auth, n):
+    # Seeded members have ids 1-4; concurrent lookups are batched by the gateway
+    return await client.get(f"/members/{1 + n % 4}", headers=auth)
+
+
+async def list_feedback(client, auth, n):
+    return await client.get("/feedback/", headers=auth)
+
+
+async def overview(client, auth, n):
+    return await client.get("/overview", headers=auth)
+
+
+async def create_member(client, auth, n):
+    suffix = f"{uuid.uuid4().hex[:8]}{n}"
+    return await client.post("/members/", headers=auth, json={
+        "first_name": "Load",
+        "last_name": "Test",
+        "login": f"load{suffix}",
+        "email": f"load.{suffix}@example.com",
+        "password": "testpassword123",
+    })
+
+
+async def bulk_import_members(client, auth, n):
+    suffix = f"{uuid.uuid4().hex[:8]}{n}"
+    body = "".join(
+        json.dumps({
+            "first_name": "Bulk",
+            "last_name": "Test",
+            "login": f"bulk{suffix}x{i}",
+            "email": f"bulk.{suffix}.{i}@example.com",
+            "password": "testpassword123",
+        }) + "\n"
+        for i in range(BULK_IMPORT_ROWS)
+    )
+    return await client.post(
+        "/members/bulk", headers={**auth, "Content-Type": "application/x-ndjson"}, content=body
+    )
+
+
+async def create_feedback(client, auth, n):
+    return await client.post("/feedback/", headers=auth, json={"feedback": f"Load test feedback number {n}"})
+
+
+PROFILES = {
+    "login-storm": [("POST /token", login)],
+    "list-reads": [
+        ("GET /members/", list_members),
+        ("GET /members/{id}", get_member),
+        ("GET /feedback/", list_feedback),
+        ("GET /overview", overview),
+    ],
+    "bulk-writes": [
+        ("POST /members/", create_member),
+        ("POST /members/bulk", bulk_import_members),
+        ("POST /feedback/", create_feedback),
+    ],
+}
+
+
+async def run_profile(client, auth, operations, seconds, concurrency):
+    deadline = time.perf_counter() + seconds
+    counter = itertools.count()
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            name, send = operations[n % len(operations)]
+            started = time.perf_counter()
+            response = await send(client, auth, n)
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(
+        [sample for samples in latencies.values() for sample in samples],
+        sum(statuses.values(), Counter()),
+        elapsed,
+    )
+    result["operations"] = {name: summarize(latencies[name], statuses[name], elapsed) for name, _ in operations}
+    return result
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("profiles", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {result['throughput_rps']} rps")
+    return regressions
+
+
+async def run(args, databases):
+    load_service("member_app", "member-service", databases["member"])
+    load_service("feedback_app", "feedback-service", databases["feedback"])
+    logging.getLogger().setLevel(args.log_level)
+
+    from app import upstream
+    from app.main import app as gateway_app
+    await upstream.startup({
+        upstream.MEMBER_SERVICE: httpx.ASGITransport(app=sys.modules["member_app.main"].app),
+        upstream.FEEDBACK_SERVICE: httpx.ASGITransport(app=sys.modules["feedback_app.main"].app),
+    })
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=gateway_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+            token = (await client.post("/token", data=SEEDED_LOGIN)).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+            for name in args.profiles:
+                results[name] = await run_profile(client, auth, PROFILES[name], args.seconds, args.concurrency)
+    finally:
+        await upstream.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default=",".join(PROFILES),
+                        help=f"comma separated profiles to run: {', '.join(PROFILES)}")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each profile")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent workers per profile")
+    parser.add_argument("--database", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the gateway rate limiter enabled")
+    parser.add_argument("--no-cache", action="store_true", help="disable the gateway response cache")
+    parser.add_argument("--output", help="also write the result to this file")
+    parser.add_argument("--baseline", help="previous result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    args.profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    unknown = [name for name in args.profiles if name not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+
+    # Gateway settings are read at import time
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if args.rate_limit else "false"
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    workdir = tempfile.mkdtemp(prefix="load-harness-")
+    server = None
+    try:
+        server, databases = postgres_databases(workdir) if args.database == "postgres" else sqlite_databases(workdir)
+        profiles = asyncio.run(run(args, databases))
+    finally:
+        if server is not None:
+            server.cleanup()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "database": args.database,
+        "seconds": args.seconds,
+        "concurrency": args.concurrency,
+        "profiles": profiles,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["regressions"] = find_regressions(profiles, json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if result.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
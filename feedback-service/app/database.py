@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 import os
 
 POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
@@ -6,22 +7,57 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "feedback_db")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "feedback-db")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from shared.database import AsyncDatabase, PoolMetrics, ThreadpoolDatabase, async_database_url, engine_options
+from shared.deadline import apply_statement_timeout
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Pool wait times and connection events, by engine, for /internal/metrics
+pool_metrics = {"sync": PoolMetrics()}
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL, pool_metrics["sync"]))
+pool_metrics["sync"].listen(engine)
+apply_statement_timeout(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# Opt-in async engine (asyncpg for PostgreSQL). Startup tasks such as table
+# creation and seeding always use the sync engine above.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+
+if DATABASE_ASYNC:
+    pool_metrics["async"] = PoolMetrics()
+    async_engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL),
+        **engine_options(SQLALCHEMY_DATABASE_URL, pool_metrics["async"], is_async=True)
+    )
+    pool_metrics["async"].listen(async_engine.sync_engine)
+    apply_statement_timeout(async_engine.sync_engine)
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+async def get_db():
+    if DATABASE_ASYNC:
+        async with AsyncSessionLocal() as session:
+            yield AsyncDatabase(session)
+        return
+    db = ThreadpoolDatabase(SessionLocal())
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+# get_db for code that runs outside a request's dependencies, such as the body
+# of a streaming response
+session_scope = asynccontextmanager(get_db)
 
-Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+Base.metadata.create_all(bind=engine) 
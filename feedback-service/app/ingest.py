@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple
+import asyncio
+import logging
+import os
+from shared.deadline import request_deadline
+from shared.error_handling import DatabaseError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: queue accepted feedback and insert it in batches instead of one
+# transaction per request
+FEEDBACK_WRITE_BEHIND = os.getenv("FEEDBACK_WRITE_BEHIND", "false").lower() == "true"
+FEEDBACK_INGEST_QUEUE_SIZE = int(os.getenv("FEEDBACK_INGEST_QUEUE_SIZE", "10000"))
+FEEDBACK_INGEST_BATCH_SIZE = int(os.getenv("FEEDBACK_INGEST_BATCH_SIZE", "500"))
+# Seconds a batch waits for more rows after its first one
+FEEDBACK_INGEST_FLUSH_INTERVAL = float(os.getenv("FEEDBACK_INGEST_FLUSH_INTERVAL", "0.01"))
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of rows waiting to be inserted. A background task takes up
+    to batch_size rows at a time, as soon as that many are waiting or
+    `interval` seconds after the first one arrived, and hands them to
+    write_batch, which inserts them in one transaction and returns the stored
+    rows in the same order. Each submit() resolves to its stored row once
+    that transaction commits. When the queue is full, submit() is rejected
+    rather than waiting; close() stops intake and flushes what is queued.
+    """
+
+    def __init__(self, write_batch: Callable[[List[dict]], Awaitable[List[Any]]],
+                 max_size: int, batch_size: int, interval: float):
+        self.write_batch = write_batch
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending: Deque[Tuple[dict, asyncio.Future]] = deque()
+        # Created with the flusher, on the loop that serves requests
+        self._arrived: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.closed = False
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+
+    async def submit(self, values: dict) -> Any:
+        if self.closed:
+            raise RateLimitError("Feedback intake is shutting down, try again later", {"retry_after": 1})
+        if len(self._pending) >= self.max_size:
+            self.rejected += 1
+            raise RateLimitError("Feedback intake queue is full, try again later",
+                                 {"queue_size": self.max_size, "retry_after": 1})
+        if self._flusher is None:
+            self._arrived, self._full = asyncio.Event(), asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((values, future))
+        self.accepted += 1
+        self._arrived.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        # Accepted rows are written even if their caller goes away
+        return await asyncio.shield(future)
+
+    async def _flush_loop(self):
+        # Started by the first request, but serves all of them
+        request_deadline.set(None)
+        while self._pending or not self.closed:
+            if not self._pending:
+                self._arrived.clear()
+                await self._arrived.wait()
+                continue
+            if len(self._pending) < self.batch_size and not self.closed:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if len(self._pending) < self.batch_size:
+                self._full.clear()
+            # One batch at a time, in arrival order
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            rows = await self.write_batch([values for values, _ in batch])
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write a batch of {len(batch)} feedbacks: {str(e)}")
+            error = e if isinstance(e, DatabaseError) else DatabaseError("Failed to create feedback", {"error": str(e)})
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.batches += 1
+        self.rows += len(rows)
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+    async def close(self):
+        """Reject new rows, then return once every queued one has been written."""
+        self.closed = True
+        if self._flusher is None:
+            return
+        self._arrived.set()
+        self._full.set()
+        await self._flusher
+        logger.info(f"Feedback intake drained after {self.rows} rows in {self.batches} batches")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FEEDBACK_WRITE_BEHIND,
+            "queued": len(self._pending),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+        }
@@ -1,10 +1,14 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, database
+from typing import AsyncIterator, List, Literal, Optional
+from . import models, schemas, database, search, ingest, stats, partitions
 from .database import engine
+import asyncio
+import json
+import os
 import time
-from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy import exists, select
+from sqlalchemy.exc import OperationalError, IntegrityError, SQLAlchemyError
 from shared.error_handling import (
     ServiceException,
     ValidationError,
@@ -15,11 +19,18 @@ from shared.error_handling import (
     DatabaseError,
     ErrorCode
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_core import to_jsonable_python
 from .seed import seed_feedback
 import logging
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from shared.database import Database
+from shared.deadline import DeadlineMiddleware
+from shared import jobs
+from shared.fields import columns, parse_fields, project, projected_response
+from shared.pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from shared.auth import (
     Token, User, create_access_token, verify_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
@@ -36,12 +47,28 @@ def init_db():
         try:
             logger.info("Attempting to create database tables...")
             models.Base.metadata.create_all(bind=engine)
+            search.create_search_index(engine)
+            # create_all skips indexes of tables that already exist
+            for index in models.Feedback.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
+            stats.create_stats_triggers(engine)
+            # Partitions for the coming months, before anything is inserted;
+            # the rest of the maintenance runs in the background
+            partitions.ensure_partitions(engine)
             logger.info("Database tables created successfully")
             
             # Seed the database
             logger.info("Starting database seeding...")
             seed_feedback()
             logger.info("Database seeding completed")
+
+            db = database.SessionLocal()
+            try:
+                interrupted = jobs.fail_interrupted_jobs(db, models.Job)
+                if interrupted:
+                    logger.warning(f"Marked {interrupted} interrupted jobs as failed")
+            finally:
+                db.close()
             return
         except OperationalError as e:
             if attempt == max_retries - 1:
@@ -54,6 +81,9 @@ def init_db():
 logger.info("Initializing database...")
 init_db()
 logger.info("Database initialization completed")
+if database.DATABASE_ASYNC:
+    # Requests use the async engine; release the sync engine's connections
+    engine.dispose()
 
 app = FastAPI(
     title="Feedback Service",
@@ -71,6 +101,9 @@ app = FastAPI(
     ]
 )
 
+# Give up on requests the gateway has stopped waiting for
+app.add_middleware(DeadlineMiddleware)
+
 # Configure OAuth2 with password flow
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="token",
@@ -78,23 +111,77 @@ oauth2_scheme = OAuth2PasswordBearer(
     auto_error=True
 )
 
+maintenance_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_maintenance():
+    global maintenance_task
+    if partitions.FEEDBACK_MAINTENANCE_INTERVAL_HOURS > 0:
+        maintenance_task = asyncio.ensure_future(
+            partitions.run_periodically(partitions.FEEDBACK_MAINTENANCE_INTERVAL_HOURS)
+        )
+
+@app.on_event("shutdown")
+async def close_database():
+    if maintenance_task:
+        maintenance_task.cancel()
+    # Queued feedback is written before the connections go away
+    await feedback_writer.close()
+    # Pooled connections (and aiosqlite's worker threads) would outlive the app
+    if database.DATABASE_ASYNC:
+        await database.async_engine.dispose()
+    engine.dispose()
+
+@app.get("/jobs/{job_id}", tags=["jobs"])
+async def get_job(
+    job_id: str,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    return await db.run(_get_job, job_id)
+
+def _get_job(db: Session, job_id: str):
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise NotFoundError(f"Job {job_id} not found", {"service": "feedback-service"})
+    return jobs.job_status(job)
+
+@app.get("/internal/metrics", tags=["internal"])
+async def get_metrics():
+    return {
+        "database": {name: metrics.stats() for name, metrics in database.pool_metrics.items()},
+        "ingest": feedback_writer.stats(),
+    }
+
+# HTTP status for service error codes other than 400. Shedding load with a
+# 4xx keeps the gateway's circuit breaker closed for feedback reads.
+ERROR_STATUS_CODES = {
+    ErrorCode.RATE_LIMIT_ERROR: status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
 @app.exception_handler(ServiceException)
 async def service_exception_handler(request, exc: ServiceException):
+    headers = {}
+    if "retry_after" in exc.details:
+        headers["Retry-After"] = str(max(1, round(exc.details["retry_after"])))
     return JSONResponse(
-        status_code=400,
+        status_code=ERROR_STATUS_CODES.get(exc.error_code, status.HTTP_400_BAD_REQUEST),
         content={
             "error_code": exc.error_code.value if isinstance(exc.error_code, ErrorCode) else exc.error_code,
             "message": exc.message,
             "details": exc.details
-        }
+        },
+        headers=headers
     )
 
 @app.post("/token", response_model=Token, tags=["authentication"])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(database.get_db)
+    db: Database = Depends(database.get_db)
 ):
-    member = db.query(models.Member).filter(models.Member.login == form_data.username).first()
+    member = await db.run(
+        lambda session: session.query(models.Member).filter(models.Member.login == form_data.username).first()
+    )
     if not member:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -109,11 +196,17 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/feedback/", response_model=schemas.Feedback, tags=["feedback"])
-def create_feedback(
+async def create_feedback(
     feedback: schemas.FeedbackCreate,
-    db: Session = Depends(database.get_db),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    if ingest.FEEDBACK_WRITE_BEHIND:
+        # Resolves once the batch holding this feedback has been committed
+        return await feedback_writer.submit(feedback.dict())
+    return await db.run(_create_feedback, feedback)
+
+def _create_feedback(db: Session, feedback: schemas.FeedbackCreate):
     try:
         db_feedback = models.Feedback(**feedback.dict())
         db.add(db_feedback)
@@ -126,48 +219,179 @@ def create_feedback(
             raise e
         raise DatabaseError("Failed to create feedback", {"error": str(e)})
 
+def _insert_feedbacks(db: Session, rows: List[dict]) -> List[dict]:
+    """Insert rows in one transaction and return them as stored, in the same order."""
+    try:
+        feedbacks = [models.Feedback(**row) for row in rows]
+        db.add_all(feedbacks)
+        # The ORM batches these INSERTs, with RETURNING for the ids where the driver allows
+        db.flush()
+        ids = [feedback.id for feedback in feedbacks]
+        db.commit()
+        # Read the server defaults back with one query instead of a refresh per row
+        stored = {
+            row.id: project(row, FEEDBACK_FIELDS)
+            for row in db.query(*columns(models.Feedback, FEEDBACK_FIELDS)).filter(models.Feedback.id.in_(ids))
+        }
+        return [stored[id] for id in ids]
+    except Exception as e:
+        db.rollback()
+        raise DatabaseError("Failed to create feedback", {"error": str(e)})
+
+async def _write_feedbacks(rows: List[dict]) -> List[dict]:
+    async with database.session_scope() as db:
+        return await db.run(_insert_feedbacks, rows)
+
+feedback_writer = ingest.WriteBehindQueue(
+    _write_feedbacks,
+    max_size=ingest.FEEDBACK_INGEST_QUEUE_SIZE,
+    batch_size=ingest.FEEDBACK_INGEST_BATCH_SIZE,
+    interval=ingest.FEEDBACK_INGEST_FLUSH_INTERVAL,
+)
+
+# Fields that can be requested with fields=
+FEEDBACK_FIELDS = list(schemas.Feedback.model_fields)
+# Rows fetched from the server-side cursor at a time by ?stream=true
+FEEDBACK_STREAM_CHUNK_SIZE = int(os.getenv("FEEDBACK_STREAM_CHUNK_SIZE", "500"))
+
 @app.get("/feedback/", response_model=List[schemas.Feedback], tags=["feedback"])
-def get_feedbacks(
-    db: Session = Depends(database.get_db),
+async def get_feedbacks(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description=f"Comma-separated fields to return, out of: {', '.join(FEEDBACK_FIELDS)}"),
+    stream: bool = Query(False, description="Return every active feedback as NDJSON, one object per line, ignoring limit and cursor"),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    selected = parse_fields(fields, FEEDBACK_FIELDS)
+    if stream:
+        return StreamingResponse(_stream_feedbacks(selected or FEEDBACK_FIELDS), media_type="application/x-ndjson")
+    feedbacks, next_cursor = await db.run(_get_feedbacks, limit, cursor, selected)
+    headers = {}
+    if next_cursor:
+        link = f"/feedback/?limit={limit}&cursor={next_cursor}" + (f"&fields={','.join(selected)}" if selected else "")
+        headers = {"X-Next-Cursor": next_cursor, "Link": f'<{link}>; rel="next"'}
+    if selected:
+        return projected_response([project(feedback, selected) for feedback in feedbacks], headers=headers)
+    response.headers.update(headers)
+    return feedbacks
+
+def _get_feedbacks(db: Session, limit: int, cursor: Optional[str], selected: Optional[List[str]]):
     try:
-        feedbacks = db.query(models.Feedback)\
-            .filter(models.Feedback.is_deleted == False)\
-            .order_by(models.Feedback.created_at.desc())\
-            .all()
-            
-        if not feedbacks:
+        query = db.query(models.Feedback)
+        if selected:
+            # Only the requested columns, plus the ones the page cursor is built from
+            query = query.with_entities(*columns(models.Feedback, selected, "created_at", "id"))
+        feedbacks, next_cursor = keyset_page(
+            query.filter(models.Feedback.is_deleted == False),
+            models.Feedback.created_at, models.Feedback.id, cursor, limit
+        )
+
+        if not feedbacks and not cursor:
             raise NoDataFoundError(
                 "No active feedbacks found",
                 {"service": "feedback-service"}
             )
-            
-        return feedbacks
+
+        return feedbacks, next_cursor
     except Exception as e:
         if isinstance(e, ServiceException):
             raise e
         raise DatabaseError("Failed to fetch feedbacks", {"error": str(e)})
 
-@app.delete("/feedback/", tags=["feedback"])
-def delete_feedbacks(
-    db: Session = Depends(database.get_db),
+async def _stream_feedbacks(selected: List[str]) -> AsyncIterator[bytes]:
+    """
+    Every active feedback, newest first, as NDJSON. Rows come from a
+    server-side cursor a chunk at a time and are serialized straight from the
+    selected columns, so memory use does not grow with the table. The response
+    has started by the time a database error can occur, so it ends the stream
+    early instead of turning into an error response.
+    """
+    statement = select(*columns(models.Feedback, selected))\
+        .where(models.Feedback.is_deleted == False)\
+        .order_by(models.Feedback.created_at.desc(), models.Feedback.id.desc())
+    # The request's own session is not guaranteed to outlive the handler
+    async with database.session_scope() as db:
+        try:
+            async for rows in db.stream(statement, FEEDBACK_STREAM_CHUNK_SIZE):
+                yield "".join(
+                    json.dumps(to_jsonable_python(dict(row._mapping)), separators=(",", ":")) + "\n" for row in rows
+                ).encode()
+        except Exception as e:
+            logger.error(f"Feedback stream aborted: {str(e)}")
+            raise
+
+@app.get("/feedback/search", response_model=List[schemas.Feedback], tags=["feedback"])
+async def search_feedbacks(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for; \"quoted phrases\", -excluded and or are supported on PostgreSQL"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    created_from: Optional[datetime] = Query(None, description="Only feedback created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only feedback created before this time"),
+    fields: Optional[str] = Query(None, description=f"Comma-separated fields to return, out of: {', '.join(FEEDBACK_FIELDS)}"),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    """Full-text search of active feedback, best matches first."""
+    selected = parse_fields(fields, FEEDBACK_FIELDS)
     try:
-        active_feedbacks = db.query(models.Feedback)\
-            .filter(models.Feedback.is_deleted == False)\
-            .count()
-            
-        if active_feedbacks == 0:
+        feedbacks, has_more = await db.run(
+            search.search_feedbacks, q, limit, offset, created_from, created_to, selected
+        )
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to search feedbacks", {"error": str(e)})
+    headers = {}
+    if has_more:
+        params = {"q": q, "limit": limit, "offset": offset + limit}
+        params.update({
+            name: value.isoformat()
+            for name, value in (("created_from", created_from), ("created_to", created_to)) if value
+        })
+        if selected:
+            params["fields"] = ",".join(selected)
+        headers["Link"] = f'</feedback/search?{urlencode(params)}>; rel="next"'
+    if selected:
+        return projected_response([project(feedback, selected) for feedback in feedbacks], headers=headers)
+    response.headers.update(headers)
+    return feedbacks
+
+@app.get("/feedback/stats", response_model=schemas.FeedbackStats, tags=["feedback"])
+async def get_feedback_stats(
+    interval: Literal["hour", "day"] = Query("day", description="Bucket size, in UTC"),
+    created_from: Optional[datetime] = Query(None, description="First hour to include (rounded down to the hour)"),
+    created_to: Optional[datetime] = Query(None, description="Only hours starting before this time"),
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    """Created, active and deleted feedback counts per hour or day, from the statistics rollups."""
+    try:
+        return await db.run(stats.feedback_stats, interval, created_from, created_to)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch feedback statistics", {"error": str(e)})
+
+@app.delete("/feedback/", tags=["feedback"], status_code=202)
+async def delete_feedbacks(
+    response: Response,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    """Soft delete all feedbacks in a background job; its progress is at GET /jobs/{job_id}."""
+    job_id = await db.run(_delete_feedbacks)
+    jobs.start_soft_delete(database.SessionLocal, models.Job, job_id, models.Feedback)
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"message": "Soft delete of all feedbacks started", "job_id": job_id, "status": jobs.PENDING}
+
+def _delete_feedbacks(db: Session) -> str:
+    try:
+        if not db.query(exists().where(models.Feedback.is_deleted == False)).scalar():
             raise NoDataFoundError(
                 "No active feedbacks found to delete",
                 {"service": "feedback-service"}
             )
-            
-        db.query(models.Feedback).update({"is_deleted": True})
-        db.commit()
-        return {"message": "All feedbacks have been soft deleted"}
+
+        return jobs.create_job(db, models.Job, "delete_feedbacks")
     except Exception as e:
         db.rollback()
         if isinstance(e, ServiceException):
@@ -175,11 +399,14 @@ def delete_feedbacks(
         raise DatabaseError("Failed to delete feedbacks", {"error": str(e)})
 
 @app.delete("/feedback/{feedback_id}", tags=["feedback"])
-def delete_feedback(
+async def delete_feedback(
     feedback_id: int,
-    db: Session = Depends(database.get_db),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    return await db.run(_delete_feedback, feedback_id)
+
+def _delete_feedback(db: Session, feedback_id: int):
     try:
         feedback = db.query(models.Feedback)\
             .filter(models.Feedback.id == feedback_id, models.Feedback.is_deleted == False)\
@@ -201,7 +428,10 @@ def delete_feedback(
         raise DatabaseError("Failed to delete feedback", {"error": str(e)})
 
 @app.delete("/internal/feedback/{feedback_id}/hard", response_model=dict)
-def hard_delete_feedback(feedback_id: int, db: Session = Depends(database.get_db)):
+async def hard_delete_feedback(feedback_id: int, db: Database = Depends(database.get_db)):
+    return await db.run(_hard_delete_feedback, feedback_id)
+
+def _hard_delete_feedback(db: Session, feedback_id: int):
     feedback = db.query(models.Feedback).filter(models.Feedback.id == feedback_id).first()
     if not feedback:
         raise HTTPException(status_code=404, detail="Feedback not found")
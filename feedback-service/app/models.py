@@ -1,12 +1,62 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Computed, Integer, String, Boolean, DateTime, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
-from .database import Base
+from shared.jobs import JobMixin
+from .database import Base, engine
+
+# Text search configuration of search_vector and of the queries against it
+TEXT_SEARCH_CONFIG = "english"
+
+# On PostgreSQL, feedbacks is range partitioned by created_at month (see
+# partitions.py); the partition key has to be part of the primary key
+PARTITIONED = engine.dialect.name == "postgresql"
 
 class Feedback(Base):
     __tablename__ = "feedbacks"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     feedback = Column(String, nullable=False)
     is_deleted = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=PARTITIONED)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    if engine.dialect.name == "postgresql":
+        # Full-text search document, maintained by PostgreSQL. SQLite uses the
+        # feedbacks_fts table instead (see search.py). Deferred, so that only
+        # search queries read it.
+        search_vector = deferred(Column(TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', feedback)", persisted=True)))
+
+    __table_args__ = (
+        # Serves the keyset pagination and streaming of active feedback, newest
+        # first; soft-deleted rows are left out of the index entirely
+        Index(
+            "ix_feedbacks_active_created_at_id", created_at.desc(), id.desc(),
+            postgresql_where=(is_deleted == False), sqlite_where=(is_deleted == False)
+        ),
+        # Lets the statistics rebuild recount one time window at a time
+        Index("ix_feedbacks_created_at", created_at),
+        {"postgresql_partition_by": "RANGE (created_at)"} if PARTITIONED else {},
+    )
+    # ids come from one sequence and stay unique, so they identify rows on their own
+    __mapper_args__ = {"primary_key": [id]}
+
+if engine.dialect.name == "postgresql":
+    Index("ix_feedbacks_search_vector", Feedback.search_vector, postgresql_using="gin")
+
+class FeedbackStatsHourly(Base):
+    """
+    Feedback counts by the UTC hour it was created in, kept up to date by
+    database triggers on feedbacks (see stats.py). Active = created - deleted.
+    Purged counts the feedback since removed by the retention purge, which
+    stays in created and deleted.
+    """
+    __tablename__ = "feedback_stats_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+    purged = Column(Integer, nullable=False, default=0, server_default="0")
+
+class Job(JobMixin, Base):
+    """Background jobs such as bulk soft deletes, polled through GET /jobs/{id}."""
@@ -0,0 +1,233 @@
+"""
+Monthly partitions and retention of the feedbacks table.
+
+On PostgreSQL, feedbacks is range partitioned by created_at month, with one
+partition per month (feedbacks_pYYYY_MM) and a default partition for rows
+outside of them. Maintenance creates the partitions of the coming months,
+purges soft-deleted feedback older than the retention period (when one is
+set), and drops old partitions left empty. The service creates partitions at
+startup and runs the whole maintenance in the background; it can also be run
+by hand:
+
+    python -m app.partitions maintain
+
+A feedbacks table created before partitioning keeps working unpartitioned
+until it is converted, in one transaction, with:
+
+    python -m app.partitions migrate
+"""
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+import anyio
+import argparse
+import asyncio
+import logging
+import os
+from shared.jobs import JOB_CHUNK_SIZE
+from . import database, models, stats
+
+logger = logging.getLogger(__name__)
+
+# Months after the current one that always have a partition
+FEEDBACK_PARTITION_MONTHS_AHEAD = int(os.getenv("FEEDBACK_PARTITION_MONTHS_AHEAD", "3"))
+# Opt-in: soft-deleted feedback is purged once its whole month is this many
+# months old; 0 keeps it forever
+FEEDBACK_RETENTION_MONTHS = int(os.getenv("FEEDBACK_RETENTION_MONTHS", "0"))
+# Hours between background maintenance runs in the service; 0 disables them
+FEEDBACK_MAINTENANCE_INTERVAL_HOURS = float(os.getenv("FEEDBACK_MAINTENANCE_INTERVAL_HOURS", "24"))
+
+feedback = models.Feedback
+
+# Serializes maintenance between service instances sharing a database
+_MAINTENANCE_LOCK = 0x66656564  # "feed"
+
+
+def _month(value: datetime, offset: int = 0) -> datetime:
+    """First instant (UTC) of the month `offset` months after value's."""
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"feedbacks_p{month:%Y_%m}"
+
+
+def is_partitioned(connection) -> bool:
+    return connection.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('feedbacks')"
+    )).scalar() is True
+
+
+def _partitions(connection) -> List[Tuple[str, Optional[datetime]]]:
+    """Monthly partitions of feedbacks with the month they hold, oldest first; None for the default one."""
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'feedbacks'::regclass ORDER BY child.relname"
+    )).scalars()
+    partitions = []
+    for name in names:
+        try:
+            month = datetime.strptime(name, "feedbacks_p%Y_%m").replace(tzinfo=timezone.utc)
+        except ValueError:
+            month = None
+        partitions.append((name, month))
+    return partitions
+
+
+def create_partitions(connection, first: datetime, last: datetime) -> List[str]:
+    """Create the missing monthly partitions from first's month through last's, and the default partition."""
+    created = []
+    month = _month(first)
+    while month <= last:
+        name = _partition_name(month)
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            # Bounds are UTC instants, whatever the session time zone
+            connection.execute(text(
+                f"CREATE TABLE {name} PARTITION OF feedbacks "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        month = _month(month, 1)
+    connection.execute(text("CREATE TABLE IF NOT EXISTS feedbacks_default PARTITION OF feedbacks DEFAULT"))
+    return created
+
+
+def purge_deleted(session_factory, cutoff: datetime, chunk_size: int) -> int:
+    """
+    Hard delete soft-deleted feedback created before cutoff, chunk_size rows
+    per transaction. The created_at condition confines the deletes to the
+    partitions older than cutoff. The statistics rollups keep counting the
+    purged feedback.
+    """
+    purged = 0
+    while True:
+        with session_factory() as db:
+            expired = (feedback.is_deleted == True, feedback.created_at < cutoff)
+            ids = db.query(feedback.id).filter(*expired).limit(chunk_size).subquery()
+            with stats.purging(db):
+                deleted = db.query(feedback)\
+                    .filter(feedback.id.in_(db.query(ids.c.id)), *expired)\
+                    .delete(synchronize_session=False)
+            db.commit()
+        purged += deleted
+        if deleted < chunk_size:
+            return purged
+
+
+def drop_empty_partitions(connection, cutoff: datetime) -> List[str]:
+    """Detach and drop the monthly partitions that end before cutoff and hold no rows."""
+    dropped = []
+    for name, month in _partitions(connection):
+        if month is None or _month(month, 1) > cutoff:
+            continue
+        if connection.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")).scalar():
+            connection.execute(text(f"ALTER TABLE feedbacks DETACH PARTITION {name}"))
+            connection.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def ensure_partitions(engine, now: Optional[datetime] = None) -> List[str]:
+    """Create the partitions of the current month and the next FEEDBACK_PARTITION_MONTHS_AHEAD ones."""
+    if engine.dialect.name != "postgresql":
+        return []
+    now = now or datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK})
+        if not is_partitioned(connection):
+            logger.warning("The feedbacks table is not partitioned; convert it with `python -m app.partitions migrate`")
+            return []
+        return create_partitions(connection, now, _month(now, FEEDBACK_PARTITION_MONTHS_AHEAD))
+
+
+def maintain(engine, session_factory, now: Optional[datetime] = None) -> dict:
+    """Run every maintenance step once; see the module docstring."""
+    now = now or datetime.now(timezone.utc)
+    result = {"created": ensure_partitions(engine, now), "purged": 0, "dropped": []}
+    cutoff = _month(now, -FEEDBACK_RETENTION_MONTHS) if FEEDBACK_RETENTION_MONTHS > 0 else None
+    if cutoff:
+        with session_factory() as db:
+            covered = stats.rollups_cover(db, cutoff)
+        if not covered:
+            # Rows the rollups never counted would be lost from the statistics for good
+            logger.warning(
+                "Skipping the feedback retention purge: the statistics rollups do not cover the feedback "
+                "older than the retention period yet; rebuild them with `python -m app.stats rebuild`"
+            )
+            cutoff = None
+    if cutoff:
+        result["purged"] = purge_deleted(session_factory, cutoff, JOB_CHUNK_SIZE)
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as connection:
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK})
+                if is_partitioned(connection):
+                    result["dropped"] = drop_empty_partitions(connection, cutoff)
+    if result["created"] or result["purged"] or result["dropped"]:
+        logger.info(
+            f"Feedback maintenance: created partitions {result['created']}, purged {result['purged']} "
+            f"soft-deleted feedbacks, dropped partitions {result['dropped']}"
+        )
+    return result
+
+
+def migrate(engine) -> int:
+    """
+    Convert an unpartitioned feedbacks table into the partitioned one, in a
+    single transaction that blocks feedback reads and writes while it copies
+    the rows. Returns the number of rows moved.
+    """
+    table = feedback.__table__
+    copied = ", ".join(column.name for column in table.columns if column.computed is None)
+    with engine.begin() as connection:
+        if is_partitioned(connection):
+            return 0
+        connection.execute(text("LOCK TABLE feedbacks IN ACCESS EXCLUSIVE MODE"))
+        # Free the names the new table, its indexes and its id sequence will use
+        connection.execute(text("ALTER TABLE feedbacks RENAME TO feedbacks_unpartitioned"))
+        connection.execute(text("ALTER TABLE feedbacks_unpartitioned RENAME CONSTRAINT feedbacks_pkey TO feedbacks_unpartitioned_pkey"))
+        connection.execute(text("ALTER SEQUENCE IF EXISTS feedbacks_id_seq RENAME TO feedbacks_unpartitioned_id_seq"))
+        for index in table.indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        table.create(connection)
+        first, last = connection.execute(text("SELECT min(created_at), max(created_at) FROM feedbacks_unpartitioned")).one()
+        now = datetime.now(timezone.utc)
+        create_partitions(connection, min(first or now, now), _month(max(last or now, now), FEEDBACK_PARTITION_MONTHS_AHEAD))
+        moved = connection.execute(text(
+            f"INSERT INTO feedbacks ({copied}) SELECT {copied} FROM feedbacks_unpartitioned"
+        )).rowcount
+        connection.execute(text(
+            "SELECT setval(pg_get_serial_sequence('feedbacks', 'id'), coalesce(max(id), 0) + 1, false) FROM feedbacks"
+        ))
+        # Takes the old table's triggers, indexes and sequence with it
+        connection.execute(text("DROP TABLE feedbacks_unpartitioned"))
+    logger.info(f"Moved {moved} feedbacks into the partitioned table")
+    return moved
+
+
+async def run_periodically(interval_hours: float):
+    """Run maintenance now and then every interval_hours, off the event loop, until cancelled."""
+    while True:
+        try:
+            await anyio.to_thread.run_sync(maintain, database.engine, database.SessionLocal)
+        except Exception as e:
+            logger.error(f"Feedback maintenance failed: {str(e)}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.partitions", description="Maintain the feedback partitions")
+    parser.add_argument("command", choices=["maintain", "migrate"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        if database.engine.dialect.name != "postgresql":
+            parser.error("only PostgreSQL databases are partitioned")
+        migrate(database.engine)
+        # The new table needs the statistics triggers of the old one
+        stats.create_stats_triggers(database.engine)
+    maintain(database.engine, database.SessionLocal)
+
+
+if __name__ == "__main__":
+    main()
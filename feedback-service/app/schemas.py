@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from shared.validators import InputSanitizer
 
 class FeedbackBase(BaseModel):
@@ -42,6 +42,19 @@ class Feedback(FeedbackBase):
     class Config:
         orm_mode = True
 
+class FeedbackStatsBucket(BaseModel):
+    start: datetime
+    created: int
+    active: int
+    deleted: int
+
+class FeedbackStats(BaseModel):
+    interval: str
+    created: int
+    active: int
+    deleted: int
+    buckets: List[FeedbackStatsBucket]
+
 class MemberBase(BaseModel):
     login: str = Field(
         ...,
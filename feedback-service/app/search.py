@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.orm import Session
+import logging
+from shared.error_handling import ValidationError
+from shared.fields import columns
+from shared.pagination import created_at_value
+from . import models
+
+logger = logging.getLogger(__name__)
+
+feedback = models.Feedback
+
+# The search configuration as a regconfig literal: a bound string would reach
+# asyncpg as varchar, which matches no websearch_to_tsquery signature
+SEARCH_CONFIG = literal_column(f"'{models.TEXT_SEARCH_CONFIG}'::regconfig")
+
+# SQLite's external-content FTS5 index over feedbacks.feedback, kept in sync by triggers
+FTS_TABLE = table("feedbacks_fts", column("rowid"), column("rank"))
+
+_FTS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_insert AFTER INSERT ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts (rowid, feedback) VALUES (new.id, new.feedback);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_delete AFTER DELETE ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts (feedbacks_fts, rowid, feedback) VALUES ('delete', old.id, old.feedback);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_update AFTER UPDATE OF feedback ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts (feedbacks_fts, rowid, feedback) VALUES ('delete', old.id, old.feedback);
+        INSERT INTO feedbacks_fts (rowid, feedback) VALUES (new.id, new.feedback);
+    END""",
+)
+
+
+def create_search_index(engine):
+    """
+    Make feedback searchable. On PostgreSQL, add the generated search_vector
+    column to a table created before it existed; its GIN index is created
+    with the model's other indexes. On SQLite, create the FTS5 table and its
+    triggers, indexing the rows that are already there.
+    """
+    if engine.dialect.name == "postgresql":
+        generated = feedback.__table__.c.search_vector.computed.sqltext
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({generated}) STORED"
+            ))
+    elif engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedbacks_fts'"
+            )).first()
+            if not exists:
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE feedbacks_fts USING fts5(feedback, content='feedbacks', content_rowid='id')"
+                ))
+                connection.execute(text("INSERT INTO feedbacks_fts (feedbacks_fts) VALUES ('rebuild')"))
+                logger.info("Created the feedback full-text index")
+            for trigger in _FTS_TRIGGERS:
+                connection.execute(text(trigger))
+
+
+def _fts5_query(q: str) -> str:
+    """Every word of q as a quoted FTS5 string, so user input cannot use the query syntax."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+    if not terms:
+        raise ValidationError("Search query is empty", {"q": q})
+    return " ".join(terms)
+
+
+def search_feedbacks(db: Session, q: str, limit: int, offset: int,
+                     created_from: Optional[datetime], created_to: Optional[datetime],
+                     selected: Optional[List[str]]) -> Tuple[List[Any], bool]:
+    """
+    Active feedback matching q, best matches first and newest first among
+    equals, optionally created in [created_from, created_to). PostgreSQL
+    parses q with websearch_to_tsquery ("quoted phrases", -excluded words, or)
+    and ranks with ts_rank_cd over the GIN-indexed search_vector. SQLite
+    requires every word of q and ranks with FTS5's bm25. Returns one page and
+    whether more results follow.
+    """
+    query = db.query(feedback)
+    if selected:
+        query = query.with_entities(*columns(feedback, selected))
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        query = query.filter(feedback.search_vector.op("@@")(ts_query))
+        order = func.ts_rank_cd(feedback.search_vector, ts_query).desc()
+    else:
+        query = query.join(FTS_TABLE, FTS_TABLE.c.rowid == feedback.id)\
+            .filter(literal_column("feedbacks_fts").op("MATCH")(_fts5_query(q)))
+        order = FTS_TABLE.c.rank  # bm25, lower is better
+
+    query = query.filter(feedback.is_deleted == False)
+    if created_from:
+        query = query.filter(feedback.created_at >= created_at_value(query, created_from))
+    if created_to:
+        query = query.filter(feedback.created_at < created_at_value(query, created_to))
+    rows = query.order_by(order, feedback.created_at.desc(), feedback.id.desc())\
+        .offset(offset)\
+        .limit(limit + 1)\
+        .all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,275 @@
+"""
+Feedback volume statistics, served from the hourly rollup table.
+
+Rebuild the rollups from the feedbacks table, e.g. after upgrading a database
+that already holds feedback, with:
+
+    python -m app.stats rebuild
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import case, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import argparse
+import logging
+import os
+from shared.pagination import created_at_value
+from . import database, models
+
+logger = logging.getLogger(__name__)
+
+# Hours of feedback recounted per transaction by the rebuild
+FEEDBACK_STATS_REBUILD_CHUNK_HOURS = int(os.getenv("FEEDBACK_STATS_REBUILD_CHUNK_HOURS", "24"))
+
+feedback = models.Feedback
+stats = models.FeedbackStatsHourly
+
+# PostgreSQL: statement-level triggers see all rows changed by a statement at
+# once, so a bulk soft delete or a batch insert makes one upsert per hour
+# instead of one per row. Hours are upserted in order, so that concurrent
+# statements lock the rollup rows they share in the same order. Deletes made
+# while the transaction setting below is on are counted as purged instead.
+_PG_PURGING = "feedback_stats.purging"
+_PG_HOUR = "date_trunc('hour', created_at AT TIME ZONE 'UTC')"
+_PG_UPSERT = """
+        INSERT INTO feedback_stats_hourly AS s (hour, created, deleted, purged)
+        SELECT hour, sum(created), sum(deleted), sum(purged) FROM ({changes}) changes
+        GROUP BY hour HAVING sum(created) <> 0 OR sum(deleted) <> 0 OR sum(purged) <> 0 ORDER BY hour
+        ON CONFLICT (hour) DO UPDATE SET created = s.created + excluded.created, deleted = s.deleted + excluded.deleted,
+            purged = s.purged + excluded.purged;"""
+_PG_ADDED = f"SELECT {_PG_HOUR} AS hour, 1 AS created, CASE WHEN is_deleted THEN 1 ELSE 0 END AS deleted, 0 AS purged FROM new_rows"
+_PG_REMOVED = f"SELECT {_PG_HOUR} AS hour, -1 AS created, CASE WHEN is_deleted THEN -1 ELSE 0 END AS deleted, 0 AS purged FROM old_rows"
+_PG_PURGED = f"SELECT {_PG_HOUR} AS hour, 0 AS created, 0 AS deleted, 1 AS purged FROM old_rows"
+_PG_CHANGED = f"{_PG_ADDED} UNION ALL {_PG_REMOVED}"
+_PG_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION feedback_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_PG_UPSERT.format(changes=_PG_ADDED)}
+    ELSIF TG_OP = 'DELETE' AND current_setting('{_PG_PURGING}', true) = 'on' THEN{_PG_UPSERT.format(changes=_PG_PURGED)}
+    ELSIF TG_OP = 'DELETE' THEN{_PG_UPSERT.format(changes=_PG_REMOVED)}
+    ELSE{_PG_UPSERT.format(changes=_PG_CHANGED)}
+    END IF;
+    RETURN NULL;
+END
+$$"""
+_PG_TRIGGERS = {
+    "feedback_stats_insert": "AFTER INSERT ON feedbacks REFERENCING NEW TABLE AS new_rows",
+    "feedback_stats_update": "AFTER UPDATE ON feedbacks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "feedback_stats_delete": "AFTER DELETE ON feedbacks REFERENCING OLD TABLE AS old_rows",
+}
+
+# SQLite only has row-level triggers. Deletes made while the transaction holds
+# a row in feedback_stats_purging are counted as purged instead; SQLite has a
+# single writer, so no other transaction ever sees that row.
+_SQLITE_PURGING = "CREATE TABLE IF NOT EXISTS feedback_stats_purging (purging INTEGER)"
+_SQLITE_HOUR = "strftime('%Y-%m-%d %H:00:00', {row}.created_at)"
+_SQLITE_UPSERT = """
+    INSERT INTO feedback_stats_hourly (hour, created, deleted, purged)
+    VALUES ({hour}, {created}, {deleted}, {purged})
+    ON CONFLICT (hour) DO UPDATE SET created = created + excluded.created, deleted = deleted + excluded.deleted,
+        purged = purged + excluded.purged;"""
+_SQLITE_ADD = _SQLITE_UPSERT.format(
+    hour=_SQLITE_HOUR.format(row="new"), created="1", deleted="coalesce(new.is_deleted, 0)", purged="0"
+)
+_SQLITE_REMOVE = _SQLITE_UPSERT.format(
+    hour=_SQLITE_HOUR.format(row="old"), created="-1", deleted="-coalesce(old.is_deleted, 0)", purged="0"
+)
+_SQLITE_PURGE = _SQLITE_UPSERT.format(hour=_SQLITE_HOUR.format(row="old"), created="0", deleted="0", purged="1")
+_SQLITE_TRIGGERS = {
+    "feedback_stats_insert": f"AFTER INSERT ON feedbacks BEGIN{_SQLITE_ADD}\nEND",
+    "feedback_stats_update": f"""AFTER UPDATE OF is_deleted, created_at ON feedbacks
+    WHEN old.is_deleted IS NOT new.is_deleted OR old.created_at IS NOT new.created_at
+    BEGIN{_SQLITE_REMOVE}{_SQLITE_ADD}\nEND""",
+    "feedback_stats_delete": f"""AFTER DELETE ON feedbacks
+    WHEN NOT EXISTS (SELECT 1 FROM feedback_stats_purging) BEGIN{_SQLITE_REMOVE}\nEND""",
+    "feedback_stats_purge": f"""AFTER DELETE ON feedbacks
+    WHEN EXISTS (SELECT 1 FROM feedback_stats_purging) BEGIN{_SQLITE_PURGE}\nEND""",
+}
+
+
+def create_stats_triggers(engine):
+    """Install the triggers that keep feedback_stats_hourly in step with every write to feedbacks."""
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execute(text(_PG_FUNCTION))
+            for name, event in _PG_TRIGGERS.items():
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON feedbacks"))
+                connection.execute(text(
+                    f"CREATE TRIGGER {name} {event} FOR EACH STATEMENT EXECUTE FUNCTION feedback_stats_apply()"
+                ))
+        elif engine.dialect.name == "sqlite":
+            connection.execute(text(_SQLITE_PURGING))
+            for name, event in _SQLITE_TRIGGERS.items():
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                connection.execute(text(f"CREATE TRIGGER {name} {event}"))
+        else:
+            logger.warning(f"Feedback statistics are not maintained on {engine.dialect.name}")
+            return
+        if connection.execute(select(feedback.id).limit(1)).first() \
+                and not connection.execute(select(stats.hour).limit(1)).first():
+            logger.warning("Feedback statistics are empty; backfill them with `python -m app.stats rebuild`")
+
+
+@contextmanager
+def purging(db: Session):
+    """
+    Count the feedback deleted inside the block as purged: it leaves the
+    feedbacks table but stays created (and deleted) in the rollups, so the
+    statistics history does not change. Commit after the block.
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        db.execute(text(f"SET LOCAL {_PG_PURGING} = 'on'"))
+        yield
+        db.execute(text(f"SET LOCAL {_PG_PURGING} = 'off'"))
+    elif dialect_name == "sqlite":
+        db.execute(text("INSERT INTO feedback_stats_purging VALUES (1)"))
+        yield
+        db.execute(text("DELETE FROM feedback_stats_purging"))
+    else:
+        yield
+
+
+def _hour(dialect_name: str):
+    """The rollup hour of feedback.created_at, computed exactly as the triggers do."""
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", func.timezone("UTC", feedback.created_at))
+    return func.strftime("%Y-%m-%d %H:00:00", feedback.created_at)
+
+
+def _utc(value: datetime) -> datetime:
+    """value as a naive UTC datetime, the way rollup hours are stored."""
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return _utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def feedback_stats(db: Session, interval: str, created_from: Optional[datetime],
+                   created_to: Optional[datetime]) -> dict:
+    """
+    Created, active and deleted feedback per hour or per day (UTC), read from
+    the rollups only, so the cost depends on the number of hours asked for
+    and not on the number of feedbacks. created_from is rounded down to the
+    hour; hours starting before created_to are included.
+    """
+    query = db.query(stats.hour, stats.created, stats.deleted)
+    if created_from:
+        query = query.filter(stats.hour >= created_at_value(query, _floor_hour(created_from)))
+    if created_to:
+        query = query.filter(stats.hour < created_at_value(query, _utc(created_to)))
+
+    buckets = {}
+    for hour, created, deleted in query.order_by(stats.hour):
+        if not created and not deleted:
+            continue
+        start = hour.replace(hour=0) if interval == "day" else hour
+        bucket = buckets.setdefault(start, {"start": start.replace(tzinfo=timezone.utc), "created": 0, "deleted": 0})
+        bucket["created"] += created
+        bucket["deleted"] += deleted
+    for bucket in buckets.values():
+        bucket["active"] = bucket["created"] - bucket["deleted"]
+
+    created = sum(bucket["created"] for bucket in buckets.values())
+    deleted = sum(bucket["deleted"] for bucket in buckets.values())
+    return {
+        "interval": interval,
+        "created": created,
+        "active": created - deleted,
+        "deleted": deleted,
+        "buckets": list(buckets.values()),
+    }
+
+
+def rollups_cover(db: Session, before: datetime) -> bool:
+    """
+    Whether the rollups count exactly the feedback still stored that was
+    created before `before`, an hour boundary; purged feedback is left out.
+    """
+    query = db.query(func.count(feedback.id))
+    actual = query.filter(feedback.created_at < created_at_value(query, before)).scalar()
+    query = db.query(func.coalesce(func.sum(stats.created - stats.purged), 0))
+    counted = query.filter(stats.hour < created_at_value(query, _utc(before))).scalar()
+    return actual == counted
+
+
+def _rebuild_window(session_factory, start: datetime, end: datetime) -> int:
+    """
+    Recount the rollups of the hours in [start, end) from the feedbacks table,
+    in one transaction. Purged feedback is no longer in the table, so its
+    counts are kept as they are.
+    """
+    with session_factory() as db:
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            # Blocks the triggers of concurrent writes until this window is
+            # recounted, and waits for writes whose triggers already ran, so
+            # that every change is counted exactly once
+            db.execute(text("LOCK TABLE feedback_stats_hourly IN EXCLUSIVE MODE"))
+        query = db.query(stats)
+        window = (stats.hour >= created_at_value(query, start), stats.hour < created_at_value(query, end))
+        query.filter(*window).update({stats.created: stats.purged, stats.deleted: stats.purged},
+                                     synchronize_session=False)
+        hour = _hour(dialect_name)
+        counts = select(hour, func.count(feedback.id), func.sum(case((feedback.is_deleted == True, 1), else_=0)))\
+            .where(feedback.created_at >= created_at_value(query, start.replace(tzinfo=timezone.utc)),
+                   feedback.created_at < created_at_value(query, end.replace(tzinfo=timezone.utc)))\
+            .group_by(hour)
+        upsert = (postgresql.insert if dialect_name == "postgresql" else sqlite.insert)(stats)\
+            .from_select(["hour", "created", "deleted"], counts)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[stats.hour],
+            set_={"created": stats.created + upsert.excluded.created, "deleted": stats.deleted + upsert.excluded.deleted},
+        )
+        counted = db.execute(upsert).rowcount
+        query.filter(*window, stats.created == 0, stats.deleted == 0, stats.purged == 0)\
+            .delete(synchronize_session=False)
+        db.commit()
+        return counted
+
+
+def rebuild_stats(session_factory, chunk_hours: int) -> dict:
+    """
+    Recount every rollup from the feedbacks table, chunk_hours at a time. Safe
+    to run while the service is taking writes.
+    """
+    with session_factory() as db:
+        bounds = [
+            value for value in (
+                *db.query(func.min(feedback.created_at), func.max(feedback.created_at)).one(),
+                *db.query(func.min(stats.hour), func.max(stats.hour)).one(),
+            ) if value is not None
+        ]
+    if not bounds:
+        return {"windows": 0, "hours": 0}
+    start, last = min(_floor_hour(value) for value in bounds), max(_utc(value) for value in bounds)
+    windows = hours = 0
+    while start <= last:
+        end = start + timedelta(hours=chunk_hours)
+        hours += _rebuild_window(session_factory, start, end)
+        windows += 1
+        logger.info(f"Rebuilt feedback statistics up to {end.isoformat()}")
+        start = end
+    return {"windows": windows, "hours": hours}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.stats", description="Maintain the feedback statistics rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--chunk-hours", type=int, default=FEEDBACK_STATS_REBUILD_CHUNK_HOURS,
+                        help="Hours recounted per transaction")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    models.Base.metadata.create_all(bind=database.engine)
+    create_stats_triggers(database.engine)
+    result = rebuild_stats(database.SessionLocal, args.chunk_hours)
+    logger.info(f"Rebuilt {result['hours']} hours of feedback statistics in {result['windows']} transactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import importlib
+import os
+import sys
+import tempfile
+import types
+
+# The database and settings are read when app.main is imported, so provide
+# them up front: every test session gets a fresh SQLite database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'feedback.db')}")
+os.environ.setdefault("SECRET_KEY", "your-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# Maintenance is run by the tests that need it
+os.environ.setdefault("FEEDBACK_MAINTENANCE_INTERVAL_HOURS", "0")
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Start every test from empty tables."""
+    # Importing the app creates (and seeds) the tables
+    from app import database, main, models
+
+    with database.engine.begin() as connection:
+        # Feedback first: its triggers write to the statistics rollups
+        connection.execute(models.Feedback.__table__.delete())
+        for table in models.Base.metadata.sorted_tables:
+            connection.execute(table.delete())
+    yield
+
+@pytest.fixture
+def insert_feedbacks():
+    """
+    Insert feedback straight into the database, each given by its text or a
+    dict of columns; returns the ids in insertion order.
+    """
+    from app import database, models
+
+    def insert_rows(feedbacks) -> list:
+        with database.engine.begin() as connection:
+            return [
+                connection.execute(
+                    insert(models.Feedback).values(**(feedback if isinstance(feedback, dict) else {"feedback": feedback}))
+                ).inserted_primary_key[0]
+                for feedback in feedbacks
+            ]
+    return insert_rows
+
+@pytest.fixture
+def auth_headers():
+    """Build headers carrying a valid access token for the given login."""
+    from shared.auth import create_access_token
+
+    def build(login: str = "testuser") -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': login})}"}
+    return build
+
+@pytest_asyncio.fixture
+async def service():
+    """Client for feedback-service, served in process."""
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://feedback-service") as client:
+        yield client
+
+@pytest_asyncio.fixture
+async def postgres_service(tmp_path, monkeypatch):
+    """
+    feedback-service imported a second time, as feedback_pg, on a throwaway
+    PostgreSQL database (from the optional pgserver package) with the async
+    engine.
+    """
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path / "pgdata"), cleanup_mode="stop")
+    server.psql("CREATE DATABASE feedback_db;")
+    monkeypatch.setenv("DATABASE_URL", server.get_uri("feedback_db"))
+    monkeypatch.setenv("DATABASE_ASYNC", "true")
+    package = types.ModuleType("feedback_pg")
+    package.__path__ = [os.path.join(os.path.dirname(os.path.dirname(__file__)), "app")]
+    monkeypatch.setitem(sys.modules, "feedback_pg", package)
+    try:
+        main = importlib.import_module("feedback_pg.main")
+        yield main
+        await main.database.async_engine.dispose()
+        main.engine.dispose()
+    finally:
+        for name in [name for name in sys.modules if name.startswith("feedback_pg.")]:
+            del sys.modules[name]
+        server.cleanup()
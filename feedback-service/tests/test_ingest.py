@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from shared.error_handling import DatabaseError, RateLimitError
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """Turn write-behind on with a fresh queue; returns a function to configure it."""
+    from app import ingest, main
+
+    monkeypatch.setattr(ingest, "FEEDBACK_WRITE_BEHIND", True)
+
+    def configure(write_batch=main._write_feedbacks, **options):
+        writer = ingest.WriteBehindQueue(write_batch, **{"max_size": 100, "batch_size": 4, "interval": 0.05, **options})
+        monkeypatch.setattr(main, "feedback_writer", writer)
+        return writer
+    return configure
+
+@pytest.mark.asyncio
+async def test_concurrent_feedback_is_inserted_in_batches(service, auth_headers, write_behind):
+    writer = write_behind(interval=0.5)
+    responses = await asyncio.gather(*(
+        service.post("/feedback/", json={"feedback": f"Feedback {n}"}, headers=auth_headers()) for n in range(10)
+    ))
+    assert [response.status_code for response in responses] == [200] * 10
+    assert [response.json()["feedback"] for response in responses] == [f"Feedback {n}" for n in range(10)]
+    assert len({response.json()["id"] for response in responses}) == 10
+    assert writer.rows == 10
+    assert writer.batches == 3
+    await writer.close()
+
+    response = await service.get("/feedback/", params={"limit": 20}, headers=auth_headers())
+    assert len(response.json()) == 10
+
+@pytest.mark.asyncio
+async def test_full_queue_turns_feedback_away(service, auth_headers, write_behind):
+    from app import main
+
+    writing, gate = asyncio.Event(), asyncio.Event()
+
+    async def write_after_gate(rows):
+        writing.set()
+        await gate.wait()
+        return await main._write_feedbacks(rows)
+
+    writer = write_behind(write_after_gate, max_size=1, batch_size=1, interval=0)
+
+    def post(text):
+        return asyncio.ensure_future(service.post("/feedback/", json={"feedback": text}, headers=auth_headers()))
+
+    # The first is being written, the second fills the queue
+    accepted = [post("Feedback 0")]
+    await asyncio.wait_for(writing.wait(), 5)
+    accepted.append(post("Feedback 1"))
+    for _ in range(500):
+        if writer.accepted == 2:
+            break
+        await asyncio.sleep(0.01)
+    response = await service.post("/feedback/", json={"feedback": "One too many"}, headers=auth_headers())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["error_code"] == 1009
+
+    gate.set()
+    assert [response.status_code for response in await asyncio.gather(*accepted)] == [200, 200]
+    await writer.close()
+
+@pytest.mark.asyncio
+async def test_close_drains_the_queue_and_stops_intake():
+    from app import ingest
+
+    written = []
+
+    async def write_batch(rows):
+        written.extend(rows)
+        return rows
+
+    writer = ingest.WriteBehindQueue(write_batch, max_size=100, batch_size=50, interval=10)
+    submitted = [asyncio.ensure_future(writer.submit({"n": n})) for n in range(3)]
+    await asyncio.sleep(0)
+    await writer.close()
+    assert await asyncio.gather(*submitted) == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert written == [{"n": 0}, {"n": 1}, {"n": 2}]
+    with pytest.raises(RateLimitError):
+        await writer.submit({"n": 3})
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_each_of_its_rows():
+    from app import ingest
+
+    async def write_batch(rows):
+        raise RuntimeError("database is gone")
+
+    writer = ingest.WriteBehindQueue(write_batch, max_size=100, batch_size=2, interval=10)
+    results = await asyncio.gather(writer.submit({"n": 0}), writer.submit({"n": 1}), return_exceptions=True)
+    assert all(isinstance(result, DatabaseError) for result in results)
+    assert writer.failed == 2
+    await writer.close()
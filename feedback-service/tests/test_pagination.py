@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+import json
+import pytest
+
+def feedback_rows(count: int, **columns) -> list:
+    """Feedback created one minute apart, oldest first."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {"feedback": f"Feedback {n}", "created_at": start + timedelta(minutes=n), **columns}
+        for n in range(count)
+    ]
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_feedback_once(service, auth_headers, insert_feedbacks):
+    ids = insert_feedbacks(feedback_rows(7))
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = await service.get("/feedback/", params=params, headers=auth_headers())
+        assert response.status_code == 200
+        seen += [feedback["id"] for feedback in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = {"limit": 3, "cursor": response.headers["X-Next-Cursor"]}
+    # Newest first
+    assert seen == ids[::-1]
+
+@pytest.mark.asyncio
+async def test_rows_inserted_between_pages_are_not_repeated(service, auth_headers, insert_feedbacks):
+    ids = insert_feedbacks(feedback_rows(4))
+    response = await service.get("/feedback/", params={"limit": 2}, headers=auth_headers())
+    insert_feedbacks([{"feedback": "Newer", "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc)}])
+    next_page = await service.get(
+        "/feedback/", params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]}, headers=auth_headers()
+    )
+    assert [feedback["id"] for feedback in response.json() + next_page.json()] == ids[::-1]
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(service, auth_headers, insert_feedbacks):
+    insert_feedbacks(feedback_rows(1))
+    response = await service.get("/feedback/", params={"cursor": "not-a-cursor"}, headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1001
+
+@pytest.mark.asyncio
+async def test_stream_returns_every_active_feedback_as_ndjson(service, auth_headers, insert_feedbacks, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "FEEDBACK_STREAM_CHUNK_SIZE", 2)
+    ids = insert_feedbacks(feedback_rows(5))
+    insert_feedbacks(feedback_rows(1, is_deleted=True))
+    response = await service.get("/feedback/", params={"stream": "true", "fields": "id,feedback"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids[::-1]
+    assert all(list(row) == ["id", "feedback"] for row in rows)
@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import insert, text
+
+def at(year: int, month: int, day: int = 10) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+def remaining_feedback(database, models) -> list:
+    with database.SessionLocal() as db:
+        return sorted(row.feedback for row in db.query(models.Feedback.feedback))
+
+def stats_totals(database, stats) -> dict:
+    with database.SessionLocal() as db:
+        totals = stats.feedback_stats(db, "hour", None, None)
+    return {name: totals[name] for name in ("created", "active", "deleted")}
+
+def test_maintenance_purges_only_old_soft_deleted_feedback(insert_feedbacks, monkeypatch):
+    from app import database, models, partitions, stats
+
+    insert_feedbacks([
+        {"feedback": "old deleted", "created_at": at(2023, 1), "is_deleted": True},
+        {"feedback": "old active", "created_at": at(2023, 1)},
+        {"feedback": "recent deleted", "created_at": at(2024, 2), "is_deleted": True},
+    ])
+    history = {"created": 3, "active": 1, "deleted": 2}
+    assert stats_totals(database, stats) == history
+    # Retention is off by default
+    assert partitions.maintain(database.engine, database.SessionLocal, now=at(2024, 3))["purged"] == 0
+
+    monkeypatch.setattr(partitions, "FEEDBACK_RETENTION_MONTHS", 12)
+    result = partitions.maintain(database.engine, database.SessionLocal, now=at(2024, 3))
+    assert result == {"created": [], "purged": 1, "dropped": []}
+    assert remaining_feedback(database, models) == ["old active", "recent deleted"]
+    # Purged feedback stays in the statistics, and a rebuild keeps it there
+    assert stats_totals(database, stats) == history
+    with database.SessionLocal() as db:
+        assert stats.rollups_cover(db, at(2024, 4, 1))
+    stats.rebuild_stats(database.SessionLocal, chunk_hours=24 * 31)
+    assert stats_totals(database, stats) == history
+    with database.SessionLocal() as db:
+        assert stats.rollups_cover(db, at(2024, 4, 1))
+    # Deletes outside the purge still leave the rollups
+    with database.engine.begin() as connection:
+        connection.execute(models.Feedback.__table__.delete().where(models.Feedback.feedback == "old active"))
+    assert stats_totals(database, stats) == {"created": 2, "active": 0, "deleted": 2}
+
+def test_maintenance_skips_the_purge_without_rollups(insert_feedbacks, monkeypatch):
+    from app import database, models, partitions, stats
+
+    monkeypatch.setattr(partitions, "FEEDBACK_RETENTION_MONTHS", 12)
+    insert_feedbacks([{"feedback": "old deleted", "created_at": at(2023, 1), "is_deleted": True}])
+    with database.engine.begin() as connection:
+        connection.execute(models.FeedbackStatsHourly.__table__.delete())
+    assert partitions.maintain(database.engine, database.SessionLocal, now=at(2024, 3))["purged"] == 0
+    assert remaining_feedback(database, models) == ["old deleted"]
+
+    stats.rebuild_stats(database.SessionLocal, chunk_hours=24 * 31)
+    assert partitions.maintain(database.engine, database.SessionLocal, now=at(2024, 3))["purged"] == 1
+    assert remaining_feedback(database, models) == []
+
+@pytest.mark.asyncio
+async def test_partitions_on_postgres(postgres_service, monkeypatch):
+    database, models, partitions = postgres_service.database, postgres_service.models, postgres_service.partitions
+    stats = postgres_service.stats
+    engine = database.engine
+    with engine.connect() as connection:
+        assert partitions.is_partitioned(connection)
+
+    assert partitions.ensure_partitions(engine, now=at(2023, 1)) == [
+        "feedbacks_p2023_01", "feedbacks_p2023_02", "feedbacks_p2023_03", "feedbacks_p2023_04"
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(models.Feedback), [
+            {"feedback": "old deleted", "created_at": at(2023, 1), "is_deleted": True},
+            {"feedback": "old active", "created_at": at(2023, 2), "is_deleted": False},
+        ])
+        rows = dict(connection.execute(text("SELECT feedback, tableoid::regclass::text FROM feedbacks WHERE feedback LIKE 'old %'")).all())
+    assert rows == {"old deleted": "feedbacks_p2023_01", "old active": "feedbacks_p2023_02"}
+
+    history = stats_totals(database, stats)
+    monkeypatch.setattr(partitions, "FEEDBACK_RETENTION_MONTHS", 12)
+    result = partitions.maintain(engine, database.SessionLocal, now=at(2024, 3))
+    assert result["purged"] == 1
+    assert stats_totals(database, stats) == history
+    # Emptied by the purge; 2023_02 still holds a row and 2023_03 is not past the cutoff
+    assert result["dropped"] == ["feedbacks_p2023_01"]
+    with engine.connect() as connection:
+        names = [name for name, _ in partitions._partitions(connection)]
+        assert "feedbacks_p2023_02" in names and "feedbacks_p2023_03" in names and "feedbacks_p2024_06" in names
+        assert connection.execute(
+            text("SELECT count(*) FROM feedbacks WHERE feedback = 'old active'")
+        ).scalar() == 1
@@ -0,0 +1,55 @@
+import httpx
+import pytest
+
+@pytest.mark.asyncio
+async def test_best_matches_come_first(service, auth_headers, insert_feedbacks):
+    insert_feedbacks([
+        "Great service, great people",
+        "The service was slow",
+        "Nothing to report",
+        {"feedback": "Great service overall", "is_deleted": True},
+    ])
+    response = await service.get("/feedback/search", params={"q": "great service"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert [feedback["feedback"] for feedback in response.json()] == ["Great service, great people"]
+    response = await service.get("/feedback/search", params={"q": "service", "fields": "feedback"}, headers=auth_headers())
+    assert sorted(feedback["feedback"] for feedback in response.json()) == [
+        "Great service, great people", "The service was slow"
+    ]
+
+@pytest.mark.asyncio
+async def test_results_are_paged(service, auth_headers, insert_feedbacks):
+    insert_feedbacks([f"Good service number {n}" for n in range(5)])
+    params = {"q": "service", "limit": 3}
+    response = await service.get("/feedback/search", params=params, headers=auth_headers())
+    first_page = response.json()
+    assert response.headers["Link"] == '</feedback/search?q=service&limit=3&offset=3>; rel="next"'
+    response = await service.get("/feedback/search", params={**params, "offset": 3}, headers=auth_headers())
+    assert "Link" not in response.headers
+    assert len({feedback["id"] for feedback in first_page + response.json()}) == 5
+
+@pytest.mark.asyncio
+async def test_query_syntax_is_matched_literally(service, auth_headers, insert_feedbacks):
+    insert_feedbacks(["Great service"])
+    for q in ('"great', "great OR -service", "NEAR(great"):
+        response = await service.get("/feedback/search", params={"q": q}, headers=auth_headers())
+        assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_blank_query_is_rejected(service, auth_headers):
+    response = await service.get("/feedback/search", params={"q": "   "}, headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1001
+
+@pytest.mark.asyncio
+async def test_search_on_postgres_with_the_async_engine(postgres_service, auth_headers):
+    app = postgres_service.app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://feedback-service") as client:
+        for text in ("Great services, great people", "The service was slow", "Nothing to report"):
+            assert (await client.post("/feedback/", json={"feedback": text}, headers=auth_headers())).status_code == 200
+        # Stemmed, with a quoted phrase and an excluded word
+        response = await client.get(
+            "/feedback/search", params={"q": '"great service" -slow'}, headers=auth_headers()
+        )
+        assert response.status_code == 200
+        assert [feedback["feedback"] for feedback in response.json()] == ["Great services, great people"]
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import func
+
+def feedback_counts() -> dict:
+    """The statistics counted straight from the feedbacks table."""
+    from app import database, models
+
+    with database.SessionLocal() as db:
+        created = db.query(func.count(models.Feedback.id)).scalar()
+        deleted = db.query(func.count(models.Feedback.id)).filter(models.Feedback.is_deleted == True).scalar()
+    return {"created": created, "active": created - deleted, "deleted": deleted}
+
+async def get_totals(service, headers, **params) -> dict:
+    response = await service.get("/feedback/stats", params=params, headers=headers)
+    assert response.status_code == 200
+    return {name: response.json()[name] for name in ("created", "active", "deleted")}
+
+def at(day: int, hour: int) -> datetime:
+    return datetime(2024, 3, day, hour, 30, tzinfo=timezone.utc)
+
+@pytest.mark.asyncio
+async def test_rollups_follow_every_write(service, auth_headers, insert_feedbacks):
+    ids = insert_feedbacks([{"feedback": f"Feedback {n}", "created_at": at(1 + n % 2, n % 3)} for n in range(6)])
+    for n in range(2):
+        assert (await service.post("/feedback/", json={"feedback": f"New {n}"}, headers=auth_headers())).status_code == 200
+    assert await get_totals(service, auth_headers()) == feedback_counts() == {"created": 8, "active": 8, "deleted": 0}
+
+    assert (await service.delete(f"/feedback/{ids[0]}", headers=auth_headers())).status_code == 200
+    assert (await service.delete(f"/internal/feedback/{ids[1]}/hard")).status_code == 200
+    assert await get_totals(service, auth_headers()) == feedback_counts() == {"created": 7, "active": 6, "deleted": 1}
+
+@pytest.mark.asyncio
+async def test_buckets_by_hour_and_day(service, auth_headers, insert_feedbacks):
+    insert_feedbacks([
+        {"feedback": "a", "created_at": at(1, 0)},
+        {"feedback": "b", "created_at": at(1, 0)},
+        {"feedback": "c", "created_at": at(1, 5), "is_deleted": True},
+        {"feedback": "d", "created_at": at(2, 1)},
+    ])
+    params = {"created_from": "2024-03-01T00:00:00Z", "created_to": "2024-03-03T00:00:00Z"}
+    response = await service.get("/feedback/stats", params={**params, "interval": "day"}, headers=auth_headers())
+    assert [(bucket["start"][:10], bucket["created"], bucket["active"]) for bucket in response.json()["buckets"]] == [
+        ("2024-03-01", 3, 2), ("2024-03-02", 1, 1)
+    ]
+    response = await service.get("/feedback/stats", params={**params, "interval": "hour"}, headers=auth_headers())
+    assert [(bucket["start"][:13], bucket["created"]) for bucket in response.json()["buckets"]] == [
+        ("2024-03-01T00", 2), ("2024-03-01T05", 1), ("2024-03-02T01", 1)
+    ]
+    # Bounds fall on hours: created_from is rounded down, created_to excludes its own hour
+    totals = await get_totals(service, auth_headers(), created_from="2024-03-01T05:59:00Z", created_to="2024-03-02T01:00:00Z")
+    assert totals == {"created": 1, "active": 0, "deleted": 1}
+
+@pytest.mark.asyncio
+async def test_rebuild_recounts_the_rollups(service, auth_headers, insert_feedbacks):
+    from app import database, models, stats
+
+    insert_feedbacks([{"feedback": f"Feedback {n}", "created_at": at(1 + n % 3, n), "is_deleted": n == 0} for n in range(5)])
+    with database.engine.begin() as connection:
+        connection.execute(models.FeedbackStatsHourly.__table__.delete())
+    with database.SessionLocal() as db:
+        assert not stats.rollups_cover(db, datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+    stats.rebuild_stats(database.SessionLocal, chunk_hours=5)
+    assert await get_totals(service, auth_headers()) == feedback_counts() == {"created": 5, "active": 4, "deleted": 1}
+    with database.SessionLocal() as db:
+        assert stats.rollups_cover(db, datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+@pytest.mark.asyncio
+async def test_unknown_interval_is_rejected(service, auth_headers):
+    response = await service.get("/feedback/stats", params={"interval": "week"}, headers=auth_headers())
+    assert response.status_code == 422
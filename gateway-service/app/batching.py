@@ -0,0 +1,77 @@
+from typing import Any, Awaitable, Callable, Dict, List, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BatchLoader:
+    """
+    Dataloader-style batching: single-key loads for the same group that arrive
+    within `window` seconds of each other are resolved by one call to
+    load_batch(group, keys), which returns the values found by key. Keys it
+    leaves out resolve to None. A batch is sent early once it holds max_batch
+    keys. Like SingleFlight, a cancelled waiter does not cancel the batch.
+    """
+
+    def __init__(self, load_batch: Callable[[str, List[Any]], Awaitable[Dict[Any, Any]]],
+                 window: float, max_batch: int):
+        self.load_batch = load_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, Dict[Any, asyncio.Future]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, group: str, key: Any) -> Any:
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = {}
+            self._timers[group] = loop.call_later(self.window, self._dispatch, group)
+        future = batch.get(key)
+        if future is None:
+            future = batch[key] = loop.create_future()
+            # Retrieve the exception so it is not reported as unhandled when
+            # every waiter was cancelled before the batch completed
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            if len(batch) >= self.max_batch:
+                self._timers.pop(group).cancel()
+                self._dispatch(group)
+        return await asyncio.shield(future)
+
+    def _dispatch(self, group: str):
+        self._timers.pop(group, None)
+        batch = self._pending.pop(group)
+        self.batches += 1
+        self.keys += len(batch)
+        task = asyncio.ensure_future(self._run(group, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, group: str, batch: Dict[Any, asyncio.Future]):
+        try:
+            values = await self.load_batch(group, list(batch))
+        except BaseException as e:
+            logger.debug(f"Batch of {len(batch)} keys for {group} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "batches": self.batches,
+            "avg_batch_size": round(self.keys / self.batches, 2) if self.batches else 0.0,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+        }
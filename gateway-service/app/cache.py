@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+import logging
+import time
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# POST routes that only read, e.g. id lists too long for a GET query string
+READ_ONLY_PATHS = {"/members/batch"}
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: dict
+    body: bytes
+    family: str
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+def resource_family(path: str) -> str:
+    """Map a request path to its resource family, e.g. /members/5 -> members."""
+    return path.strip("/").split("/", 1)[0]
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of upstream GET responses, bounded by entry count and
+    total body bytes. Entries expire after a TTL and are dropped whenever a write
+    for the same resource family goes through the gateway.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, max_entry_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._families: Dict[str, Set[str]] = {}
+        # Bumped on every write so a read that started before the write cannot
+        # store a stale response after the invalidation.
+        self._generations: Dict[str, int] = {}
+        # Background jobs still writing to each family; its responses are not
+        # stored until they finish
+        self._running_jobs: Dict[str, Set[str]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(path: str, query: str, subject: str) -> str:
+        return f"{subject}:{path}?{query}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def generation(self, family: str) -> int:
+        return self._generations.get(family, 0)
+
+    def put(self, key: str, status_code: int, headers: dict, body: bytes, family: str, generation: int) -> bool:
+        """
+        Store a response unless it is too large, its family was written to
+        meanwhile, or a job is still writing to it.
+        """
+        if len(body) > self.max_entry_bytes or generation != self.generation(family) \
+                or family in self._running_jobs:
+            return False
+        if key in self._entries:
+            self._remove(key)
+        entry = CachedResponse(status_code, headers, body, family, time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        self._families.setdefault(family, set()).add(key)
+        self.bytes += entry.size
+        self.stores += 1
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, family: str):
+        self._generations[family] = self.generation(family) + 1
+        keys = self._families.pop(family, set())
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry.size
+        if keys:
+            self.invalidations += 1
+            logger.info(f"Invalidated {len(keys)} cached responses for /{family}")
+
+    def job_started(self, family: str, job_id: str):
+        """Stop caching the family while the job changes its rows after the request that started it."""
+        self._running_jobs.setdefault(family, set()).add(job_id)
+        self.invalidate(family)
+
+    def job_finished(self, family: str, job_id: str):
+        jobs = self._running_jobs.get(family, set())
+        jobs.discard(job_id)
+        if not jobs:
+            self._running_jobs.pop(family, None)
+        self.invalidate(family)
+
+    def clear(self):
+        for family in list(self._families):
+            self.invalidate(family)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        family_keys = self._families.get(entry.family)
+        if family_keys is not None:
+            family_keys.discard(key)
+            if not family_keys:
+                del self._families[entry.family]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "running_jobs": sum(len(jobs) for jobs in self._running_jobs.values()),
+        }
+
+
+class CacheInvalidationMiddleware:
+    """
+    ASGI middleware that invalidates a resource family whenever a write request
+    for it passes through, both before it is forwarded and once it completes.
+    Requests to READ_ONLY_PATHS are not writes, whatever their method.
+    """
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS \
+                or scope["path"].rstrip("/") in READ_ONLY_PATHS:
+            await self.app(scope, receive, send)
+            return
+        family = resource_family(scope["path"])
+        self.cache.invalidate(family)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.cache.invalidate(family)
+
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+)
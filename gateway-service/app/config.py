@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict
 import os
 
 class Settings(BaseSettings):
@@ -9,6 +10,60 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Upstream connection pool (shared by every upstream client)
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    UPSTREAM_POOL_TIMEOUT: float = 5.0  # seconds to wait for a free connection
+    UPSTREAM_HTTP2: bool = False  # requires the "h2" package and a TLS upstream
+
+    # Per-upstream timeouts (seconds)
+    MEMBER_SERVICE_CONNECT_TIMEOUT: float = 2.0
+    MEMBER_SERVICE_READ_TIMEOUT: float = 10.0
+    FEEDBACK_SERVICE_CONNECT_TIMEOUT: float = 2.0
+    FEEDBACK_SERVICE_READ_TIMEOUT: float = 10.0
+
+    # In-process cache for GET /members/ and GET /feedback/ responses
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: float = 30.0  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024  # larger responses are streamed uncached and unshared
+
+    # Background jobs started through the gateway (e.g. DELETE /members/) are
+    # polled until they finish; their resource family is not cached meanwhile
+    JOB_POLL_INTERVAL: float = 1.0  # seconds
+    JOB_WATCH_TIMEOUT: float = 3600.0  # seconds before a job that never finishes is given up on
+
+    # Share one upstream call between concurrent identical GET requests
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # GET /members/{id} lookups issued within the window are sent as one /members/batch call
+    MEMBER_BATCH_WINDOW: float = 0.002  # seconds
+    MEMBER_BATCH_MAX_IDS: int = 100
+
+    # Upstream deadlines, circuit breakers and retries
+    UPSTREAM_REQUEST_DEADLINE: float = 15.0  # seconds per gateway request, retries included
+    BULK_IMPORT_DEADLINE: float = 600.0  # seconds for POST /members/bulk, which hashes every password
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures before the circuit opens
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = 30.0  # seconds open before trial calls are let through
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    RETRY_MAX_ATTEMPTS: int = 2  # retries after the first attempt, idempotent requests only
+    RETRY_BACKOFF_BASE: float = 0.05  # seconds
+    RETRY_BACKOFF_MAX: float = 1.0  # seconds
+    RETRY_BUDGET_RATIO: float = 0.2  # retries earned per original request
+    RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+
+    # Rate limiting (per client and route) and load shedding
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_SECOND: float = 50.0
+    RATE_LIMIT_BURST: int = 100
+    RATE_LIMIT_ROUTE_LIMITS: Dict[str, float] = {"POST /token": 5.0}  # requests per second by "METHOD /path"
+    RATE_LIMIT_MAX_TRACKED_CLIENTS: int = 10000
+    MAX_CONCURRENT_REQUESTS: int = 200
+    MAX_QUEUED_REQUESTS: int = 100
+    QUEUE_TIMEOUT: float = 1.0  # seconds a request may wait for a free slot
+
     model_config = {
         "extra": "ignore",  # This will ignore extra fields in the .env file
         "env_file": os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env")
@@ -0,0 +1,55 @@
+from typing import Set
+import asyncio
+import logging
+import time
+from shared.auth import INTERNAL_IDENTITY_HEADER, create_internal_identity
+from shared.error_handling import ServiceException
+from . import proxy
+from .cache import response_cache
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+# Jobs being followed, cancelled at shutdown
+_watchers: Set[asyncio.Task] = set()
+
+
+def watch(family: str, name: str, job_id: str, login: str):
+    """
+    Follow a job that upstream `name` runs on the family's rows. The family is
+    not cached until the job reaches a terminal status, and is invalidated
+    then, so no response read while it ran outlives it.
+    """
+    response_cache.job_started(family, job_id)
+    task = asyncio.ensure_future(_follow(family, name, job_id, login))
+    _watchers.add(task)
+    task.add_done_callback(_watchers.discard)
+
+
+async def _follow(family: str, name: str, job_id: str, login: str):
+    give_up_at = time.monotonic() + settings.JOB_WATCH_TIMEOUT
+    try:
+        while time.monotonic() < give_up_at:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            try:
+                response = await proxy.request(
+                    name, "GET", f"/jobs/{job_id}",
+                    headers={INTERNAL_IDENTITY_HEADER: create_internal_identity(login)}
+                )
+            except ServiceException as e:
+                logger.warning(f"Could not poll job {job_id} on {name}: {e.message}")
+                continue
+            # An unknown job is as finished as it will ever be
+            if response.status_code != 200 or response.json().get("status") in TERMINAL_STATUSES:
+                return
+        logger.warning(f"Stopped following job {job_id} on {name} after {settings.JOB_WATCH_TIMEOUT}s")
+    finally:
+        response_cache.job_finished(family, job_id)
+
+
+async def shutdown():
+    for task in list(_watchers):
+        task.cancel()
+    await asyncio.gather(*_watchers, return_exceptions=True)
@@ -1,15 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import timedelta
-import httpx
-import os
-from . import schemas
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import asyncio
+from . import schemas, upstream, proxy, resilience, jobs
+from .cache import CacheInvalidationMiddleware, response_cache
+from .singleflight import single_flight
+from .batching import BatchLoader
+from .ratelimit import RateLimitMiddleware, rate_limiter, concurrency_limiter
 from .config import settings
 from shared.auth import (
-    Token, User, create_access_token, verify_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    Token, TokenData, bearer_identity, create_internal_identity, INTERNAL_IDENTITY_HEADER
 )
+from shared.error_handling import ServiceException, NotFoundError, ErrorCode
+from shared.fields import parse_fields, project
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream.startup()
+    yield
+    await jobs.shutdown()
+    await upstream.shutdown()
 
 app = FastAPI(
     title="Organization Management Gateway",
@@ -23,8 +36,13 @@ app = FastAPI(
         {
             "name": "members",
             "description": "Operations with members"
+        },
+        {
+            "name": "overview",
+            "description": "Members and feedback in a single response"
         }
-    ]
+    ],
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -36,6 +54,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Drop cached GET responses when a write for the same resource goes through
+app.add_middleware(CacheInvalidationMiddleware, cache=response_cache)
+
+# Outermost: reject or queue requests before any other work is done
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, concurrency=concurrency_limiter)
+
+# HTTP status returned by the gateway for each service error code
+ERROR_STATUS_CODES = {
+    ErrorCode.CONNECTION_ERROR: status.HTTP_503_SERVICE_UNAVAILABLE,
+    ErrorCode.RATE_LIMIT_ERROR: status.HTTP_429_TOO_MANY_REQUESTS,
+    ErrorCode.AUTHENTICATION_ERROR: status.HTTP_401_UNAUTHORIZED,
+    ErrorCode.AUTHORIZATION_ERROR: status.HTTP_403_FORBIDDEN,
+    ErrorCode.NOT_FOUND_ERROR: status.HTTP_404_NOT_FOUND,
+    ErrorCode.IDEMPOTENCY_KEY_CONFLICT: status.HTTP_409_CONFLICT,
+}
+
+@app.exception_handler(ServiceException)
+async def service_exception_handler(request, exc: ServiceException):
+    headers = {}
+    if "retry_after" in exc.details:
+        headers["Retry-After"] = str(max(1, round(exc.details["retry_after"])))
+    return JSONResponse(
+        status_code=ERROR_STATUS_CODES.get(exc.error_code, status.HTTP_400_BAD_REQUEST),
+        content={
+            "error_code": exc.error_code.value if isinstance(exc.error_code, ErrorCode) else exc.error_code,
+            "message": exc.message,
+            "details": exc.details
+        },
+        headers=headers
+    )
+
 # Configure OAuth2 with password flow
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="token",
@@ -47,121 +96,372 @@ oauth2_scheme = OAuth2PasswordBearer(
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{settings.MEMBER_SERVICE_URL}/token",
-            data={"username": form_data.username, "password": form_data.password}
+    response = await proxy.request(
+        upstream.MEMBER_SERVICE, "POST", "/token",
+        data={"username": form_data.username, "password": form_data.password}
+    )
+    if response.status_code in (status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_503_SERVICE_UNAVAILABLE):
+        # An overloaded member-service is not a wrong password: let the client retry
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers=proxy.response_headers(response),
+        )
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return response.json()
+
+async def authenticate(request: Request, token: str = Depends(oauth2_scheme)) -> TokenData:
+    """
+    Verify the caller's JWT once at the edge; invalid tokens never reach the
+    services. The rate limiter has usually verified it already for this
+    request, and that outcome is reused. The token parameter only makes a
+    missing token a 401 and documents the scheme.
+    """
+    identity = bearer_identity(request.scope)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return response.json()
+    return identity
+
+def _auth_headers(identity: TokenData) -> dict:
+    return {INTERNAL_IDENTITY_HEADER: create_internal_identity(identity.login)}
+
+def _auth_subject(identity: TokenData) -> str:
+    return identity.login
+
+# Upstream that runs the jobs listed under /jobs/{family}/
+JOB_UPSTREAMS = {
+    "members": upstream.MEMBER_SERVICE,
+    "feedback": upstream.FEEDBACK_SERVICE,
+}
+
+def _job_started(response: Response, family: str, identity: TokenData) -> Response:
+    """
+    Point the Location of a job started upstream at the gateway's route for
+    it, and follow the job so that cached responses do not outlive its writes.
+    """
+    location = response.headers.get("location", "")
+    if response.status_code == status.HTTP_202_ACCEPTED and location.startswith("/jobs/"):
+        job_id = location[len("/jobs/"):]
+        response.headers["location"] = f"/jobs/{family}/{job_id}"
+        jobs.watch(family, JOB_UPSTREAMS[family], job_id, identity.login)
+    return response
+
+def _query_params(**params) -> dict:
+    return {name: value for name, value in params.items() if value is not None}
+
+@app.get("/internal/metrics", tags=["internal"])
+async def get_metrics():
+    return {
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "member_loader": member_loader.stats(),
+        "upstreams": resilience.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "concurrency": concurrency_limiter.stats()
+    }
 
 @app.post("/members/", tags=["members"])
 async def create_member(
     member_data: schemas.MemberCreate,
-    token: str = Depends(oauth2_scheme)
+    idempotency_key: Optional[str] = Header(None, alias=resilience.IDEMPOTENCY_KEY_HEADER),
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{settings.MEMBER_SERVICE_URL}/members/",
-            json=member_data.dict(),
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json()
+    headers = _auth_headers(identity)
+    if idempotency_key:
+        # Lets the gateway retry the create safely
+        headers[resilience.IDEMPOTENCY_KEY_HEADER] = idempotency_key
+    return await proxy.stream(
+        upstream.MEMBER_SERVICE, "POST", "/members/",
+        json=member_data.dict(),
+        headers=headers
+    )
+
+@app.post("/members/bulk", tags=["members"])
+async def bulk_create_members(
+    request: Request,
+    identity: TokenData = Depends(authenticate)
+):
+    """
+    Import many members from a JSON array or an NDJSON stream. The body is
+    streamed to member-service as it arrives; the response is a per-row report.
+    """
+    headers = _auth_headers(identity)
+    headers["Content-Type"] = request.headers.get("content-type", "application/json")
+    return await proxy.stream(
+        upstream.MEMBER_SERVICE, "POST", "/members/bulk",
+        content=request.stream(),
+        headers=headers,
+        deadline=settings.BULK_IMPORT_DEADLINE
+    )
 
 @app.get("/members/", tags=["members"])
 async def get_members(
-    token: str = Depends(oauth2_scheme)
-):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{settings.MEMBER_SERVICE_URL}/members/",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid authentication credentials",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=str(e)
-            )
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    return await proxy.cached_get(
+        upstream.MEMBER_SERVICE, "/members/", _auth_subject(identity),
+        params=_query_params(limit=limit, cursor=cursor, fields=fields),
+        headers=_auth_headers(identity)
+    )
+
+@app.get("/members/search", tags=["members"])
+async def search_members(
+    q: str,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    return await proxy.cached_get(
+        upstream.MEMBER_SERVICE, "/members/search", _auth_subject(identity),
+        params=_query_params(q=q, limit=limit, offset=offset, fields=fields),
+        headers=_auth_headers(identity)
+    )
+
+async def _load_members(login: str, member_ids: List[int]) -> Dict[int, Any]:
+    """Resolve one batch of member ids, for the caller with this login, in a single upstream call."""
+    response = await proxy.request(
+        upstream.MEMBER_SERVICE, "GET", "/members/batch",
+        params={"ids": ",".join(map(str, member_ids))},
+        headers={INTERNAL_IDENTITY_HEADER: create_internal_identity(login)}
+    )
+    body = response.json()
+    if response.status_code != status.HTTP_200_OK:
+        error_codes = {code.value for code in ErrorCode}
+        raise ServiceException(
+            body.get("message", "Failed to load members"),
+            ErrorCode(body["error_code"]) if body.get("error_code") in error_codes else ErrorCode.INTERNAL_ERROR,
+            body.get("details") or {"status_code": response.status_code}
+        )
+    return {member["id"]: member for member in body["members"]}
+
+member_loader = BatchLoader(_load_members, settings.MEMBER_BATCH_WINDOW, settings.MEMBER_BATCH_MAX_IDS)
+
+@app.get("/members/batch", tags=["members"])
+async def get_members_batch(
+    ids: str,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    return await proxy.cached_get(
+        upstream.MEMBER_SERVICE, "/members/batch", _auth_subject(identity),
+        params=_query_params(ids=ids, fields=fields),
+        headers=_auth_headers(identity)
+    )
+
+@app.post("/members/batch", tags=["members"])
+async def post_members_batch(
+    request: Request,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    headers = _auth_headers(identity)
+    headers["Content-Type"] = "application/json"
+    return await proxy.stream(
+        upstream.MEMBER_SERVICE, "POST", "/members/batch",
+        content=await request.body(),
+        params=_query_params(fields=fields),
+        headers=headers
+    )
+
+# Fields of a member as returned by member-service
+MEMBER_FIELDS = [
+    "first_name", "last_name", "login", "avatar_url", "followers", "following", "title", "email",
+    "id", "is_deleted", "created_at", "updated_at",
+]
+
+@app.get("/members/{member_id}", tags=["members"])
+async def get_member(
+    member_id: int,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    """
+    Lookups arriving together are resolved with one GET /members/batch call
+    to member-service instead of one call per id. The batch loads whole
+    members, so `fields` is applied here.
+    """
+    selected = parse_fields(fields, MEMBER_FIELDS)
+    member = await member_loader.load(identity.login, member_id)
+    if member is None:
+        raise NotFoundError(f"Member with id {member_id} not found", {"service": upstream.MEMBER_SERVICE})
+    return project(member, selected) if selected else member
 
 @app.delete("/members/", tags=["members"])
 async def delete_members(
-    token: str = Depends(oauth2_scheme)
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f"{settings.MEMBER_SERVICE_URL}/members/",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json()
+    """Starts a background job (202); poll the Location header, /jobs/members/{job_id}."""
+    return _job_started(await proxy.stream(
+        upstream.MEMBER_SERVICE, "DELETE", "/members/",
+        headers=_auth_headers(identity)
+    ), "members", identity)
 
 @app.post("/feedback/", tags=["feedback"])
 async def create_feedback(
     feedback_data: schemas.FeedbackCreate,
-    token: str = Depends(oauth2_scheme)
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{settings.FEEDBACK_SERVICE_URL}/feedback/",
-            json=feedback_data.dict(),
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json()
+    return await proxy.stream(
+        upstream.FEEDBACK_SERVICE, "POST", "/feedback/",
+        json=feedback_data.dict(),
+        headers=_auth_headers(identity)
+    )
 
 @app.get("/feedback/", tags=["feedback"])
 async def get_feedback(
-    token: str = Depends(oauth2_scheme)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{settings.FEEDBACK_SERVICE_URL}/feedback/",
-            headers={"Authorization": f"Bearer {token}"}
+    """
+    One page of feedback (follow the X-Next-Cursor header), or with
+    stream=true all of it as NDJSON, relayed as it arrives and never cached.
+    """
+    if stream:
+        return await proxy.stream(
+            upstream.FEEDBACK_SERVICE, "GET", "/feedback/",
+            params=_query_params(fields=fields, stream="true"),
+            headers=_auth_headers(identity)
         )
-        return response.json()
+    return await proxy.cached_get(
+        upstream.FEEDBACK_SERVICE, "/feedback/", _auth_subject(identity),
+        params=_query_params(limit=limit, cursor=cursor, fields=fields),
+        headers=_auth_headers(identity)
+    )
+
+@app.get("/feedback/search", tags=["feedback"])
+async def search_feedback(
+    q: str,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    return await proxy.cached_get(
+        upstream.FEEDBACK_SERVICE, "/feedback/search", _auth_subject(identity),
+        params=_query_params(q=q, limit=limit, offset=offset, created_from=created_from,
+                             created_to=created_to, fields=fields),
+        headers=_auth_headers(identity)
+    )
+
+@app.get("/feedback/stats", tags=["feedback"])
+async def get_feedback_stats(
+    interval: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    identity: TokenData = Depends(authenticate)
+):
+    return await proxy.cached_get(
+        upstream.FEEDBACK_SERVICE, "/feedback/stats", _auth_subject(identity),
+        params=_query_params(interval=interval, created_from=created_from, created_to=created_to),
+        headers=_auth_headers(identity)
+    )
 
 @app.delete("/feedback/", tags=["feedback"])
 async def delete_feedback(
-    token: str = Depends(oauth2_scheme)
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f"{settings.FEEDBACK_SERVICE_URL}/feedback/",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json()
+    """Starts a background job (202); poll the Location header, /jobs/feedback/{job_id}."""
+    return _job_started(await proxy.stream(
+        upstream.FEEDBACK_SERVICE, "DELETE", "/feedback/",
+        headers=_auth_headers(identity)
+    ), "feedback", identity)
 
 @app.delete("/feedback/{feedback_id}", tags=["feedback"])
 async def delete_feedback_by_id(
     feedback_id: int,
-    token: str = Depends(oauth2_scheme)
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f"{settings.FEEDBACK_SERVICE_URL}/feedback/{feedback_id}",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json()
+    return await proxy.stream(
+        upstream.FEEDBACK_SERVICE, "DELETE", f"/feedback/{feedback_id}",
+        headers=_auth_headers(identity)
+    )
 
 @app.delete("/members/{member_id}", tags=["members"])
 async def delete_member_by_id(
     member_id: int,
-    token: str = Depends(oauth2_scheme)
+    identity: TokenData = Depends(authenticate)
 ):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(
-            f"{settings.MEMBER_SERVICE_URL}/members/{member_id}",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.json() 
\ No newline at end of file
+    return await proxy.stream(
+        upstream.MEMBER_SERVICE, "DELETE", f"/members/{member_id}",
+        headers=_auth_headers(identity)
+    )
+
+@app.get("/jobs/{family}/{job_id}", tags=["jobs"])
+async def get_job(
+    family: str,
+    job_id: str,
+    identity: TokenData = Depends(authenticate)
+):
+    if family not in JOB_UPSTREAMS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return await proxy.stream(
+        JOB_UPSTREAMS[family], "GET", f"/jobs/{job_id}",
+        headers=_auth_headers(identity)
+    )
+
+# Sections of GET /overview and the upstream route each one is read from
+OVERVIEW_SECTIONS = {
+    "members": (upstream.MEMBER_SERVICE, "/members/"),
+    "feedback": (upstream.FEEDBACK_SERVICE, "/feedback/"),
+}
+
+def _overview_error(name: str, outcome) -> dict:
+    if isinstance(outcome, ServiceException):
+        return {
+            "service": name,
+            "status_code": ERROR_STATUS_CODES.get(outcome.error_code, status.HTTP_400_BAD_REQUEST),
+            "error_code": outcome.error_code.value if isinstance(outcome.error_code, ErrorCode) else outcome.error_code,
+            "message": outcome.message,
+            "details": outcome.details
+        }
+    if isinstance(outcome, Exception):
+        return {"service": name, "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": str(outcome)}
+    status_code, body = outcome
+    return {"service": name, "status_code": status_code, "response": body}
+
+@app.get("/overview", tags=["overview"])
+async def get_overview(
+    identity: TokenData = Depends(authenticate)
+):
+    """
+    Read members and feedback concurrently and merge them into one document.
+    A failing upstream leaves its section empty and adds an entry under "errors".
+    """
+    outcomes = await asyncio.gather(
+        *(
+            proxy.get_json(name, path, _auth_subject(identity), headers=_auth_headers(identity))
+            for name, path in OVERVIEW_SECTIONS.values()
+        ),
+        return_exceptions=True
+    )
+    overview = {"errors": {}}
+    for (section, (name, _)), outcome in zip(OVERVIEW_SECTIONS.items(), outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, tuple) and outcome[0] == status.HTTP_200_OK:
+            overview[section] = outcome[1]
+        else:
+            overview[section] = None
+            overview["errors"][section] = _overview_error(name, outcome)
+
+    if len(overview["errors"]) == len(OVERVIEW_SECTIONS):
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=overview)
+    return overview
@@ -0,0 +1,237 @@
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Tuple, Union
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+import json
+import logging
+import httpx
+from shared.error_handling import ConnectionError
+from . import upstream, resilience
+from .cache import response_cache, resource_family
+from .config import settings
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Headers that describe a single hop and must not be forwarded, plus the ones
+# the gateway's own server sets on every response.
+EXCLUDED_RESPONSE_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "date",
+    "server",
+}
+
+
+def response_headers(response: httpx.Response) -> dict:
+    return {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() not in EXCLUDED_RESPONSE_HEADERS
+    }
+
+
+async def stream(name: str, method: str, path: str, **kwargs) -> StreamingResponse:
+    """
+    Forward a request to an upstream and stream its status, headers and raw body
+    bytes back to the caller chunk by chunk, without decoding the payload.
+    Extra keyword arguments are passed to httpx.AsyncClient.build_request.
+    """
+    stack = AsyncExitStack()
+    try:
+        client = await stack.enter_async_context(upstream.client(name))
+        response = await resilience.send(client, name, method, path, **kwargs)
+        stack.push_async_callback(response.aclose)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=response_headers(response),
+        background=BackgroundTask(stack.aclose),
+    )
+
+
+@dataclass
+class UpstreamResult:
+    status_code: int
+    headers: dict
+    body: bytes
+
+
+class OversizedResponse:
+    """
+    An upstream response whose body outgrew the read buffer: the bytes read so
+    far and the still open response, so the rest can be streamed or read
+    without asking the upstream again.
+    """
+
+    def __init__(self, name: str, method: str, path: str, response: httpx.Response, chunks: AsyncIterator[bytes],
+                 head: bytes, stack: AsyncExitStack):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.response = response
+        self.head = head
+        self._chunks = chunks
+        self._stack = stack
+
+    async def _body(self):
+        yield self.head
+        async for chunk in self._chunks:
+            yield chunk
+
+    def streaming_response(self) -> StreamingResponse:
+        return StreamingResponse(
+            self._body(),
+            status_code=self.response.status_code,
+            headers=response_headers(self.response),
+            background=BackgroundTask(self.aclose),
+        )
+
+    async def read(self) -> bytes:
+        try:
+            rest = b"".join([chunk async for chunk in self._chunks])
+        except httpx.HTTPError as e:
+            raise _read_failed(self.name, self.method, self.path, e)
+        finally:
+            await self.aclose()
+        return self.head + rest
+
+    async def aclose(self):
+        await self._stack.aclose()
+
+
+async def fetch(name: str, method: str, path: str, max_bytes: int, **kwargs) -> Union[UpstreamResult, OversizedResponse]:
+    """
+    Read a whole upstream response into memory. As soon as the body grows past
+    max_bytes, stop reading and return it as an OversizedResponse instead, which
+    the caller must stream, read or close.
+    """
+    stack = AsyncExitStack()
+    try:
+        client = await stack.enter_async_context(upstream.client(name))
+        response = await resilience.send(client, name, method, path, **kwargs)
+        stack.push_async_callback(response.aclose)
+        chunks = response.aiter_raw()
+        body = bytearray()
+        try:
+            async for chunk in chunks:
+                body += chunk
+                if len(body) > max_bytes:
+                    return OversizedResponse(name, method, path, response, chunks, bytes(body), stack)
+        except httpx.HTTPError as e:
+            raise _read_failed(name, method, path, e)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    await stack.aclose()
+    return UpstreamResult(response.status_code, response_headers(response), bytes(body))
+
+
+async def request(name: str, method: str, path: str, **kwargs) -> httpx.Response:
+    """Send a request to an upstream and read its whole response."""
+    async with upstream.client(name) as client:
+        response = await resilience.send(client, name, method, path, **kwargs)
+        try:
+            await response.aread()
+        except httpx.HTTPError as e:
+            raise _read_failed(name, method, path, e)
+        finally:
+            await response.aclose()
+    return response
+
+
+def _read_failed(name: str, method: str, path: str, error: httpx.HTTPError) -> ConnectionError:
+    resilience.breaker(name).record_failure()
+    logger.error(f"Upstream {name} response to {method} {path} could not be read: {str(error)}")
+    return ConnectionError(f"{name} is unavailable", {"service": name, "error": str(error)})
+
+
+async def _cached_fetch(name: str, path: str, subject: str, **kwargs) -> Tuple[Union[UpstreamResult, OversizedResponse, None], bool]:
+    """
+    Load an idempotent GET through the response cache. On a miss, concurrent
+    identical requests share one upstream call. The cache and flight keys are
+    the route, query and auth subject: every caller is served only what was
+    fetched under its own identity, even where the upstream answers all
+    callers alike, so a response is never shared across users.
+
+    Returns (result, cache_hit). A response too large to buffer is returned as
+    an OversizedResponse to the caller that started the call, and as None to
+    the callers that joined it, which must request their own copy.
+    """
+    query = str(httpx.QueryParams(kwargs.get("params")))
+    key = response_cache.key(path, query, subject)
+    if settings.RESPONSE_CACHE_ENABLED:
+        entry = response_cache.get(key)
+        if entry is not None:
+            return UpstreamResult(entry.status_code, entry.headers, entry.body), True
+
+    family = resource_family(path)
+    generation = response_cache.generation(family)
+    max_bytes = settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+    leader = not settings.SINGLE_FLIGHT_ENABLED
+    abandoned = False
+
+    async def load():
+        result = await fetch(name, "GET", path, max_bytes, **kwargs)
+        if abandoned and isinstance(result, OversizedResponse):
+            # Nobody is left to stream the open response
+            await result.aclose()
+        return result
+
+    def lead():
+        nonlocal leader
+        leader = True
+        return load()
+
+    if settings.SINGLE_FLIGHT_ENABLED:
+        try:
+            # Readers arriving after a write must not join a call started before it
+            result = await single_flight.do(f"{key}#{generation}", lead)
+        except asyncio.CancelledError:
+            abandoned = leader
+            raise
+    else:
+        result = await load()
+
+    if isinstance(result, OversizedResponse):
+        return (result if leader else None), False
+    if result.status_code == 200 and settings.RESPONSE_CACHE_ENABLED:
+        response_cache.put(key, result.status_code, result.headers, result.body, family, generation)
+    return result, False
+
+
+async def cached_get(name: str, path: str, subject: str, **kwargs) -> Response:
+    """Serve a GET from the cache, or from the upstream; large responses are streamed uncached."""
+    result, hit = await _cached_fetch(name, path, subject, **kwargs)
+    if result is None:
+        response = await stream(name, "GET", path, **kwargs)
+    elif isinstance(result, OversizedResponse):
+        response = result.streaming_response()
+    else:
+        response = Response(content=result.body, status_code=result.status_code, headers=result.headers)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
+
+async def get_json(name: str, path: str, subject: str, **kwargs) -> Tuple[int, Any]:
+    """Like cached_get, but return the upstream status code and decoded JSON body."""
+    result, _ = await _cached_fetch(name, path, subject, **kwargs)
+    if result is None:
+        response = await request(name, "GET", path, **kwargs)
+        return response.status_code, response.json()
+    if isinstance(result, OversizedResponse):
+        return result.response.status_code, json.loads(await result.read())
+    return result.status_code, json.loads(result.body)
@@ -0,0 +1,220 @@
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
+import asyncio
+import logging
+import re
+import time
+from fastapi.responses import JSONResponse
+from shared.auth import bearer_identity
+from shared.error_handling import RateLimitError, ErrorCode
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Paths that are never limited, so the gateway stays observable under load
+EXEMPT_PATHS = {"/internal/metrics"}
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token. Returns 0 when allowed, otherwise seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per client and route. The least recently seen buckets are
+    dropped once more than max_buckets are tracked.
+    """
+
+    def __init__(self, rate: float, burst: int, route_limits: Dict[str, float], max_buckets: int):
+        self.rate = rate
+        self.burst = burst
+        self.route_limits = route_limits
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, client: str, route: str) -> float:
+        key = (client, route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self.route_limits.get(route)
+            bucket = TokenBucket(rate, max(1, rate * 2)) if rate else TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        retry_after = bucket.take()
+        if retry_after:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "rejected": self.rejected, "tracked_buckets": len(self._buckets)}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps requests in progress. Requests over the cap wait in a bounded FIFO queue
+    for at most queue_timeout seconds; when the queue is full they are rejected
+    immediately instead of letting latency grow without limit.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if waiter.done():
+            return True
+        self._abandon(waiter)
+        self.timed_out += 1
+        return False
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter so it cannot be overtaken
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the wait ended; pass it on
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+def route_key(method: str, path: str) -> str:
+    """Group requests by route, e.g. DELETE /members/5 -> DELETE /members/{id}."""
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def client_key(scope) -> str:
+    """
+    Identify the caller by the login of a valid bearer token, otherwise by
+    address. Made-up or expired tokens share their address's buckets, so
+    changing the token on every request does not reset the limits. The
+    verified token is kept in the request state for authentication to reuse.
+    """
+    identity = bearer_identity(scope)
+    if identity is not None:
+        return f"user:{identity.login}"
+    client = scope.get("client")
+    return f"address:{client[0]}" if client else "anonymous"
+
+
+def _rejection(status_code: int, error: RateLimitError, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "error_code": ErrorCode.RATE_LIMIT_ERROR.value,
+            "message": error.message,
+            "details": error.details
+        },
+        headers={"Retry-After": str(max(1, round(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that applies the rate limiter (429 when a bucket is empty)
+    and the concurrency limiter (503 when the gateway is saturated).
+    """
+
+    def __init__(self, app, limiter: RateLimiter, concurrency: ConcurrencyLimiter):
+        self.app = app
+        self.limiter = limiter
+        self.concurrency = concurrency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_key(scope["method"], scope["path"])
+        retry_after = self.limiter.check(client_key(scope), route)
+        if retry_after:
+            error = RateLimitError("Rate limit exceeded", {"route": route, "retry_after": round(retry_after, 2)})
+            await _rejection(429, error, retry_after)(scope, receive, send)
+            return
+
+        if not await self.concurrency.acquire():
+            logger.warning(f"Shedding {route}: gateway is saturated")
+            error = RateLimitError("Gateway is overloaded, try again later", {"route": route})
+            await _rejection(503, error, 1)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency.release()
+
+
+rate_limiter = RateLimiter(
+    rate=settings.RATE_LIMIT_REQUESTS_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+    route_limits=settings.RATE_LIMIT_ROUTE_LIMITS,
+    max_buckets=settings.RATE_LIMIT_MAX_TRACKED_CLIENTS,
+)
+
+concurrency_limiter = ConcurrencyLimiter(
+    max_concurrent=settings.MAX_CONCURRENT_REQUESTS,
+    max_queue=settings.MAX_QUEUED_REQUESTS,
+    queue_timeout=settings.QUEUE_TIMEOUT,
+)
@@ -0,0 +1,241 @@
+from enum import Enum
+from typing import Dict, Optional
+import asyncio
+import logging
+import random
+import time
+import httpx
+from shared.deadline import REQUEST_TIMEOUT_HEADER
+from shared.error_handling import ConnectionError
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Remaining time budget of the gateway request, passed down to the upstream,
+# which gives up on the request once it runs out (shared.deadline)
+DEADLINE_HEADER = REQUEST_TIMEOUT_HEADER
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Other requests are safe to retry when the upstream deduplicates them by this key
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after consecutive failures. While open every call
+    fails fast; after the recovery timeout a limited number of trial calls decide
+    whether the circuit closes again or re-opens.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+
+    def before_call(self):
+        now = time.monotonic()
+        if self.state == CircuitState.OPEN and now - self.opened_at >= self.recovery_timeout:
+            self._transition(CircuitState.HALF_OPEN)
+            self.opened_at = now
+            self.half_open_calls = 0
+        if self.state == CircuitState.HALF_OPEN and now - self.opened_at >= self.recovery_timeout:
+            # Trial calls that never reported back must not keep the circuit stuck
+            self.opened_at = now
+            self.half_open_calls = 0
+        if self.state == CircuitState.OPEN or (
+            self.state == CircuitState.HALF_OPEN and self.half_open_calls >= self.half_open_max_calls
+        ):
+            self.rejected += 1
+            retry_after = max(0.0, self.recovery_timeout - (now - self.opened_at))
+            raise ConnectionError(
+                f"{self.name} is unavailable",
+                {"service": self.name, "circuit": self.state.value, "retry_after": round(retry_after, 1)}
+            )
+        if self.state == CircuitState.HALF_OPEN:
+            self.half_open_calls += 1
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                self._transition(CircuitState.OPEN)
+            self.opened_at = time.monotonic()
+
+    def _transition(self, state: CircuitState):
+        logger.warning(f"Circuit for {self.name} changed from {self.state.value} to {state.value}")
+        self.state = state
+
+    def stats(self) -> dict:
+        return {"state": self.state.value, "failures": self.failures, "rejected": self.rejected}
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of the original requests, plus a small floor per
+    second, so retries cannot multiply load on an upstream that is struggling.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(10.0, min_per_second * 10)
+        self.tokens = self.max_tokens
+        self.updated_at = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def stats(self) -> dict:
+        return {"tokens": round(self.tokens, 2), "retries": self.retries, "exhausted": self.exhausted}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+        )
+    return _breakers[name]
+
+
+def retry_budget(name: str) -> RetryBudget:
+    if name not in _budgets:
+        _budgets[name] = RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_PER_SECOND)
+    return _budgets[name]
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+def _attempt_timeout(client: httpx.AsyncClient, remaining: float, read: Optional[float] = None) -> httpx.Timeout:
+    configured = client.timeout
+    return httpx.Timeout(
+        min(read or configured.read or remaining, remaining),
+        connect=min(configured.connect or remaining, remaining),
+        write=min(configured.write or remaining, remaining),
+        pool=min(configured.pool or remaining, remaining),
+    )
+
+
+async def send(client: httpx.AsyncClient, name: str, method: str, path: str,
+               deadline: Optional[float] = None, **kwargs) -> httpx.Response:
+    """
+    Send a request through the upstream's circuit breaker within the gateway's
+    deadline, retrying idempotent requests with jitter while the retry budget
+    allows. Returns a streamed response that the caller must close.
+    A longer deadline (seconds) may be given for slow operations; it also
+    replaces the upstream's read timeout.
+    """
+    circuit = breaker(name)
+    budget = retry_budget(name)
+    budget.deposit()
+    long_running = deadline is not None
+    timeout_seconds = deadline if long_running else settings.UPSTREAM_REQUEST_DEADLINE
+    deadline = time.monotonic() + timeout_seconds
+    headers = dict(kwargs.pop("headers", None) or {})
+    retryable = method.upper() in IDEMPOTENT_METHODS or any(
+        key.lower() == IDEMPOTENCY_KEY_HEADER.lower() for key in headers
+    )
+    attempt = 0
+
+    while True:
+        circuit.before_call()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ConnectionError(
+                f"{name} did not respond within the request deadline",
+                {"service": name, "deadline": timeout_seconds}
+            )
+        headers[DEADLINE_HEADER] = str(int(remaining * 1000))
+        timeout = _attempt_timeout(client, remaining, read=remaining if long_running else None)
+        request = client.build_request(method, path, headers=headers, timeout=timeout, **kwargs)
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError as e:
+            circuit.record_failure()
+            logger.warning(f"Upstream {name} request {method} {path} failed (attempt {attempt + 1}): {str(e)}")
+            error = e
+            response = None
+        else:
+            if response.status_code < 500:
+                circuit.record_success()
+                return response
+            circuit.record_failure()
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            error = None
+
+        delay = _backoff(attempt)
+        can_retry = (
+            retryable
+            and attempt < settings.RETRY_MAX_ATTEMPTS
+            and deadline - time.monotonic() > delay
+            and budget.withdraw()
+        )
+        if not can_retry:
+            if response is not None:
+                return response
+            raise ConnectionError(
+                f"{name} is unavailable",
+                {"service": name, "error": str(error)}
+            )
+        if response is not None:
+            await response.aclose()
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def reset():
+    """Forget all circuit and retry budget state."""
+    _breakers.clear()
+    _budgets.clear()
+
+
+def stats() -> dict:
+    return {
+        name: {**breaker(name).stats(), "retry_budget": retry_budget(name).stats()}
+        for name in sorted(set(_breakers) | set(_budgets))
+    }
@@ -0,0 +1,47 @@
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight call whose
+    result (or exception) is handed to every waiter. The shared call runs in its
+    own task, so a waiter that is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieve the exception so it is not reported as unhandled when every
+        # waiter was cancelled before the call completed.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Shared call {key} failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        return {
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,95 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import logging
+import httpx
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MEMBER_SERVICE = "member-service"
+FEEDBACK_SERVICE = "feedback-service"
+
+# Long-lived clients, one per upstream, created in the application lifespan
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _upstream_config(name: str):
+    """Return (base_url, connect_timeout, read_timeout) for an upstream."""
+    if name == MEMBER_SERVICE:
+        return (
+            settings.MEMBER_SERVICE_URL,
+            settings.MEMBER_SERVICE_CONNECT_TIMEOUT,
+            settings.MEMBER_SERVICE_READ_TIMEOUT,
+        )
+    if name == FEEDBACK_SERVICE:
+        return (
+            settings.FEEDBACK_SERVICE_URL,
+            settings.FEEDBACK_SERVICE_CONNECT_TIMEOUT,
+            settings.FEEDBACK_SERVICE_READ_TIMEOUT,
+        )
+    raise ValueError(f"Unknown upstream: {name}")
+
+
+def _http2_enabled() -> bool:
+    if not settings.UPSTREAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("UPSTREAM_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def build_client(name: str, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Build a pooled client for an upstream. A custom transport (e.g. httpx.ASGITransport)
+    replaces the network pool, so limits and HTTP/2 only apply to the default transport.
+    """
+    base_url, connect_timeout, read_timeout = _upstream_config(name)
+    return httpx.AsyncClient(
+        base_url=base_url,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            read_timeout,
+            connect=connect_timeout,
+            pool=settings.UPSTREAM_POOL_TIMEOUT,
+        ),
+        http2=_http2_enabled(),
+        transport=transport,
+    )
+
+
+async def startup(transports: Optional[Dict[str, httpx.AsyncBaseTransport]] = None):
+    """Create one long-lived client per upstream."""
+    transports = transports or {}
+    for name in (MEMBER_SERVICE, FEEDBACK_SERVICE):
+        if name not in _clients:
+            _clients[name] = build_client(name, transports.get(name))
+            logger.info(f"Upstream client for {name} started")
+
+
+async def shutdown():
+    """Close all upstream clients and release their pooled connections."""
+    while _clients:
+        name, client = _clients.popitem()
+        await client.aclose()
+        logger.info(f"Upstream client for {name} closed")
+
+
+@asynccontextmanager
+async def client(name: str):
+    """
+    Yield the pooled client for an upstream. When the lifespan has not run
+    (e.g. TestClient used without a context manager) a one-off client is used.
+    """
+    pooled = _clients.get(name)
+    if pooled is not None:
+        yield pooled
+        return
+    async with build_client(name) as temporary:
+        yield temporary
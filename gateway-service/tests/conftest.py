@@ -0,0 +1,187 @@
+import os
+
+# Settings are read when app.config is imported, so provide defaults up front
+os.environ.setdefault("MEMBER_SERVICE_URL", "http://localhost:8002")
+os.environ.setdefault("FEEDBACK_SERVICE_URL", "http://localhost:8001")
+os.environ.setdefault("SECRET_KEY", "your-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from collections import Counter
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+def build_stub_upstream():
+    """A stand-in for member-service and feedback-service that counts its calls."""
+    stub = FastAPI()
+    stub.state.calls = Counter()
+    stub.state.delay = 0
+    stub.state.failures = 0
+    stub.state.last_headers = None
+    stub.state.job_status = "succeeded"
+    stub.state.token_status = 200
+    stub.state.in_flight = 0
+    stub.state.peak_in_flight = 0
+    # When set, reads wait (up to 1s) until this many requests are in flight
+    stub.state.barrier = None
+
+    async def serve_read():
+        stub.state.in_flight += 1
+        stub.state.peak_in_flight = max(stub.state.peak_in_flight, stub.state.in_flight)
+        try:
+            for _ in range(100):
+                if not stub.state.barrier or stub.state.peak_in_flight >= stub.state.barrier:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(stub.state.delay)
+        finally:
+            stub.state.in_flight -= 1
+
+    @stub.get("/members/")
+    async def stub_members(request: Request, response: Response):
+        stub.state.calls["GET /members/"] += 1
+        stub.state.last_headers = request.headers
+        await serve_read()
+        if "limit" in request.query_params:
+            limit = int(request.query_params["limit"])
+            start = int(request.query_params.get("cursor", 0))
+            response.headers["X-Next-Cursor"] = str(start + limit)
+            members = [{"id": i, "login": f"member{i}"} for i in range(start, start + limit)]
+            if "fields" in request.query_params:
+                fields = request.query_params["fields"].split(",")
+                members = [{name: member[name] for name in fields} for member in members]
+            return members
+        return [{"id": i, "login": f"member{i}"} for i in range(5000)]
+
+    @stub.get("/members/search")
+    async def stub_search_members(request: Request):
+        stub.state.calls["GET /members/search"] += 1
+        q = request.query_params["q"]
+        return [{"id": i, "login": f"member{i}"} for i in range(10) if f"member{i}".startswith(q)]
+
+    @stub.get("/members/batch")
+    async def stub_members_batch(request: Request):
+        stub.state.calls["GET /members/batch"] += 1
+        stub.state.last_headers = request.headers
+        ids = [int(member_id) for member_id in request.query_params["ids"].split(",")]
+        return {
+            "members": [{"id": i, "login": f"member{i}"} for i in ids if i < 5000],
+            "missing": [i for i in ids if i >= 5000],
+        }
+
+    @stub.post("/members/batch")
+    async def stub_post_members_batch(request: Request):
+        stub.state.calls["POST /members/batch"] += 1
+        ids = (await request.json())["ids"]
+        return {"members": [{"id": i, "login": f"member{i}"} for i in ids if i < 5000], "missing": []}
+
+    @stub.post("/members/", status_code=201)
+    async def stub_create_member(request: Request, response: Response):
+        stub.state.calls["POST /members/"] += 1
+        stub.state.last_headers = request.headers
+        if stub.state.failures:
+            stub.state.failures -= 1
+            response.status_code = 503
+            return {"detail": "Service unavailable"}
+        response.headers["X-Upstream"] = "member-service"
+        return {"id": 1}
+
+    @stub.post("/members/bulk")
+    async def stub_bulk_members(request: Request):
+        stub.state.calls["POST /members/bulk"] += 1
+        chunks = [chunk async for chunk in request.stream()]
+        return {
+            "content_type": request.headers.get("content-type"),
+            "lines": b"".join(chunks).count(b"\n"),
+        }
+
+    @stub.delete("/members/", status_code=202)
+    async def stub_delete_members(response: Response):
+        stub.state.calls["DELETE /members/"] += 1
+        response.headers["Location"] = "/jobs/job1"
+        return {"job_id": "job1", "status": "pending"}
+
+    @stub.post("/token")
+    async def stub_token(response: Response):
+        stub.state.calls["POST /token"] += 1
+        if stub.state.token_status == 429:
+            response.status_code = 429
+            response.headers["Retry-After"] = "1"
+            return {"error_code": 1009, "message": "Too many password operations in progress, try again later"}
+        if stub.state.token_status != 200:
+            response.status_code = stub.state.token_status
+            return {"detail": "Incorrect username or password"}
+        return {"access_token": "token", "token_type": "bearer"}
+
+    @stub.get("/jobs/{job_id}")
+    async def stub_job(job_id: str):
+        stub.state.calls["GET /jobs/"] += 1
+        return {"id": job_id, "status": stub.state.job_status, "total": 3, "processed": 3}
+
+    @stub.get("/feedback/")
+    async def stub_feedback(request: Request, response: Response):
+        stub.state.calls["GET /feedback/"] += 1
+        await serve_read()
+        if stub.state.failures:
+            stub.state.failures -= 1
+            response.status_code = 503
+            return {"detail": "Service unavailable"}
+        if request.query_params.get("stream") == "true":
+            lines = (f'{{"id": {i}}}\n'.encode() for i in range(1000))
+            return StreamingResponse(lines, media_type="application/x-ndjson")
+        if "limit" in request.query_params:
+            limit = int(request.query_params["limit"])
+            start = int(request.query_params.get("cursor", 0))
+            response.headers["X-Next-Cursor"] = str(start + limit)
+            return [{"id": i} for i in range(start, start + limit)]
+        return [{"id": 1, "feedback": "Great team culture and work environment!"}]
+
+    @stub.get("/feedback/search")
+    async def stub_search_feedback(request: Request):
+        stub.state.calls["GET /feedback/search"] += 1
+        return {"query": dict(request.query_params)}
+
+    @stub.get("/feedback/stats")
+    async def stub_feedback_stats(request: Request):
+        stub.state.calls["GET /feedback/stats"] += 1
+        return {"interval": request.query_params.get("interval", "day"), "created": 3, "active": 2, "deleted": 1}
+
+    return stub
+
+@pytest.fixture
+def auth_headers():
+    """Build headers carrying a valid access token for the given login."""
+    from shared.auth import create_access_token
+
+    def build(login: str = "testuser") -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': login})}"}
+    return build
+
+@pytest_asyncio.fixture
+async def stub_upstream():
+    return build_stub_upstream()
+
+@pytest_asyncio.fixture
+async def gateway(stub_upstream):
+    """Gateway client whose upstream clients are routed to the in-process stub."""
+    from app import jobs, upstream, resilience
+    from app.cache import response_cache
+    from app.main import app
+    from app.ratelimit import rate_limiter
+
+    transport = httpx.ASGITransport(app=stub_upstream)
+    await upstream.startup({
+        upstream.MEMBER_SERVICE: transport,
+        upstream.FEEDBACK_SERVICE: transport
+    })
+    response_cache.clear()
+    resilience.reset()
+    rate_limiter._buckets.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+        yield client
+    await jobs.shutdown()
+    await upstream.shutdown()
@@ -0,0 +1,59 @@
+import time
+import pytest
+from shared import auth
+
+def test_internal_identity_round_trip():
+    identity = auth.create_internal_identity("testuser")
+    assert auth.verify_internal_identity(identity).login == "testuser"
+
+def test_forged_or_expired_identity_is_rejected(monkeypatch):
+    identity = auth.create_internal_identity("testuser")
+    encoded_login, expires, signature = identity.split(".")
+    forged = auth.create_internal_identity("admin").split(".")[0]
+    assert auth.verify_internal_identity(f"{forged}.{expires}.{signature}") is None
+    assert auth.verify_internal_identity("not-an-identity") is None
+    monkeypatch.setattr(time, "time", lambda: int(expires) + 1)
+    assert auth.verify_internal_identity(identity) is None
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_rejected_at_the_gateway(gateway, stub_upstream):
+    response = await gateway.get("/members/", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+    assert stub_upstream.state.calls["GET /members/"] == 0
+
+@pytest.mark.asyncio
+async def test_upstream_receives_signed_identity_instead_of_token(gateway, stub_upstream, auth_headers):
+    response = await gateway.get("/members/", headers=auth_headers("testuser"))
+    assert response.status_code == 200
+    forwarded = stub_upstream.state.last_headers
+    assert "authorization" not in forwarded
+    assert auth.verify_internal_identity(forwarded[auth.INTERNAL_IDENTITY_HEADER]).login == "testuser"
+
+@pytest.mark.asyncio
+async def test_login_passes_upstream_overload_through(gateway, stub_upstream):
+    credentials = {"username": "testuser", "password": "testpassword123"}
+    response = await gateway.post("/token", data=credentials)
+    assert response.status_code == 200
+    stub_upstream.state.token_status = 429
+    response = await gateway.post("/token", data=credentials)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    stub_upstream.state.token_status = 400
+    response = await gateway.post("/token", data=credentials)
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_token_is_decoded_once_per_request(gateway, stub_upstream, auth_headers, monkeypatch):
+    headers = auth_headers("testuser")
+    decode = auth.jwt.decode
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    response = await gateway.get("/members/", headers=headers)
+    assert response.status_code == 200
+    assert len(calls) == 1
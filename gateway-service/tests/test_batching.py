@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from app.batching import BatchLoader
+
+def loader_counting(calls, window=0.01, max_batch=100):
+    async def load_batch(group, keys):
+        calls.append((group, keys))
+        await asyncio.sleep(0)
+        return {key: f"{group}:{key}" for key in keys if key < 100}
+    return BatchLoader(load_batch, window=window, max_batch=max_batch)
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_one_batch_per_group():
+    calls = []
+    loader = loader_counting(calls)
+    results = await asyncio.gather(
+        loader.load("alice", 1), loader.load("alice", 2), loader.load("alice", 1),
+        loader.load("bob", 3), loader.load("alice", 500)
+    )
+    assert results == ["alice:1", "alice:2", "alice:1", "bob:3", None]
+    assert sorted(calls) == [("alice", [1, 2, 500]), ("bob", [3])]
+    assert loader.stats()["batches"] == 2
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting_for_the_window():
+    calls = []
+    loader = loader_counting(calls, window=10, max_batch=3)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(loader.load("alice", key) for key in range(3))), timeout=1
+    )
+    assert results == ["alice:0", "alice:1", "alice:2"]
+    assert calls == [("alice", [0, 1, 2])]
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_waiter():
+    async def load_batch(group, keys):
+        raise RuntimeError("member-service is down")
+
+    loader = BatchLoader(load_batch, window=0.01, max_batch=100)
+    results = await asyncio.gather(loader.load("alice", 1), loader.load("alice", 2), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+@pytest.mark.asyncio
+async def test_member_lookups_are_coalesced_into_batch_calls(gateway, stub_upstream, auth_headers, monkeypatch):
+    from app.main import member_loader
+    monkeypatch.setattr(member_loader, "window", 0.05)
+    headers = auth_headers()
+    responses = await asyncio.gather(*(gateway.get(f"/members/{i}", headers=headers) for i in (4, 2, 9000)))
+    assert [response.status_code for response in responses] == [200, 200, 404]
+    assert responses[0].json() == {"id": 4, "login": "member4"}
+    assert responses[2].json()["error_code"] == 1002
+    assert stub_upstream.state.calls["GET /members/batch"] == 1
+    assert "x-internal-identity" in stub_upstream.state.last_headers
+
+@pytest.mark.asyncio
+async def test_member_lookup_projects_requested_fields(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    response = await gateway.get("/members/4", params={"fields": "login"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"login": "member4"}
+
+    response = await gateway.get("/members/4", params={"fields": "login,password"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["details"]["fields"] == ["password"]
+    assert stub_upstream.state.calls["GET /members/batch"] == 1
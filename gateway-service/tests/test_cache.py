@@ -0,0 +1,102 @@
+import time
+import pytest
+from app.cache import ResponseCache
+
+def make_cache(**overrides):
+    options = {"ttl": 30, "max_entries": 3, "max_bytes": 100, "max_entry_bytes": 50}
+    options.update(overrides)
+    return ResponseCache(**options)
+
+def test_lru_eviction_by_entry_count():
+    cache = make_cache()
+    for key in ("a", "b", "c"):
+        cache.put(key, 200, {}, b"x", "members", 0)
+    cache.get("a")
+    cache.put("d", 200, {}, b"x", "members", 0)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_eviction_by_total_bytes():
+    cache = make_cache(max_entries=10)
+    cache.put("a", 200, {}, b"x" * 40, "members", 0)
+    cache.put("b", 200, {}, b"x" * 40, "members", 0)
+    cache.put("c", 200, {}, b"x" * 40, "members", 0)
+    assert cache.get("a") is None
+    assert cache.bytes == 80
+
+def test_oversized_entry_is_not_stored():
+    cache = make_cache()
+    assert not cache.put("a", 200, {}, b"x" * 51, "members", 0)
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl=0.01)
+    cache.put("a", 200, {}, b"x", "members", 0)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_invalidate_drops_family_and_rejects_stale_stores():
+    cache = make_cache()
+    generation = cache.generation("members")
+    cache.put("a", 200, {}, b"x", "members", generation)
+    cache.put("b", 200, {}, b"x", "feedback", 0)
+    cache.invalidate("members")
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    # A read that started before the write must not repopulate the cache
+    assert not cache.put("a", 200, {}, b"x", "members", generation)
+
+@pytest.mark.asyncio
+async def test_gateway_serves_repeated_reads_from_cache(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    first = await gateway.get("/feedback/", headers=headers)
+    second = await gateway.get("/feedback/", headers=headers)
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+    assert stub_upstream.state.calls["GET /feedback/"] == 1
+
+@pytest.mark.asyncio
+async def test_cache_is_keyed_by_auth_subject(gateway, stub_upstream, auth_headers):
+    await gateway.get("/feedback/", headers=auth_headers())
+    response = await gateway.get("/feedback/", headers=auth_headers("otheruser"))
+    assert response.headers["x-cache"] == "MISS"
+    assert stub_upstream.state.calls["GET /feedback/"] == 2
+
+@pytest.mark.asyncio
+async def test_write_invalidates_resource_family(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    await gateway.get("/members/", headers=headers)
+    await gateway.post(
+        "/members/",
+        json={
+            "first_name": "Test",
+            "last_name": "User",
+            "login": "cacheuser",
+            "email": "cache.user@example.com",
+            "password": "testpassword123"
+        },
+        headers=headers
+    )
+    response = await gateway.get("/members/", headers=headers)
+    assert response.headers["x-cache"] == "MISS"
+    assert stub_upstream.state.calls["GET /members/"] == 2
+
+@pytest.mark.asyncio
+async def test_read_only_post_keeps_cached_responses(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    await gateway.get("/members/", headers=headers)
+    batch = await gateway.post("/members/batch", json={"ids": [1, 2]}, headers=headers)
+    assert batch.status_code == 200
+    response = await gateway.get("/members/", headers=headers)
+    assert response.headers["x-cache"] == "HIT"
+    assert stub_upstream.state.calls["GET /members/"] == 1
+
+@pytest.mark.asyncio
+async def test_metrics_expose_cache_counters(gateway, auth_headers):
+    headers = auth_headers()
+    await gateway.get("/feedback/", headers=headers)
+    await gateway.get("/feedback/", headers=headers)
+    stats = (await gateway.get("/internal/metrics")).json()["response_cache"]
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 1
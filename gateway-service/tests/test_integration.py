@@ -82,13 +82,15 @@ def test_create_member_success(client):
             "first_name": "1Test",
             "last_name": "1User",
             "login": "1testuser2",
-            "email": "test.user@example.com",
+            "email": "1test.user2@example.com",
             "password": "testpassword123"
         },
         headers={"Authorization": f"Bearer {token}"}
     )
     print(f"Create Member Response: {response.json()}")
-    assert response.status_code == 200
+    assert response.status_code == 201
+    # Clean up by hard deleting the member
+    client.delete(f"/internal/members/{response.json()['id']}/hard", headers={"Authorization": f"Bearer {token}"})
     
 
 def test_get_members_success(client):
@@ -105,13 +105,13 @@ def test_create_member_success(client):
             "first_name": "Test",
             "last_name": "User",
             "login": "testuser2",
-            "email": "test.user@example.com",
+            "email": "test.user2@example.com",
             "password": "testpassword123"
         },
         headers={"Authorization": f"Bearer {token}"}
     )
     print(f"Create Member Response: {response.json()}")
-    assert response.status_code == 200
+    assert response.status_code == 201
     data = response.json()
     
     # Clean up: Delete the member after test
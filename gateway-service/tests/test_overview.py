@@ -0,0 +1,32 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_overview_merges_both_upstreams(gateway, stub_upstream, auth_headers):
+    response = await gateway.get("/overview", headers=auth_headers())
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["members"]) == 5000
+    assert data["feedback"][0]["id"] == 1
+    assert data["errors"] == {}
+
+@pytest.mark.asyncio
+async def test_overview_returns_partial_results(gateway, stub_upstream, monkeypatch, auth_headers):
+    from app.config import settings
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 0)
+    stub_upstream.state.failures = 1
+    response = await gateway.get("/overview", headers=auth_headers())
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["members"]) == 5000
+    assert data["feedback"] is None
+    assert data["errors"]["feedback"]["service"] == "feedback-service"
+    assert data["errors"]["feedback"]["status_code"] == 503
+
+@pytest.mark.asyncio
+async def test_overview_calls_upstreams_concurrently(gateway, stub_upstream, auth_headers):
+    # Each upstream call holds its response until both have arrived, which
+    # only happens when the gateway does not wait for one before the other
+    stub_upstream.state.barrier = 2
+    response = await gateway.get("/overview", headers=auth_headers())
+    assert response.status_code == 200
+    assert stub_upstream.state.peak_in_flight == 2
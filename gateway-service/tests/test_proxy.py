@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+
+@pytest.mark.asyncio
+async def test_stream_forwards_body_bytes(gateway, auth_headers):
+    response = await gateway.get("/members/", headers=auth_headers())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert len(response.json()) == 5000
+
+@pytest.mark.asyncio
+async def test_stream_forwards_status_and_headers(gateway, auth_headers):
+    response = await gateway.post(
+        "/members/",
+        json={
+            "first_name": "Test",
+            "last_name": "User",
+            "login": "proxyuser",
+            "email": "proxy.user@example.com",
+            "password": "testpassword123"
+        },
+        headers=auth_headers()
+    )
+    assert response.status_code == 201
+    assert response.headers["x-upstream"] == "member-service"
+    assert response.json() == {"id": 1}
+
+@pytest.mark.asyncio
+async def test_large_responses_are_streamed_uncached(gateway, stub_upstream, monkeypatch, auth_headers):
+    from app.config import settings
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024)
+    headers = auth_headers()
+    first = await gateway.get("/members/", headers=headers)
+    second = await gateway.get("/members/", headers=headers)
+    assert len(first.json()) == len(second.json()) == 5000
+    assert second.headers["x-cache"] == "MISS"
+    # Each read streams on from where its buffered attempt passed the limit
+    assert stub_upstream.state.calls["GET /members/"] == 2
+
+@pytest.mark.asyncio
+async def test_member_pages_pass_cursor_through(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    first = await gateway.get("/members/", params={"limit": 2}, headers=headers)
+    assert [m["id"] for m in first.json()] == [0, 1]
+    second = await gateway.get(
+        "/members/", params={"limit": 2, "cursor": first.headers["x-next-cursor"]}, headers=headers
+    )
+    assert [m["id"] for m in second.json()] == [2, 3]
+    assert second.headers["x-next-cursor"] == "4"
+    assert second.headers["x-cache"] == "MISS"
+
+@pytest.mark.asyncio
+async def test_member_fields_pass_through_and_are_cached_separately(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    projected = await gateway.get("/members/", params={"limit": 2, "fields": "id"}, headers=headers)
+    assert projected.json() == [{"id": 0}, {"id": 1}]
+    full = await gateway.get("/members/", params={"limit": 2}, headers=headers)
+    assert full.json()[0] == {"id": 0, "login": "member0"}
+    assert full.headers["x-cache"] == "MISS"
+
+@pytest.mark.asyncio
+async def test_member_search_passes_query_through(gateway, stub_upstream, auth_headers):
+    response = await gateway.get("/members/search", params={"q": "member1"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "login": "member1"}]
+    missing = await gateway.get("/members/search", headers=auth_headers())
+    assert missing.status_code == 422
+    assert stub_upstream.state.calls["GET /members/search"] == 1
+
+@pytest.mark.asyncio
+async def test_feedback_pages_are_cached_and_streams_are_not(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    page = await gateway.get("/feedback/", params={"limit": 2, "cursor": "2"}, headers=headers)
+    assert page.json() == [{"id": 2}, {"id": 3}]
+    assert page.headers["x-next-cursor"] == "4"
+    for _ in range(2):
+        streamed = await gateway.get("/feedback/", params={"stream": "true", "limit": 2}, headers=headers)
+        assert streamed.headers["content-type"] == "application/x-ndjson"
+        assert len(streamed.text.splitlines()) == 1000
+        assert "x-cache" not in streamed.headers
+    assert stub_upstream.state.calls["GET /feedback/"] == 3
+
+@pytest.mark.asyncio
+async def test_feedback_search_passes_query_and_date_range_through(gateway, stub_upstream, auth_headers):
+    params = {"q": "remote work", "created_from": "2024-01-01T00:00:00Z", "limit": 5}
+    response = await gateway.get("/feedback/search", params=params, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.json() == {"query": {"q": "remote work", "limit": "5", "created_from": "2024-01-01T00:00:00Z"}}
+    assert (await gateway.get("/feedback/search", headers=auth_headers())).status_code == 422
+    assert stub_upstream.state.calls["GET /feedback/search"] == 1
+
+@pytest.mark.asyncio
+async def test_feedback_stats_are_cached_and_dropped_on_writes(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    first = await gateway.get("/feedback/stats", params={"interval": "hour"}, headers=headers)
+    assert first.json()["interval"] == "hour"
+    assert (await gateway.get("/feedback/stats", params={"interval": "hour"}, headers=headers)).headers["x-cache"] == "HIT"
+    await gateway.delete("/feedback/1", headers=headers)
+    assert (await gateway.get("/feedback/stats", params={"interval": "hour"}, headers=headers)).headers["x-cache"] == "MISS"
+    assert stub_upstream.state.calls["GET /feedback/stats"] == 2
+
+@pytest.mark.asyncio
+async def test_bulk_delete_returns_gateway_job_location(gateway, stub_upstream, auth_headers):
+    headers = auth_headers()
+    started = await gateway.delete("/members/", headers=headers)
+    assert started.status_code == 202
+    assert started.headers["location"] == "/jobs/members/job1"
+    job = await gateway.get(started.headers["location"], headers=headers)
+    assert job.json()["status"] == "succeeded"
+    assert (await gateway.get("/jobs/unknown/job1", headers=headers)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_family_is_not_cached_until_its_job_finishes(gateway, stub_upstream, auth_headers, monkeypatch):
+    from app.cache import response_cache
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0.01)
+    stub_upstream.state.job_status = "running"
+    headers = auth_headers()
+    assert (await gateway.delete("/members/", headers=headers)).status_code == 202
+    # Rows are still being deleted, so every read goes upstream
+    for _ in range(2):
+        assert (await gateway.get("/members/", headers=headers)).headers["x-cache"] == "MISS"
+    assert response_cache.stats()["running_jobs"] == 1
+
+    stub_upstream.state.job_status = "succeeded"
+    for _ in range(100):
+        if not response_cache.stats()["running_jobs"]:
+            break
+        await asyncio.sleep(0.01)
+    assert response_cache.stats()["running_jobs"] == 0
+    assert (await gateway.get("/members/", headers=headers)).headers["x-cache"] == "MISS"
+    assert (await gateway.get("/members/", headers=headers)).headers["x-cache"] == "HIT"
+    assert stub_upstream.state.calls["GET /members/"] == 3
+
+@pytest.mark.asyncio
+async def test_bulk_import_streams_request_body(gateway, stub_upstream, auth_headers):
+    async def ndjson():
+        for i in range(1000):
+            yield f'{{"login": "member{i}"}}\n'.encode()
+
+    response = await gateway.post(
+        "/members/bulk",
+        content=ndjson(),
+        headers={**auth_headers(), "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"content_type": "application/x-ndjson", "lines": 1000}
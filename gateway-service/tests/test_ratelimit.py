@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from app.ratelimit import ConcurrencyLimiter, RateLimiter, client_key, route_key
+
+def test_route_key_groups_ids():
+    assert route_key("DELETE", "/members/42") == "DELETE /members/{id}"
+    assert route_key("GET", "/members/") == "GET /members/"
+
+def test_client_key_trusts_only_valid_tokens(auth_headers):
+    def scope(authorization):
+        return {"headers": [(b"authorization", authorization.encode())], "client": ("10.0.0.1", 1234)}
+    assert client_key(scope(auth_headers("alice")["Authorization"])) == "user:alice"
+    assert client_key(scope("Bearer made-up")) == "address:10.0.0.1"
+    assert client_key({"headers": [], "client": ("10.0.0.1", 1234)}) == "address:10.0.0.1"
+
+def test_bucket_limits_each_client_and_route_separately():
+    limiter = RateLimiter(rate=1, burst=2, route_limits={}, max_buckets=100)
+    assert limiter.check("alice", "GET /members/") == 0
+    assert limiter.check("alice", "GET /members/") == 0
+    assert limiter.check("alice", "GET /members/") > 0
+    assert limiter.check("alice", "GET /feedback/") == 0
+    assert limiter.check("bob", "GET /members/") == 0
+
+def test_route_limit_overrides_default_rate():
+    limiter = RateLimiter(rate=100, burst=100, route_limits={"POST /token": 0.5}, max_buckets=100)
+    assert limiter.check("alice", "POST /token") == 0
+    assert limiter.check("alice", "POST /token") > 0
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_queues_then_sheds():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    assert await limiter.acquire()
+    queued = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    # Queue is full, so the next request is rejected straight away
+    assert not await limiter.acquire()
+    limiter.release()
+    assert await queued
+    # Nobody releases the slot now, so a waiter times out
+    assert not await limiter.acquire()
+    assert limiter.stats() == {"active": 1, "waiting": 0, "queued": 2, "rejected": 1, "timed_out": 1}
+
+@pytest.mark.asyncio
+async def test_gateway_rejects_clients_over_their_rate(gateway, monkeypatch, auth_headers):
+    from app.ratelimit import rate_limiter
+    monkeypatch.setattr(rate_limiter, "route_limits", {"GET /feedback/": 1})
+    headers = auth_headers("ratelimited")
+    statuses = [(await gateway.get("/feedback/", headers=headers)).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = await gateway.get("/feedback/", headers=headers)
+    assert response.json()["error_code"] == 1009
+    assert "retry-after" in response.headers
+
+@pytest.mark.asyncio
+async def test_rotating_fake_tokens_share_one_bucket(gateway, monkeypatch):
+    from app.ratelimit import rate_limiter
+    monkeypatch.setattr(rate_limiter, "route_limits", {"POST /token": 1})
+    statuses = [
+        (await gateway.post(
+            "/token", data={"username": "a", "password": "b"}, headers={"Authorization": f"Bearer fake{i}"}
+        )).status_code
+        for i in range(3)
+    ]
+    assert statuses[-1] == 429
@@ -0,0 +1,80 @@
+import time
+import pytest
+from app.config import settings
+from app.resilience import CircuitBreaker, CircuitState, RetryBudget
+from shared.error_handling import ConnectionError
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("member-service", failure_threshold=2, recovery_timeout=30, half_open_max_calls=1)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(ConnectionError):
+        breaker.before_call()
+
+def test_half_open_trial_closes_or_reopens_circuit():
+    breaker = CircuitBreaker("member-service", failure_threshold=1, recovery_timeout=0.01, half_open_max_calls=1)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    # Only one trial call at a time
+    with pytest.raises(ConnectionError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+
+def test_retry_budget_is_bounded():
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    budget.tokens = 0
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.stats()["exhausted"] == 1
+
+@pytest.mark.asyncio
+async def test_idempotent_reads_are_retried(gateway, stub_upstream, auth_headers):
+    stub_upstream.state.failures = 1
+    response = await gateway.get("/feedback/", headers=auth_headers())
+    assert response.status_code == 200
+    assert stub_upstream.state.calls["GET /feedback/"] == 2
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast(gateway, stub_upstream, monkeypatch, auth_headers):
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 0)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    stub_upstream.state.failures = 100
+    headers = auth_headers()
+    for _ in range(settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        response = await gateway.get("/feedback/", headers=headers)
+        assert response.status_code == 503
+    calls = stub_upstream.state.calls["GET /feedback/"]
+
+    response = await gateway.get("/feedback/", headers=headers)
+    assert response.status_code == 503
+    assert response.json()["error_code"] == 1006
+    assert "retry-after" in response.headers
+    assert stub_upstream.state.calls["GET /feedback/"] == calls
+
+@pytest.mark.asyncio
+async def test_creates_are_retried_only_with_idempotency_key(gateway, stub_upstream, auth_headers):
+    member = {
+        "first_name": "Test", "last_name": "User", "login": "testuser",
+        "email": "test.user@example.com", "password": "testpassword123"
+    }
+    stub_upstream.state.failures = 1
+    response = await gateway.post("/members/", json=member, headers=auth_headers())
+    assert response.status_code == 503
+    assert stub_upstream.state.calls["POST /members/"] == 1
+
+    stub_upstream.state.failures = 1
+    response = await gateway.post("/members/", json=member, headers={**auth_headers(), "Idempotency-Key": "create-1"})
+    assert response.status_code == 201
+    assert stub_upstream.state.calls["POST /members/"] == 3
+    assert stub_upstream.state.last_headers["idempotency-key"] == "create-1"
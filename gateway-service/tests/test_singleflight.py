@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from app.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_flight():
+    group = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "members"
+
+    results = await asyncio.gather(*(group.do("GET /members/", load) for _ in range(10)))
+    assert results == ["members"] * 10
+    assert calls == 1
+    assert group.stats() == {"flights": 1, "coalesced": 9, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    group = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "feedback"
+
+    first = asyncio.ensure_future(group.do("GET /feedback/", load))
+    second = asyncio.ensure_future(group.do("GET /feedback/", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "feedback"
+    assert first.cancelled()
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_remembered():
+    group = SingleFlight()
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        await group.do("GET /members/", fail)
+
+    async def load():
+        return "recovered"
+
+    assert await group.do("GET /members/", load) == "recovered"
+
+@pytest.mark.asyncio
+async def test_gateway_coalesces_identical_reads(gateway, stub_upstream, auth_headers):
+    stub_upstream.state.delay = 0.05
+    headers = auth_headers()
+    responses = await asyncio.gather(*(gateway.get("/feedback/", headers=headers) for _ in range(10)))
+    assert all(response.status_code == 200 for response in responses)
+    assert stub_upstream.state.calls["GET /feedback/"] == 1
+
+@pytest.mark.asyncio
+async def test_large_shared_read_is_not_fetched_again(gateway, stub_upstream, monkeypatch, auth_headers):
+    from app.config import settings
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024)
+    stub_upstream.state.delay = 0.05
+    headers = auth_headers()
+    responses = await asyncio.gather(*(gateway.get("/members/", headers=headers) for _ in range(5)))
+    assert all(len(response.json()) == 5000 for response in responses)
+    # The caller that started the flight streams the response it already opened;
+    # only the callers that joined it ask the upstream again
+    assert stub_upstream.state.calls["GET /members/"] == 5
@@ -0,0 +1,34 @@
+import httpx
+import pytest
+
+@pytest.mark.asyncio
+async def test_lifespan_creates_reuses_and_closes_upstream_clients(stub_upstream, auth_headers, monkeypatch):
+    from app import upstream
+    from app.cache import response_cache
+    from app.main import app
+
+    # Start from no clients, whatever earlier tests left behind
+    await upstream.shutdown()
+    built = []
+    build_client = upstream.build_client
+
+    def counting_build_client(name, transport=None):
+        client = build_client(name, httpx.ASGITransport(app=stub_upstream))
+        built.append(client)
+        return client
+
+    monkeypatch.setattr(upstream, "build_client", counting_build_client)
+    response_cache.clear()
+    async with app.router.lifespan_context(app):
+        assert len(built) == 2
+        assert sorted(upstream._clients) == [upstream.FEEDBACK_SERVICE, upstream.MEMBER_SERVICE]
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            for path in ("/members/", "/feedback/", "/members/", "/feedback/?limit=2"):
+                response = await client.get(path, headers=auth_headers())
+                assert response.status_code == 200
+        # Every request went through the clients built at startup
+        assert len(built) == 2
+        assert stub_upstream.state.calls["GET /members/"] == 1
+        assert stub_upstream.state.calls["GET /feedback/"] == 2
+    assert upstream._clients == {}
+    assert all(client.is_closed for client in built)
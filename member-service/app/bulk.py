@@ -0,0 +1,204 @@
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+from fastapi import Request
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import json
+import logging
+import os
+from shared.database import Database
+from shared.error_handling import RateLimitError, ValidationError
+from . import models, passwords, schemas
+
+logger = logging.getLogger(__name__)
+
+# Rows validated, checked, hashed and inserted together in one transaction
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class InvalidRow:
+    def __init__(self, error: str):
+        self.error = error
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return InvalidRow("Invalid JSON")
+
+
+async def iter_rows(request: Request) -> AsyncIterator[Any]:
+    """Yield the submitted members one by one; NDJSON bodies are parsed as they arrive."""
+    if request.headers.get("content-type", "").startswith(NDJSON_CONTENT_TYPES):
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise ValidationError("Request body must be a JSON array or NDJSON")
+    if not isinstance(rows, list):
+        raise ValidationError("Request body must be a JSON array or NDJSON")
+    for row in rows:
+        yield row
+
+
+class ImportReport:
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self.created = 0
+        self.failed = 0
+
+    def success(self, index: int, member_id: int, login: str):
+        self.created += 1
+        self.results.append({"index": index, "status": "created", "id": member_id, "login": login})
+
+    def failure(self, index: int, error: str, **details):
+        self.failed += 1
+        self.results.append({"index": index, "status": "failed", "error": error, **details})
+
+    def as_dict(self) -> dict:
+        self.results.sort(key=lambda result: result["index"])
+        return {
+            "total": self.created + self.failed,
+            "created": self.created,
+            "failed": self.failed,
+            "results": self.results,
+        }
+
+
+def _validate(row: Any) -> schemas.MemberCreate:
+    if isinstance(row, InvalidRow):
+        raise ValueError(row.error)
+    if not isinstance(row, dict):
+        raise ValueError("Member must be a JSON object")
+    try:
+        return schemas.MemberCreate(**row)
+    except PydanticValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+
+
+def _existing(db: Session, logins: List[str], emails: List[str]) -> Tuple[Set[str], Set[str]]:
+    """Find already registered logins and emails with a single query."""
+    rows = db.execute(
+        select(models.Member.login, models.Member.email)
+        .where(or_(models.Member.login.in_(logins), models.Member.email.in_(emails)))
+    ).all()
+    return {row.login for row in rows}, {row.email for row in rows}
+
+
+def _insert(db: Session, rows: List[dict]) -> Dict[str, int]:
+    """Insert rows with multi-row INSERTs in one transaction; returns ids by login."""
+    result = db.execute(insert(models.Member).returning(models.Member.id, models.Member.login), rows)
+    ids = {row.login: row.id for row in result}
+    db.commit()
+    return ids
+
+
+def _insert_each(db: Session, rows: List[dict]) -> Dict[str, Any]:
+    """Fallback when a concurrent writer took a login or email: insert row by row."""
+    outcomes = {}
+    for row in rows:
+        try:
+            outcomes[row["login"]] = db.execute(
+                insert(models.Member).returning(models.Member.id), row
+            ).scalar_one()
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            outcomes[row["login"]] = e
+    return outcomes
+
+
+async def _import_batch(db: Database, batch: List[Tuple[int, Any]], report: ImportReport,
+                        seen_logins: Set[str], seen_emails: Set[str]):
+    candidates = []
+    for index, row in batch:
+        try:
+            member = _validate(row)
+        except ValueError as e:
+            report.failure(index, str(e))
+            continue
+        if member.login in seen_logins:
+            report.failure(index, "Duplicate login in request", login=member.login)
+        elif member.email in seen_emails:
+            report.failure(index, "Duplicate email in request", email=member.email)
+        else:
+            candidates.append((index, member))
+        seen_logins.add(member.login)
+        seen_emails.add(member.email)
+    if not candidates:
+        return
+
+    existing_logins, existing_emails = await db.run(
+        _existing, [member.login for _, member in candidates], [member.email for _, member in candidates]
+    )
+    new_members = []
+    for index, member in candidates:
+        if member.login in existing_logins:
+            report.failure(index, "Member with this login already exists", login=member.login)
+        elif member.email in existing_emails:
+            report.failure(index, "Member with this email already exists", email=member.email)
+        else:
+            new_members.append((index, member))
+    if not new_members:
+        return
+
+    try:
+        hashed = await passwords.hash_passwords([member.password for _, member in new_members])
+    except RateLimitError as e:
+        for index, member in new_members:
+            report.failure(index, e.message, login=member.login)
+        return
+
+    rows = [
+        {**member.dict(exclude={"password"}), "password": password_hash}
+        for (_, member), password_hash in zip(new_members, hashed)
+    ]
+    try:
+        outcomes = await db.run(_insert, rows)
+    except IntegrityError:
+        await db.run(Session.rollback)
+        logger.warning("Bulk insert hit a constraint violation, retrying the batch row by row")
+        outcomes = await db.run(_insert_each, rows)
+
+    for index, member in new_members:
+        outcome = outcomes.get(member.login)
+        if isinstance(outcome, int):
+            report.success(index, outcome, member.login)
+        else:
+            report.failure(index, "Member with this login or email already exists", login=member.login)
+
+
+async def import_members(db: Database, rows: AsyncIterator[Any]) -> dict:
+    """
+    Import members batch by batch. Each row is reported as created or failed;
+    a failing row never stops the rest of the import.
+    """
+    report = ImportReport()
+    seen_logins: Set[str] = set()
+    seen_emails: Set[str] = set()
+    batch: List[Tuple[int, Any]] = []
+    index = 0
+    async for row in rows:
+        batch.append((index, row))
+        index += 1
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            await _import_batch(db, batch, report, seen_logins, seen_emails)
+            batch = []
+    if batch:
+        await _import_batch(db, batch, report, seen_logins, seen_emails)
+    logger.info(f"Bulk import finished: {report.created} created, {report.failed} failed")
+    return report.as_dict()
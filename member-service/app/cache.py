@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "30"))  # seconds; 0 disables the cache
+MEMBER_CACHE_NEGATIVE_TTL = float(os.getenv("MEMBER_CACHE_NEGATIVE_TTL", "5"))  # seconds an unknown login is remembered
+MEMBER_CACHE_MAX_ENTRIES = int(os.getenv("MEMBER_CACHE_MAX_ENTRIES", "10000"))
+
+# Returned by lookups that found nothing in the cache, as opposed to a cached
+# "no such member" (None)
+MISS = object()
+
+
+def snapshot(member) -> dict:
+    """Plain column values of a Member row, safe to keep after its session is closed."""
+    return {column.key: getattr(member, column.key) for column in member.__table__.columns}
+
+
+class MemberCache:
+    """
+    In-process LRU cache of member rows keyed by id and by login, with a TTL.
+    Logins that do not exist are cached too, for a shorter time. Every write
+    invalidates the affected keys; a read that started before a write cannot
+    store its result afterwards. Only used from the event loop, so no locking.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[Optional[dict], float]]" = OrderedDict()
+        # Bumped on every invalidation
+        self.generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _get(self, key: Tuple[str, Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISS
+        self._entries.move_to_end(key)
+        if entry[0] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry[0]
+
+    def _put(self, key: Tuple[str, Any], value: Optional[dict], ttl: float):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_by_id(self, member_id: int) -> Any:
+        return self._get(("id", member_id)) if self.enabled else MISS
+
+    def get_by_login(self, login: str) -> Any:
+        """The cached member, None for a login known not to exist, or MISS."""
+        return self._get(("login", login)) if self.enabled else MISS
+
+    def put(self, member: dict, generation: int):
+        if not self.enabled or generation != self.generation:
+            return
+        self._put(("id", member["id"]), member, self.ttl)
+        self._put(("login", member["login"]), member, self.ttl)
+        self.stores += 1
+
+    def put_unknown_login(self, login: str, generation: int):
+        if not self.enabled or generation != self.generation:
+            return
+        self._put(("login", login), None, self.negative_ttl)
+        self.stores += 1
+
+    def invalidate(self, member_id: Optional[int] = None, logins: Iterable[str] = ()):
+        self.generation += 1
+        keys = [("login", login) for login in logins]
+        if member_id is not None:
+            keys.append(("id", member_id))
+            # The login may be cached without the id
+            keys.extend(
+                key for key, (member, _) in self._entries.items()
+                if key[0] == "login" and member is not None and member["id"] == member_id
+            )
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        logger.info("Member cache cleared")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+member_cache = MemberCache(
+    ttl=MEMBER_CACHE_TTL,
+    negative_ttl=MEMBER_CACHE_NEGATIVE_TTL,
+    max_entries=MEMBER_CACHE_MAX_ENTRIES,
+)
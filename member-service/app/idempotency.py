@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+import hashlib
+import json
+import logging
+import os
+from shared.error_handling import ErrorCode, ServiceException
+from . import models
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Stored results are replayed for this long, then purged at startup
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _expired(created_at: Optional[datetime]) -> bool:
+    if created_at is None:
+        return False
+    if created_at.tzinfo is None:
+        # SQLite returns the UTC timestamp without a zone
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at < _cutoff()
+
+
+def replay(db: Session, owner: str, key: str, payload_hash: str) -> Optional[JSONResponse]:
+    """Return the stored response for this key, or None when the key is new."""
+    entry = db.get(models.IdempotencyKey, (owner, key))
+    if entry is None:
+        return None
+    if _expired(entry.created_at):
+        # Replaced by the new result when the transaction commits
+        db.delete(entry)
+        return None
+    if entry.request_hash != payload_hash:
+        raise ServiceException(
+            "Idempotency-Key was already used for a different request",
+            ErrorCode.IDEMPOTENCY_KEY_CONFLICT,
+            {"idempotency_key": key}
+        )
+    logger.info(f"Replaying stored response for idempotency key {key}")
+    return JSONResponse(
+        status_code=entry.status_code,
+        content=json.loads(entry.response_body),
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def remember(db: Session, owner: str, key: str, payload_hash: str, status_code: int, body: Any):
+    """Store the response in the caller's transaction, so it commits with the write itself."""
+    db.add(models.IdempotencyKey(
+        owner=owner,
+        key=key,
+        request_hash=payload_hash,
+        status_code=status_code,
+        response_body=json.dumps(body),
+        created_at=datetime.now(timezone.utc),
+    ))
+
+
+def purge_expired(db: Session) -> int:
+    deleted = db.query(models.IdempotencyKey)\
+        .filter(models.IdempotencyKey.created_at < _cutoff())\
+        .delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -1,10 +1,10 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from . import models, schemas, database
 from .database import engine
 import time
-from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.exc import OperationalError, IntegrityError, SQLAlchemyError
 from shared.error_handling import (
     ServiceException,
     ValidationError,
@@ -15,16 +15,27 @@ from shared.error_handling import (
     DatabaseError,
     ErrorCode
 )
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from sqlalchemy import exists, literal, select, true
+from sqlalchemy.dialects import postgresql, sqlite
 from .seed import seed_members
 import logging
+import os
+from urllib.parse import urlencode
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
 from shared.auth import (
     Token, User, create_access_token, verify_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from passlib.context import CryptContext
+from shared.pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from shared.fields import columns, parse_fields, project, projected_response
+from shared.database import Database
+from shared.deadline import DeadlineMiddleware
+from shared import jobs
+from . import passwords, bulk, idempotency, search
+from .cache import MISS, member_cache, snapshot
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,12 +48,26 @@ def init_db():
         try:
             logger.info("Attempting to create database tables...")
             models.Base.metadata.create_all(bind=engine)
+            # create_all skips indexes of tables that already exist
+            for index in models.Member.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
+            search.TRIGRAM_SEARCH = search.create_search_index(engine)
             logger.info("Database tables created successfully")
             
             # Seed the database
             logger.info("Starting database seeding...")
             seed_members()
             logger.info("Database seeding completed")
+
+            db = database.SessionLocal()
+            try:
+                purged = idempotency.purge_expired(db)
+                logger.info(f"Purged {purged} expired idempotency keys")
+                interrupted = jobs.fail_interrupted_jobs(db, models.Job)
+                if interrupted:
+                    logger.warning(f"Marked {interrupted} interrupted jobs as failed")
+            finally:
+                db.close()
             return
         except OperationalError as e:
             if attempt == max_retries - 1:
@@ -55,6 +80,9 @@ def init_db():
 logger.info("Initializing database...")
 init_db()
 logger.info("Database initialization completed")
+if database.DATABASE_ASYNC:
+    # Requests use the async engine; release the sync engine's connections
+    engine.dispose()
 
 app = FastAPI(
     title="Member Service",
@@ -72,6 +100,9 @@ app = FastAPI(
     ]
 )
 
+# Give up on requests the gateway has stopped waiting for
+app.add_middleware(DeadlineMiddleware)
+
 # Configure OAuth2 with password flow
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="token",
@@ -79,136 +110,285 @@ oauth2_scheme = OAuth2PasswordBearer(
     auto_error=True
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@app.on_event("shutdown")
+async def close_database():
+    # Pooled connections (and aiosqlite's worker threads) would outlive the app
+    if database.DATABASE_ASYNC:
+        await database.async_engine.dispose()
+    engine.dispose()
+
+@app.get("/jobs/{job_id}", tags=["jobs"])
+async def get_job(
+    job_id: str,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    return await db.run(_get_job, job_id)
+
+def _get_job(db: Session, job_id: str):
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise NotFoundError(f"Job {job_id} not found", {"service": "member-service"})
+    return jobs.job_status(job)
+
+@app.get("/internal/metrics", tags=["internal"])
+async def get_metrics():
+    return {
+        "database": {name: metrics.stats() for name, metrics in database.pool_metrics.items()},
+        "member_cache": member_cache.stats(),
+    }
+
+# HTTP status returned for each service error code; the others are 400.
+# Saturation is a 429 so the gateway does not count it against the breaker.
+ERROR_STATUS_CODES = {
+    ErrorCode.IDEMPOTENCY_KEY_CONFLICT: status.HTTP_409_CONFLICT,
+    ErrorCode.RATE_LIMIT_ERROR: status.HTTP_429_TOO_MANY_REQUESTS,
+}
 
 @app.exception_handler(ServiceException)
 async def service_exception_handler(request, exc: ServiceException):
+    headers = {}
+    if "retry_after" in exc.details:
+        headers["Retry-After"] = str(max(1, round(exc.details["retry_after"])))
     return JSONResponse(
-        status_code=400,
+        status_code=ERROR_STATUS_CODES.get(exc.error_code, status.HTTP_400_BAD_REQUEST),
         content={
             "error_code": exc.error_code.value if isinstance(exc.error_code, ErrorCode) else exc.error_code,
             "message": exc.message,
             "details": exc.details
-        }
+        },
+        headers=headers
     )
 
 @app.post("/token", response_model=Token, tags=["authentication"])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(database.get_db)
+    db: Database = Depends(database.get_db)
 ):
-    member = db.query(models.Member).filter(models.Member.login == form_data.username, models.Member.is_deleted == False).first()
-    if not member or not pwd_context.verify(form_data.password, member.password):
+    member = await _find_member(db, form_data.username)
+    # bcrypt runs on the password pool, off the event loop
+    if not member or member["is_deleted"] or not await passwords.verify_password(form_data.password, member["password"]):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": member.login}, expires_delta=access_token_expires
+        data={"sub": member["login"]}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+async def _find_member(db: Database, login: str) -> Optional[dict]:
+    """The member with this login, soft deleted or not, through the member cache."""
+    member = member_cache.get_by_login(login)
+    if member is not MISS:
+        return member
+    generation = member_cache.generation
+    member = await db.run(_load_member_by_login, login)
+    if member is None:
+        member_cache.put_unknown_login(login, generation)
+    else:
+        member_cache.put(member, generation)
+    return member
+
+def _load_member_by_login(db: Session, login: str) -> Optional[dict]:
+    member = db.query(models.Member).filter(models.Member.login == login).first()
+    return snapshot(member) if member else None
+
 @app.post("/members/", response_model=schemas.Member, tags=["members"], status_code=201)
-def create_member(
+async def create_member(
     member: schemas.MemberCreate,
-    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_KEY_HEADER, max_length=255),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
-    # Check for duplicate login
-    db_member_by_login = db.query(models.Member).filter(models.Member.login == member.login).first()
-    if db_member_by_login:
+    """
+    Create a member. Requests repeated with the same Idempotency-Key header
+    return the original result instead of a duplicate error.
+    """
+    payload_hash = idempotency.request_hash(member.dict(exclude={"password"}))
+    if idempotency_key:
+        replayed = await db.run(idempotency.replay, token_data.login, idempotency_key, payload_hash)
+        if replayed is not None:
+            return replayed
+    if member_cache.get_by_login(member.login) not in (MISS, None):
+        # Known duplicate: skip the bcrypt hash and the insert
         raise ServiceException(
             "Member with this login already exists",
             ErrorCode.DUPLICATE_DATA_ERROR,
             {"login": member.login}
         )
-
-    # Check for duplicate email
-    db_member_by_email = db.query(models.Member).filter(models.Member.email == member.email).first()
-    if db_member_by_email:
-        raise ServiceException(
-            "Member with this email already exists",
-            ErrorCode.DUPLICATE_DATA_ERROR,
-            {"email": member.email}
-        )
-    
-    db_member = models.Member(
-        first_name=member.first_name,
-        last_name=member.last_name,
-        login=member.login,
-        avatar_url=member.avatar_url,
-        followers=member.followers,
-        following=member.following,
-        title=member.title,
-        email=member.email,
-        password=pwd_context.hash(member.password)
+    hashed_password = await passwords.hash_password(member.password)
+    created = await db.run(
+        _create_member, member, hashed_password, token_data.login, idempotency_key, payload_hash
     )
-    db.add(db_member)
-    try:
-        db.commit()
-        db.refresh(db_member)
-        return db_member
-    except IntegrityError as e:
+    member_cache.invalidate(logins=[member.login])
+    return created
+
+# Fields that can be requested with fields=; the password hash is never one of them
+MEMBER_FIELDS = list(schemas.Member.model_fields)
+FIELDS_QUERY = Query(None, description=f"Comma-separated fields to return, out of: {', '.join(MEMBER_FIELDS)}")
+
+@app.post("/members/bulk", tags=["members"])
+async def bulk_create_members(
+    request: Request,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    """
+    Import many members from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson). Returns a per-row report.
+    """
+    logger.info(f"Bulk member import requested by user: {token_data.login}")
+    report = await bulk.import_members(db, bulk.iter_rows(request))
+    member_cache.invalidate(logins=[result["login"] for result in report["results"] if result["status"] == "created"])
+    return report
+
+def _insert_member(db: Session, values: dict):
+    """
+    Insert the member unless its login or email is taken. Returns the new row
+    (None on conflict) and whether the login and the email were already taken.
+    """
+    table = models.Member.__table__
+    login_taken = exists().where(table.c.login == values["login"])
+    email_taken = exists().where(table.c.email == values["email"])
+    if db.get_bind().dialect.name == "postgresql":
+        # A single round trip: the EXISTS checks see the table as it was
+        # before this statement's own insert
+        inserted = postgresql.insert(table).values(**values)\
+            .on_conflict_do_nothing()\
+            .returning(*table.c)\
+            .cte("inserted")
+        one = select(literal(1).label("one")).subquery("one")
+        row = db.execute(
+            select(*inserted.c, login_taken.label("login_taken"), email_taken.label("email_taken"))
+            .select_from(one.outerjoin(inserted, true()))
+        ).one()
+        return (row if row.id is not None else None), row.login_taken, row.email_taken
+
+    # SQLite cannot put INSERT in a CTE; a conflict costs one more query there
+    row = db.execute(
+        sqlite.insert(table).values(**values).on_conflict_do_nothing().returning(*table.c)
+    ).first()
+    if row is not None:
+        return row, False, False
+    return (None, *db.execute(select(login_taken, email_taken)).one())
+
+def _create_member(db: Session, member: schemas.MemberCreate, hashed_password: str,
+                   owner: str, idempotency_key: Optional[str], payload_hash: str):
+    values = {**member.dict(exclude={"password"}), "password": hashed_password}
+    row, login_taken, email_taken = _insert_member(db, values)
+
+    if row is None:
         db.rollback()
-       
-        if "members_login_key" in str(e):
+        if idempotency_key:
+            # A concurrent retry with the same key may have created the member
+            replayed = idempotency.replay(db, owner, idempotency_key, payload_hash)
+            if replayed is not None:
+                return replayed
+        if login_taken:
             raise ServiceException(
-                "Member with this login already exists (race condition)",
+                "Member with this login already exists",
                 ErrorCode.DUPLICATE_DATA_ERROR,
-                {"login": member.login, "error": str(e)}
+                {"login": member.login}
             )
-        elif "members_email_key" in str(e): 
+        if email_taken:
             raise ServiceException(
-                "Member with this email already exists (race condition)",
+                "Member with this email already exists",
                 ErrorCode.DUPLICATE_DATA_ERROR,
-                {"email": member.email, "error": str(e)}
+                {"email": member.email}
             )
-        else:
-            raise DatabaseError("Failed to create member due to database constraint violation", {"error": str(e)})
+        raise ServiceException(
+            "Member with this login or email already exists",
+            ErrorCode.DUPLICATE_DATA_ERROR,
+            {"login": member.login, "email": member.email}
+        )
+
+    body = jsonable_encoder(schemas.Member.model_validate(dict(row._mapping)))
+    if not idempotency_key:
+        db.commit()
+        return body
+    idempotency.remember(db, owner, idempotency_key, payload_hash, status.HTTP_201_CREATED, body)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key committed first; this one's
+        # member is rolled back with it, and the caller gets that request's result
+        db.rollback()
+        replayed = idempotency.replay(db, owner, idempotency_key, payload_hash)
+        if replayed is not None:
+            return replayed
+        raise ServiceException(
+            "Idempotency-Key is in use by a concurrent request",
+            ErrorCode.IDEMPOTENCY_KEY_CONFLICT,
+            {"idempotency_key": idempotency_key}
+        )
+    return body
 
 @app.get("/members/", response_model=List[schemas.Member], tags=["members"])
-def get_members(
-    db: Session = Depends(database.get_db),
+async def get_members(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    selected = parse_fields(fields, MEMBER_FIELDS)
+    members, next_cursor = await db.run(_get_members, limit, cursor, selected, token_data)
+    headers = {}
+    if next_cursor:
+        link = f"/members/?limit={limit}&cursor={next_cursor}" + (f"&fields={','.join(selected)}" if selected else "")
+        headers = {"X-Next-Cursor": next_cursor, "Link": f'<{link}>; rel="next"'}
+    if selected:
+        return projected_response([project(member, selected) for member in members], headers=headers)
+    response.headers.update(headers)
+    return members
+
+def _get_members(db: Session, limit: int, cursor: Optional[str], selected: Optional[List[str]], token_data: Token):
     try:
         logger.info(f"Getting members for user: {token_data.login}")
-        members = db.query(models.Member)\
-            .filter(models.Member.is_deleted == False)\
-            .order_by(models.Member.created_at.desc())\
-            .all()
-            
-        if not members:
+        query = db.query(models.Member)
+        if selected:
+            # Only the requested columns, plus the ones the page cursor is built from
+            query = query.with_entities(*columns(models.Member, selected, "created_at", "id"))
+        members, next_cursor = keyset_page(
+            query.filter(models.Member.is_deleted == False),
+            models.Member.created_at, models.Member.id, cursor, limit
+        )
+
+        if not members and not cursor:
             raise NoDataFoundError(
                 "No active members found",
                 {"service": "member-service"}
             )
-            
-        return members
+
+        return members, next_cursor
     except Exception as e:
         if isinstance(e, ServiceException):
             raise e
         raise DatabaseError("Failed to fetch members", {"error": str(e)})
 
-@app.delete("/members/", tags=["members"])
-def delete_members(
-    db: Session = Depends(database.get_db),
+@app.delete("/members/", tags=["members"], status_code=202)
+async def delete_members(
+    response: Response,
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    """Soft delete all members in a background job; its progress is at GET /jobs/{job_id}."""
+    job_id = await db.run(_delete_members)
+    jobs.start_soft_delete(database.SessionLocal, models.Job, job_id, models.Member, on_progress=member_cache.clear)
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"message": "Soft delete of all members started", "job_id": job_id, "status": jobs.PENDING}
+
+def _delete_members(db: Session) -> str:
     try:
         # Check if there are any active members to delete
-        active_members = db.query(models.Member)\
-            .filter(models.Member.is_deleted == False)\
-            .count()
-            
-        if active_members == 0:
+        if not db.query(exists().where(models.Member.is_deleted == False)).scalar():
             raise NoDataFoundError(
                 "No active members found to delete",
                 {"service": "member-service"}
             )
-            
-        db.query(models.Member).update({"is_deleted": True})
-        db.commit()
-        return {"message": "All members have been soft deleted"}
+
+        return jobs.create_job(db, models.Job, "delete_members")
     except Exception as e:
         db.rollback()
         if isinstance(e, ServiceException):
@@ -216,11 +396,16 @@ def delete_members(
         raise DatabaseError("Failed to delete members", {"error": str(e)})
 
 @app.delete("/members/{member_id}", tags=["members"])
-def delete_member(
+async def delete_member(
     member_id: int,
-    db: Session = Depends(database.get_db),
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    result = await db.run(_delete_member, member_id)
+    member_cache.invalidate(member_id)
+    return result
+
+def _delete_member(db: Session, member_id: int):
     try:
         logger.info(f"Attempting to delete member with ID: {member_id}")
         # First check if member exists at all
@@ -259,7 +444,12 @@ def delete_member(
         raise DatabaseError("Failed to delete member", {"error": str(e)})
 
 @app.delete("/internal/members/{member_id}/hard", response_model=dict)
-def hard_delete_member(member_id: int, db: Session = Depends(database.get_db)):
+async def hard_delete_member(member_id: int, db: Database = Depends(database.get_db)):
+    result = await db.run(_hard_delete_member, member_id)
+    member_cache.invalidate(member_id)
+    return result
+
+def _hard_delete_member(db: Session, member_id: int):
     member = db.query(models.Member).filter(models.Member.id == member_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
@@ -267,12 +457,117 @@ def hard_delete_member(member_id: int, db: Session = Depends(database.get_db)):
     db.commit()
     return {"message": f"Member with id {member_id} has been hard deleted from the database"}
 
+# Largest number of distinct ids accepted by /members/batch
+MEMBER_BATCH_MAX_IDS = int(os.getenv("MEMBER_BATCH_MAX_IDS", "500"))
+
+# Registered before /members/{member_id}, which would otherwise match "batch"
+@app.get("/members/batch", response_model=schemas.MemberBatch, tags=["members"])
+async def get_members_batch(
+    ids: str = Query(..., description="Comma-separated member ids, e.g. ids=3,1,2"),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    try:
+        member_ids = [int(member_id) for member_id in ids.split(",") if member_id.strip()]
+    except ValueError:
+        raise ValidationError("ids must be a comma-separated list of integers", {"ids": ids})
+    return await _members_batch(db, member_ids, fields)
+
+@app.post("/members/batch", response_model=schemas.MemberBatch, tags=["members"])
+async def post_members_batch(
+    batch: schemas.MemberBatchRequest,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    """Same as GET /members/batch, for id lists too long for a URL."""
+    return await _members_batch(db, batch.ids, fields)
+
+async def _members_batch(db: Database, member_ids: List[int], fields: Optional[str]):
+    """
+    Members in the order their ids were requested, and the ids that do not
+    exist. Ids not in the member cache are loaded with a single IN query.
+    """
+    selected = parse_fields(fields, MEMBER_FIELDS) or MEMBER_FIELDS
+    member_ids = list(dict.fromkeys(member_ids))
+    if not member_ids:
+        raise ValidationError("No member ids given")
+    if len(member_ids) > MEMBER_BATCH_MAX_IDS:
+        raise ValidationError(
+            f"At most {MEMBER_BATCH_MAX_IDS} member ids can be requested at once",
+            {"count": len(member_ids), "max_ids": MEMBER_BATCH_MAX_IDS}
+        )
+
+    found = {}
+    for member_id in member_ids:
+        member = member_cache.get_by_id(member_id)
+        if member is not MISS:
+            found[member_id] = member
+    uncached = [member_id for member_id in member_ids if member_id not in found]
+    if uncached:
+        generation = member_cache.generation
+        try:
+            loaded = await db.run(_load_members, uncached)
+        except SQLAlchemyError as e:
+            raise DatabaseError("Failed to get members", {"error": str(e)})
+        for member in loaded:
+            found[member["id"]] = member
+            member_cache.put(member, generation)
+
+    return projected_response({
+        "members": [project(found[member_id], selected) for member_id in member_ids if member_id in found],
+        "missing": [member_id for member_id in member_ids if member_id not in found],
+    })
+
+def _load_members(db: Session, member_ids: List[int]) -> List[dict]:
+    return [snapshot(member) for member in db.query(models.Member).filter(models.Member.id.in_(member_ids))]
+
+# Registered before /members/{member_id}, which would otherwise match "search"
+@app.get("/members/search", response_model=List[schemas.Member], tags=["members"])
+async def search_members(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix or approximate name, login, title or email"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Database = Depends(database.get_db),
+    token_data: Token = Depends(verify_token)
+):
+    """Search active members, best matches first."""
+    selected = parse_fields(fields, MEMBER_FIELDS)
+    try:
+        members, has_more = await db.run(search.search_members, q, limit, offset, selected)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to search members", {"error": str(e)})
+    headers = {}
+    if has_more:
+        params = {"q": q, "limit": limit, "offset": offset + limit, **({"fields": ",".join(selected)} if selected else {})}
+        headers["Link"] = f'</members/search?{urlencode(params)}>; rel="next"'
+    if selected:
+        return projected_response([project(member, selected) for member in members], headers=headers)
+    response.headers.update(headers)
+    return members
+
 @app.get("/members/{member_id}", response_model=schemas.Member, tags=["members"])
-def get_member(
+async def get_member(
     member_id: int,
-    db: Session = Depends(database.get_db),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Database = Depends(database.get_db),
     token_data: Token = Depends(verify_token)
 ):
+    selected = parse_fields(fields, MEMBER_FIELDS)
+    member = member_cache.get_by_id(member_id)
+    if member is MISS:
+        # The whole row is loaded so that it can be cached for every projection
+        generation = member_cache.generation
+        member = await db.run(_get_member, member_id)
+        member_cache.put(member, generation)
+    if selected:
+        return projected_response(project(member, selected))
+    return member
+
+def _get_member(db: Session, member_id: int):
     try:
         logger.info(f"Attempting to get member with ID: {member_id}")
         member = db.query(models.Member).filter(models.Member.id == member_id).first()
@@ -285,7 +580,7 @@ def get_member(
             )
             
         logger.info(f"Found member with ID {member_id}: {member.login}")
-        return member
+        return snapshot(member)
     except Exception as e:
         logger.error(f"Error getting member with ID {member_id}: {str(e)}")
         if isinstance(e, ServiceException):
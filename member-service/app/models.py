@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, Text, func
+from shared.jobs import JobMixin
 from .database import Base
 
 class Member(Base):
@@ -16,4 +17,23 @@ class Member(Base):
     password = Column(String, nullable=False)
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Serves the keyset pagination of active members, newest first
+        Index("ix_members_active_created_at_id", "is_deleted", created_at.desc(), id.desc()),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped to the caller that sent them
+    owner = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class Job(JobMixin, Base):
+    """Background jobs such as bulk soft deletes, polled through GET /jobs/{id}."""
@@ -0,0 +1,52 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+from passlib.context import CryptContext
+from shared.error_handling import RateLimitError
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in parallel.
+# By default one CPU is left for the event loop and database work.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Hashes allowed to wait for a worker before new ones are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_admission = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING)
+
+
+def _submit(fn, *args) -> Future:
+    if not _admission.acquire(blocking=False):
+        logger.warning("Password hashing pool is saturated, rejecting request")
+        raise RateLimitError("Too many password operations in progress, try again later", {"retry_after": 1})
+    future = _executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _admission.release())
+    return future
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the bounded worker pool without blocking the event loop."""
+    return await asyncio.wrap_future(_submit(pwd_context.hash, password))
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """Check a password against its hash on the bounded worker pool."""
+    return await asyncio.wrap_future(_submit(pwd_context.verify, password, hashed_password))
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash many passwords in parallel, submitting one round per worker at a time
+    so a large import never fills the admission queue on its own.
+    """
+    hashed = []
+    for start in range(0, len(passwords), PASSWORD_HASH_WORKERS):
+        chunk = passwords[start:start + PASSWORD_HASH_WORKERS]
+        hashed += await asyncio.gather(*(hash_password(password) for password in chunk))
+    return hashed
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from shared.validators import InputSanitizer
 
 class MemberBase(BaseModel):
@@ -105,4 +105,11 @@ class Member(MemberBase):
     updated_at: Optional[datetime]
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True 
+
+class MemberBatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, description="Member ids to look up", example=[1, 2, 3])
+
+class MemberBatch(BaseModel):
+    members: List[Member]
+    missing: List[int]
@@ -0,0 +1,94 @@
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import case, func, literal_column, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import logging
+from shared.fields import columns
+from . import models
+
+logger = logging.getLogger(__name__)
+
+member = models.Member
+
+_SPACE = literal_column("' '")
+# Every searchable column of a member as one lower-cased string. The trigram
+# index is built on exactly this expression, so queries must use it unchanged.
+SEARCH_DOCUMENT = func.lower(
+    member.first_name + _SPACE + member.last_name + _SPACE + member.login + _SPACE
+    + func.coalesce(member.title, literal_column("''")) + _SPACE + member.email
+)
+
+SEARCH_COLUMNS = (member.first_name, member.last_name, member.login, member.email, member.title)
+
+# Set by create_search_index(): whether pg_trgm fuzzy matching is available
+TRIGRAM_SEARCH = False
+
+
+def create_search_index(engine) -> bool:
+    """
+    Create the search indexes on PostgreSQL: a pg_trgm GIN index when the
+    extension is available, otherwise text_pattern_ops indexes for prefix
+    matching. Returns whether fuzzy matching is available.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    document = SEARCH_DOCUMENT.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_members_search_trgm ON members USING gin (({document}) gin_trgm_ops)"
+            ))
+        return True
+    except DBAPIError as e:
+        logger.warning(f"pg_trgm is not available, member search falls back to prefix matching: {e}")
+    with engine.begin() as connection:
+        for column in SEARCH_COLUMNS:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_members_{column.key}_prefix ON members (lower({column.key}) text_pattern_ops)"
+            ))
+    return False
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_members(db: Session, q: str, limit: int, offset: int,
+                   selected: Optional[List[str]]) -> Tuple[List[Any], bool]:
+    """
+    Active members matching q, best matches first: exact login, login prefix,
+    name/email/title prefix, then any substring. With pg_trgm, misspelled
+    terms match too and ties are ordered by word similarity. PostgreSQL
+    without pg_trgm matches column prefixes only, so that the prefix indexes
+    are used. Returns one page and whether more results follow.
+    """
+    term = q.strip().lower()
+    prefix = f"{_escape_like(term)}%"
+    any_prefix = or_(*(func.lower(column).like(prefix, escape="\\") for column in SEARCH_COLUMNS))
+    contains = SEARCH_DOCUMENT.like(f"%{_escape_like(term)}%", escape="\\")
+    rank = case(
+        (func.lower(member.login) == term, 4),
+        (func.lower(member.login).like(prefix, escape="\\"), 3),
+        (any_prefix, 2),
+        (contains, 1),
+        else_=0,
+    )
+    match, order = contains, rank.desc()
+    if db.get_bind().dialect.name == "postgresql":
+        if TRIGRAM_SEARCH:
+            # doc %> term: term is similar to some word sequence of doc (GIN-indexable)
+            match = or_(contains, SEARCH_DOCUMENT.op("%>")(term))
+            order = (rank + func.word_similarity(term, SEARCH_DOCUMENT)).desc()
+        else:
+            match = any_prefix
+
+    query = db.query(member)
+    if selected:
+        query = query.with_entities(*columns(member, selected))
+    rows = query.filter(member.is_deleted == False, match)\
+        .order_by(order, member.id.desc())\
+        .offset(offset)\
+        .limit(limit + 1)\
+        .all()
+    return rows[:limit], len(rows) > limit
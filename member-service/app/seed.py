@@ -3,13 +3,11 @@ from .models import Member
 from sqlalchemy.exc import IntegrityError
 from shared.error_handling import DatabaseError
 import logging
-from passlib.context import CryptContext
+from .passwords import pwd_context
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def seed_members():
     logger.info("Starting member seeding process...")
     db = SessionLocal()
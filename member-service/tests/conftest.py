@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+# The database and settings are read when app.main is imported, so provide
+# them up front: every test session gets a fresh SQLite database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'members.db')}")
+os.environ.setdefault("SECRET_KEY", "your-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+# A bcrypt hash of "testpassword123", so rows inserted directly skip the hashing
+PASSWORD_HASH = "$2b$12$wxUcnN6oX8stiaLFvwZUzujcI1It9Szzji1Mj7Qz19dL6VvnDjhO2"
+
+def member_payload(login: str, **overrides) -> dict:
+    payload = {
+        "first_name": "Test",
+        "last_name": "User",
+        "login": login,
+        "email": f"{login}@example.com",
+        "password": "testpassword123",
+        "title": "Developer",
+    }
+    payload.update(overrides)
+    return payload
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Start every test from empty tables and an empty member cache."""
+    # Importing the app creates (and seeds) the tables
+    from app import database, main, models
+    from app.cache import member_cache
+
+    with database.engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    member_cache.clear()
+    yield
+
+@pytest.fixture
+def insert_members():
+    """
+    Insert members straight into the database, each given by its login or a
+    dict of fields including the login; returns their ids in insertion order.
+    """
+    from app import database, models
+
+    def insert_rows(members) -> list:
+        members = [member if isinstance(member, dict) else {"login": member} for member in members]
+        rows = [
+            {**member_payload(member["login"]), **member, "password": PASSWORD_HASH, "is_deleted": False}
+            for member in members
+        ]
+        with database.engine.begin() as connection:
+            connection.execute(insert(models.Member), rows)
+            table = models.Member.__table__
+            return [
+                connection.execute(table.select().where(table.c.login == row["login"])).one().id
+                for row in rows
+            ]
+    return insert_rows
+
+@pytest.fixture
+def auth_headers():
+    """Build headers carrying a valid access token for the given login."""
+    from shared.auth import create_access_token
+
+    def build(login: str = "testuser") -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': login})}"}
+    return build
+
+@pytest_asyncio.fixture
+async def service():
+    """Client for member-service, served in process."""
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://member-service") as client:
+        yield client
@@ -0,0 +1,48 @@
+import json
+import pytest
+from conftest import member_payload
+
+@pytest.mark.asyncio
+async def test_ndjson_import_reports_each_row(service, auth_headers, insert_members):
+    insert_members(["taken"])
+    rows = [
+        json.dumps(member_payload("alice")),
+        json.dumps(member_payload("alice", email="other@example.com")),
+        json.dumps(member_payload("taken", email="new@example.com")),
+        "{not json",
+        json.dumps(member_payload("bob", email="not-an-email")),
+        json.dumps(member_payload("carol")),
+    ]
+    response = await service.post(
+        "/members/bulk",
+        content="\n".join(rows) + "\n",
+        headers={**auth_headers(), "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total"], report["created"], report["failed"]) == (6, 2, 4)
+    results = report["results"]
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["status"] for result in results] == ["created", "failed", "failed", "failed", "failed", "created"]
+    assert results[1]["error"] == "Duplicate login in request"
+    assert results[2]["error"] == "Member with this login already exists"
+    assert results[3]["error"] == "Invalid JSON"
+
+    created = await service.get(f"/members/{results[5]['id']}", headers=auth_headers())
+    assert created.json()["login"] == "carol"
+    login = await service.post("/token", data={"username": "carol", "password": "testpassword123"})
+    assert login.status_code == 200
+
+@pytest.mark.asyncio
+async def test_json_array_import(service, auth_headers):
+    response = await service.post(
+        "/members/bulk", json=[member_payload("alice"), member_payload("bob")], headers=auth_headers()
+    )
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+@pytest.mark.asyncio
+async def test_body_that_is_not_a_list_is_rejected(service, auth_headers):
+    response = await service.post("/members/bulk", json=member_payload("alice"), headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1001
@@ -0,0 +1,46 @@
+import pytest
+from conftest import member_payload
+
+@pytest.mark.asyncio
+async def test_repeated_reads_are_served_from_the_cache(service, auth_headers, insert_members, monkeypatch):
+    from app import main
+    from app.cache import member_cache
+
+    [member_id] = insert_members(["alice"])
+    loads = []
+    get_member = main._get_member
+    monkeypatch.setattr(main, "_get_member", lambda db, member_id: loads.append(member_id) or get_member(db, member_id))
+    hits = member_cache.hits
+    for _ in range(3):
+        response = await service.get(f"/members/{member_id}", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.json()["login"] == "alice"
+    assert loads == [member_id]
+    assert member_cache.hits == hits + 2
+
+@pytest.mark.asyncio
+async def test_delete_invalidates_the_cached_member(service, auth_headers, insert_members):
+    [member_id] = insert_members(["alice"])
+    assert (await service.get(f"/members/{member_id}", headers=auth_headers())).status_code == 200
+    assert (await service.delete(f"/members/{member_id}", headers=auth_headers())).status_code == 200
+    response = await service.get(f"/members/{member_id}", headers=auth_headers())
+    assert response.json()["is_deleted"] is True
+    # The login of a deleted member can no longer log in either
+    login = await service.post("/token", data={"username": "alice", "password": "testpassword123"})
+    assert login.status_code == 400
+
+    assert (await service.delete(f"/internal/members/{member_id}/hard")).status_code == 200
+    response = await service.get(f"/members/{member_id}", headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1002
+
+@pytest.mark.asyncio
+async def test_create_invalidates_a_cached_unknown_login(service, auth_headers):
+    from app.cache import member_cache
+
+    login = await service.post("/token", data={"username": "alice", "password": "testpassword123"})
+    assert login.status_code == 400
+    assert member_cache.get_by_login("alice") is None
+    assert (await service.post("/members/", json=member_payload("alice"), headers=auth_headers())).status_code == 201
+    login = await service.post("/token", data={"username": "alice", "password": "testpassword123"})
+    assert login.status_code == 200
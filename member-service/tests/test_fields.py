@@ -0,0 +1,32 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_list_returns_only_the_requested_fields(service, auth_headers, insert_members):
+    insert_members(["alice", "bob", "carol"])
+    response = await service.get("/members/", params={"fields": "login,id", "limit": 2}, headers=auth_headers())
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [list(member) for member in first_page] == [["login", "id"], ["login", "id"]]
+    # The next page keeps the projection
+    assert "fields=login,id" in response.headers["Link"]
+    response = await service.get(
+        "/members/", params={"fields": "login,id", "cursor": response.headers["X-Next-Cursor"]}, headers=auth_headers()
+    )
+    logins = [member["login"] for member in first_page + response.json()]
+    assert sorted(logins) == ["alice", "bob", "carol"]
+
+@pytest.mark.asyncio
+async def test_single_member_projection(service, auth_headers, insert_members):
+    [member_id] = insert_members(["alice"])
+    response = await service.get(f"/members/{member_id}", params={"fields": "email"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.json() == {"email": "alice@example.com"}
+
+@pytest.mark.asyncio
+async def test_unknown_fields_are_rejected(service, auth_headers, insert_members):
+    [member_id] = insert_members(["alice"])
+    for fields in ("login,password", ""):
+        response = await service.get(f"/members/{member_id}", params={"fields": fields}, headers=auth_headers())
+        assert response.status_code == 400
+        assert response.json()["error_code"] == 1001
+    assert response.json()["details"]["fields"] == []
@@ -0,0 +1,72 @@
+import pytest
+from conftest import member_payload
+
+async def count_members(service, headers) -> int:
+    response = await service.get("/members/", headers=headers)
+    return len(response.json()) if response.status_code == 200 else 0
+
+@pytest.mark.asyncio
+async def test_repeated_key_replays_the_stored_response(service, auth_headers):
+    headers = {**auth_headers(), "Idempotency-Key": "create-alice"}
+    first = await service.post("/members/", json=member_payload("alice"), headers=headers)
+    assert first.status_code == 201
+    second = await service.post("/members/", json=member_payload("alice"), headers=headers)
+    assert second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert await count_members(service, auth_headers()) == 1
+
+@pytest.mark.asyncio
+async def test_key_reused_for_a_different_payload_conflicts(service, auth_headers):
+    headers = {**auth_headers(), "Idempotency-Key": "create-once"}
+    assert (await service.post("/members/", json=member_payload("alice"), headers=headers)).status_code == 201
+    response = await service.post("/members/", json=member_payload("bob"), headers=headers)
+    assert response.status_code == 409
+    assert response.json()["error_code"] == 1010
+    assert await count_members(service, auth_headers()) == 1
+
+@pytest.mark.asyncio
+async def test_duplicate_login_without_a_key_is_rejected(service, auth_headers):
+    assert (await service.post("/members/", json=member_payload("alice"), headers=auth_headers())).status_code == 201
+    response = await service.post("/members/", json=member_payload("alice"), headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1003
+
+def lose_race_to(payload: dict, monkeypatch):
+    """Store a result for the key as a concurrent request would, right after this one looked it up."""
+    from app import database, idempotency, schemas
+    stored_hash = idempotency.request_hash(schemas.MemberCreate(**payload).dict(exclude={"password"}))
+    replay = idempotency.replay
+    raced = []
+
+    def replay_after_race(db, owner, key, payload_hash):
+        if raced:
+            return replay(db, owner, key, payload_hash)
+        raced.append(key)
+        with database.SessionLocal() as other:
+            idempotency.remember(other, owner, key, stored_hash, 201, {"id": -1})
+            other.commit()
+        return None
+
+    monkeypatch.setattr(idempotency, "replay", replay_after_race)
+
+@pytest.mark.asyncio
+async def test_concurrent_request_with_the_same_key_gets_its_result(service, auth_headers, monkeypatch):
+    payload = member_payload("alice")
+    lose_race_to(payload, monkeypatch)
+    response = await service.post("/members/", json=payload, headers={**auth_headers(), "Idempotency-Key": "raced"})
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json() == {"id": -1}
+    # The losing request's member was rolled back
+    assert await count_members(service, auth_headers()) == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_request_with_a_different_payload_conflicts(service, auth_headers, monkeypatch):
+    lose_race_to(member_payload("bob"), monkeypatch)
+    response = await service.post(
+        "/members/", json=member_payload("alice"), headers={**auth_headers(), "Idempotency-Key": "raced"}
+    )
+    assert response.status_code == 409
+    assert response.json()["error_code"] == 1010
+    assert await count_members(service, auth_headers()) == 0
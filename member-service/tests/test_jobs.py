@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+
+async def wait_for_job(service, headers, location: str) -> dict:
+    for _ in range(200):
+        job = (await service.get(location, headers=headers)).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{location} did not finish")
+
+@pytest.mark.asyncio
+async def test_bulk_delete_runs_in_keyset_chunks(service, auth_headers, insert_members, monkeypatch):
+    from shared import jobs
+
+    ids = insert_members([f"member{n}" for n in range(9)])
+    # Leave gaps in the ids and an already deleted member
+    for member_id in ids[2:4]:
+        assert (await service.delete(f"/internal/members/{member_id}/hard")).status_code == 200
+    assert (await service.delete(f"/members/{ids[5]}", headers=auth_headers())).status_code == 200
+
+    monkeypatch.setattr(jobs, "JOB_CHUNK_SIZE", 2)
+    chunks = []
+    soft_delete_chunk = jobs._soft_delete_chunk
+    def counting_chunk(*args):
+        chunks.append(args[-2:])
+        return soft_delete_chunk(*args)
+    monkeypatch.setattr(jobs, "_soft_delete_chunk", counting_chunk)
+
+    response = await service.delete("/members/", headers=auth_headers())
+    assert response.status_code == 202
+    job = await wait_for_job(service, auth_headers(), response.headers["Location"])
+    assert job["status"] == "succeeded"
+    assert job["total"] == job["processed"] == 6
+    assert len(chunks) == 3
+
+    response = await service.get("/members/", headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1005
+
+@pytest.mark.asyncio
+async def test_bulk_delete_without_active_members_is_rejected(service, auth_headers):
+    response = await service.delete("/members/", headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["message"] == "No active members found to delete"
+
+@pytest.mark.asyncio
+async def test_unknown_job(service, auth_headers):
+    response = await service.get("/jobs/does-not-exist", headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1002
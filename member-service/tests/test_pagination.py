@@ -0,0 +1,33 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_member_once(service, auth_headers, insert_members):
+    ids = insert_members([f"member{n}" for n in range(7)])
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = await service.get("/members/", params=params, headers=auth_headers())
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen += [member["id"] for member in page]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        assert 'rel="next"' in response.headers["Link"]
+        params = {"limit": 3, "cursor": response.headers["X-Next-Cursor"]}
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(ids)
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(service, auth_headers, insert_members):
+    insert_members(["alice"])
+    response = await service.get("/members/", params={"cursor": "not-a-cursor"}, headers=auth_headers())
+    assert response.status_code == 400
+    assert response.json()["error_code"] == 1001
+
+@pytest.mark.asyncio
+async def test_page_size_is_bounded(service, auth_headers):
+    from shared.pagination import MAX_PAGE_SIZE
+
+    response = await service.get("/members/", params={"limit": MAX_PAGE_SIZE + 1}, headers=auth_headers())
+    assert response.status_code == 422
@@ -0,0 +1,33 @@
+import threading
+import pytest
+from conftest import member_payload
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_on_the_worker_pool():
+    from app import passwords
+
+    hashed = await passwords.hash_password("s3cret-password")
+    assert hashed != "s3cret-password"
+    assert await passwords.verify_password("s3cret-password", hashed)
+    assert not await passwords.verify_password("wrong-password", hashed)
+    assert len(set(await passwords.hash_passwords(["one", "two", "three"]))) == 3
+
+@pytest.mark.asyncio
+async def test_login_checks_the_password(service, insert_members):
+    insert_members(["alice"])
+    response = await service.post("/token", data={"username": "alice", "password": "testpassword123"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+    response = await service.post("/token", data={"username": "alice", "password": "wrong-password"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_saturated_pool_turns_requests_away(service, auth_headers, monkeypatch):
+    from app import passwords
+
+    monkeypatch.setattr(passwords, "_admission", threading.BoundedSemaphore(1))
+    passwords._admission.acquire()
+    response = await service.post("/members/", json=member_payload("alice"), headers=auth_headers())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["error_code"] == 1009
@@ -0,0 +1,39 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_best_matches_come_first(service, auth_headers, insert_members):
+    insert_members([
+        {"login": "xyz", "title": "Manager of Hannover"},
+        {"login": "zed", "first_name": "Annie"},
+        {"login": "annabel"},
+        {"login": "ann"},
+        {"login": "bob"},
+    ])
+    response = await service.get("/members/search", params={"q": "Ann"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert [member["login"] for member in response.json()] == ["ann", "annabel", "zed", "xyz"]
+
+@pytest.mark.asyncio
+async def test_results_are_paged(service, auth_headers, insert_members):
+    insert_members([f"dev{n}" for n in range(5)])
+    params = {"q": "dev", "limit": 3, "fields": "login"}
+    response = await service.get("/members/search", params=params, headers=auth_headers())
+    first_page = response.json()
+    assert len(first_page) == 3
+    assert response.headers["Link"] == '</members/search?q=dev&limit=3&offset=3&fields=login>; rel="next"'
+    response = await service.get("/members/search", params={**params, "offset": 3}, headers=auth_headers())
+    assert "Link" not in response.headers
+    logins = [member["login"] for member in first_page + response.json()]
+    assert sorted(logins) == [f"dev{n}" for n in range(5)]
+
+@pytest.mark.asyncio
+async def test_wildcards_are_matched_literally(service, auth_headers, insert_members):
+    insert_members(["alice"])
+    response = await service.get("/members/search", params={"q": "%"}, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.json() == []
+
+@pytest.mark.asyncio
+async def test_empty_query_is_rejected(service, auth_headers):
+    response = await service.get("/members/search", params={"q": ""}, headers=auth_headers())
+    assert response.status_code == 422
@@ -1,11 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import HTTPException, Security, Depends
+from fastapi import HTTPException, Request, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from pydantic import BaseModel
+import base64
+import hashlib
+import hmac
 import os
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +18,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")  # Fallback for developm
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Identity asserted by the gateway after it has verified the caller's JWT
+INTERNAL_IDENTITY_HEADER = "X-Internal-Identity"
+INTERNAL_AUTH_SECRET = os.getenv("INTERNAL_AUTH_SECRET") or SECRET_KEY
+INTERNAL_IDENTITY_TTL_SECONDS = int(os.getenv("INTERNAL_IDENTITY_TTL_SECONDS", "60"))
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -25,7 +34,8 @@ class User(BaseModel):
     login: str
     password: str
 
-security = HTTPBearer()
+# Credentials are optional because internal calls authenticate with the identity header
+security = HTTPBearer(auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -38,9 +48,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     logger.info(f"Created access token with data: {to_encode}")
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+def _sign(payload: str) -> str:
+    digest = hmac.new(INTERNAL_AUTH_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def create_internal_identity(login: str) -> str:
+    """Build a short-lived signed assertion of the caller's login for upstream services."""
+    encoded_login = base64.urlsafe_b64encode(login.encode()).rstrip(b"=").decode()
+    payload = f"{encoded_login}.{int(time.time()) + INTERNAL_IDENTITY_TTL_SECONDS}"
+    return f"{payload}.{_sign(payload)}"
+
+def verify_internal_identity(value: str) -> Optional[TokenData]:
+    """Return the asserted identity, or None if the value is malformed, forged or expired."""
+    try:
+        encoded_login, expires, signature = value.split(".")
+        payload = f"{encoded_login}.{expires}"
+        if not hmac.compare_digest(signature, _sign(payload)) or int(expires) < time.time():
+            return None
+        login = base64.urlsafe_b64decode(encoded_login + "=" * (-len(encoded_login) % 4)).decode()
+    except (ValueError, TypeError):
+        return None
+    return TokenData(login=login)
+
+def verify_token(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Security(security)):
+    # Fast path: the gateway already verified the JWT and signed the identity
+    identity_header = request.headers.get(INTERNAL_IDENTITY_HEADER)
+    if identity_header:
+        token_data = verify_internal_identity(identity_header)
+        if token_data is not None:
+            return token_data
+        logger.error("Invalid internal identity assertion")
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    if credentials is None:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    return decode_access_token(credentials.credentials)
+
+def decode_access_token(token: str) -> TokenData:
     try:
-        token = credentials.credentials
         logger.info(f"Verifying token: {token[:10]}...")  # Log first 10 chars of token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         logger.info(f"Token payload: {payload}")
@@ -51,4 +95,34 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
         return TokenData(login=login)
     except JWTError as e:
         logger.error(f"JWT verification failed: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials") 
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+
+def token_subject(token: str) -> Optional[str]:
+    """The login of a valid access token, or None; quiet, for callers that only classify requests."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+# Request state entry holding the outcome of verifying the bearer token
+IDENTITY_STATE_KEY = "identity"
+
+def bearer_identity(scope) -> Optional[TokenData]:
+    """
+    The identity of the request's valid bearer token, or None. The token is
+    verified once per request and the outcome kept in the request state, so
+    every later caller for the same request reuses it.
+    """
+    state = scope.setdefault("state", {})
+    if IDENTITY_STATE_KEY not in state:
+        state[IDENTITY_STATE_KEY] = _verify_bearer(scope)
+    return state[IDENTITY_STATE_KEY]
+
+def _verify_bearer(scope) -> Optional[TokenData]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            login = token_subject(token) if scheme.lower() == "bearer" else None
+            return TokenData(login=login) if login else None
+    return None
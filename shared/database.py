@@ -0,0 +1,197 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Type
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+from starlette.concurrency import run_in_threadpool
+import anyio
+import os
+import time
+
+# Async drivers used when a service runs with DATABASE_ASYNC=true
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver."""
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+# Connection pool settings, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Behind PgBouncer in transaction pooling mode: no client-side pool and no
+# prepared statements that could outlive the server connection
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class PoolMetrics:
+    """Checkout wait times and connection events of one engine's pool."""
+
+    def __init__(self, samples: int = 1024):
+        self.engine = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self._waits: Deque[float] = deque(maxlen=samples)
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        self._waits.append(seconds)
+
+    def listen(self, engine):
+        """Attach to a sync Engine (for an AsyncEngine, pass its sync_engine)."""
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        pool = self.engine.pool if self.engine is not None else None
+        stats = {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_ms_avg": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_ms_p99": round(waits[int(0.99 * (len(waits) - 1))] * 1000, 3) if waits else 0.0,
+            "wait_ms_max": round(self.max_wait * 1000, 3),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(0, pool.overflow()),
+            )
+        return stats
+
+
+def _instrumented(pool_class: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    # Pool.recreate() builds the new pool from self.__class__, so the
+    # instrumentation survives engine.dispose()
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - started)
+
+    InstrumentedPool.__name__ = pool_class.__name__
+    return InstrumentedPool
+
+
+def engine_options(url: str, metrics: PoolMetrics, is_async: bool = False) -> Dict[str, Any]:
+    """create_engine / create_async_engine arguments for the configured pool."""
+    connect_args: Dict[str, Any] = {}
+    if url.startswith("sqlite"):
+        # SQLite connections are shared with the request threadpool
+        connect_args["check_same_thread"] = False
+    if DB_PGBOUNCER:
+        if is_async:
+            connect_args.update(statement_cache_size=0, prepared_statement_cache_size=0)
+        return {"poolclass": _instrumented(NullPool, metrics), "connect_args": connect_args}
+    return {
+        "poolclass": _instrumented(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+class Database(ABC):
+    """
+    A request's database session. CRUD code is written once against a plain
+    sync Session and called with `await db.run(fn, *args)`, which calls
+    fn(session, *args) without blocking the event loop.
+    """
+
+    @abstractmethod
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def stream(self, statement, chunk_size: int) -> AsyncIterator[List[Any]]:
+        """
+        Rows of a Core select in lists of up to chunk_size, read from a
+        server-side cursor so that memory use does not grow with the result.
+        """
+
+
+class ThreadpoolDatabase(Database):
+    """Sync engine: each call takes a Starlette threadpool slot."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def stream(self, statement, chunk_size: int) -> AsyncIterator[List[Any]]:
+        result = await run_in_threadpool(
+            self.session.execute, statement, execution_options={"stream_results": True}
+        )
+        try:
+            partitions = result.partitions(chunk_size)
+            while True:
+                rows = await run_in_threadpool(next, partitions, None)
+                if rows is None:
+                    return
+                yield rows
+        finally:
+            await run_in_threadpool(result.close)
+
+    async def close(self):
+        # Returning the connection must not wait for a threadpool slot: the
+        # slots may all be held by requests waiting for this very connection.
+        await anyio.to_thread.run_sync(self.session.close, limiter=anyio.CapacityLimiter(1))
+
+
+class AsyncDatabase(Database):
+    """
+    Async engine: the ORM code runs on the event loop and awaits the driver
+    wherever it does I/O, so concurrency is not capped by the threadpool.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def stream(self, statement, chunk_size: int) -> AsyncIterator[List[Any]]:
+        result = await self.session.stream(statement)
+        try:
+            async for rows in result.partitions(chunk_size):
+                yield rows
+        finally:
+            await result.close()
@@ -0,0 +1,107 @@
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+import asyncio
+import json
+import logging
+import time
+from .error_handling import ErrorCode
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds the caller (the gateway) is still willing to wait for a response
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+# Monotonic time by which the current request must have started its response
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _timeout_seconds(scope) -> Optional[float]:
+    header = REQUEST_TIMEOUT_HEADER.lower().encode()
+    for name, value in scope.get("headers", []):
+        if name == header:
+            try:
+                return max(0.0, int(value) / 1000)
+            except ValueError:
+                return None
+    return None
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that applies the caller's X-Request-Timeout-Ms budget. A
+    request that has not started its response when the budget runs out is
+    cancelled and answered with 504, since nobody is waiting for it anymore.
+    A response that has started (e.g. a stream) is left to finish. While the
+    deadline holds, database transactions get a matching statement timeout
+    (see apply_statement_timeout), so abandoned queries stop too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        timeout = _timeout_seconds(scope) if scope["type"] == "http" else None
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_started(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                # The body (and any query it runs) may take as long as it needs
+                request_deadline.set(None)
+            await send(message)
+
+        token = request_deadline.set(time.monotonic() + timeout)
+        try:
+            task = asyncio.ensure_future(self.app(scope, receive, send_started))
+        finally:
+            request_deadline.reset(token)
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if done or started:
+            await task
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        logger.warning(f"{scope['method']} {scope['path']} cancelled after its {timeout:.3f}s deadline")
+        body = json.dumps({
+            "error_code": ErrorCode.CONNECTION_ERROR.value,
+            "message": "Request deadline exceeded",
+            "details": {"timeout_ms": int(timeout * 1000)}
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _set_statement_timeout(connection):
+    left = remaining()
+    if left is not None:
+        # 0 would disable the timeout, so an expired deadline still gets 1ms
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(left * 1000))}")
+
+
+def apply_statement_timeout(engine):
+    """
+    Bound every PostgreSQL transaction begun during a request with a deadline
+    by the time left. Attach to a sync Engine (for an AsyncEngine, pass its
+    sync_engine); other databases are left alone.
+    """
+    if engine.dialect.name == "postgresql":
+        event.listen(engine, "begin", _set_statement_timeout)
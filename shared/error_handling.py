@@ -13,6 +13,7 @@ class ErrorCode(Enum):
     AUTHENTICATION_ERROR = 1007
     AUTHORIZATION_ERROR = 1008
     RATE_LIMIT_ERROR = 1009
+    IDEMPOTENCY_KEY_CONFLICT = 1010
 
     # Member service errors (2000-2999)
     MEMBER_NOT_FOUND = 2000
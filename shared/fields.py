@@ -0,0 +1,32 @@
+from typing import Any, List, Optional, Sequence
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+from .error_handling import ValidationError
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """Field names of a `fields=id,login` parameter in request order; None when absent."""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if not names or unknown:
+        raise ValidationError("Unknown fields requested", {"fields": unknown, "allowed": list(allowed)})
+    return names
+
+
+def columns(model, fields: Sequence[str], *required: str) -> list:
+    """Model columns to select: the requested fields plus those the query itself needs."""
+    return [getattr(model, name) for name in dict.fromkeys([*fields, *required])]
+
+
+def project(row: Any, fields: Sequence[str]) -> dict:
+    """The requested fields of a Row object or a dict."""
+    if isinstance(row, dict):
+        return {name: row[name] for name in fields}
+    return {name: getattr(row, name) for name in fields}
+
+
+def projected_response(content: Any, **kwargs) -> JSONResponse:
+    """Serialize projected rows directly, without building ORM objects or Pydantic models."""
+    return JSONResponse(to_jsonable_python(content), **kwargs)
@@ -0,0 +1,143 @@
+from typing import Callable, Optional, Set, Tuple
+from sqlalchemy import Column, DateTime, Integer, String, Text, func
+from sqlalchemy.orm import Session
+import anyio
+import asyncio
+import logging
+import os
+import uuid
+from .deadline import request_deadline
+
+logger = logging.getLogger(__name__)
+
+# Rows soft deleted per transaction
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "1000"))
+# Jobs run on worker threads of their own, never in the request threadpool
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+
+PENDING, RUNNING, SUCCEEDED, FAILED = "pending", "running", "succeeded", "failed"
+
+_job_threads: Optional[anyio.CapacityLimiter] = None
+_running: Set[asyncio.Task] = set()
+
+
+class JobMixin:
+    """Columns of a service's jobs table; each service maps it onto its own Base."""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=PENDING)
+    total = Column(Integer)  # rows to process, counted when the job starts
+    processed = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+
+def job_status(job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def create_job(db: Session, job_model, kind: str) -> str:
+    job = job_model(id=uuid.uuid4().hex, kind=kind, status=PENDING, processed=0)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def fail_interrupted_jobs(db: Session, job_model) -> int:
+    """Mark jobs left unfinished by a previous process as failed; they can simply be started again."""
+    count = db.query(job_model)\
+        .filter(job_model.status.in_([PENDING, RUNNING]))\
+        .update({"status": FAILED, "error": "Interrupted by a service restart", "finished_at": func.now()},
+                synchronize_session=False)
+    db.commit()
+    return count
+
+
+def _start(session_factory, job_model, job_id: str, model) -> Tuple[Optional[int], Optional[int]]:
+    with session_factory() as db:
+        active = model.is_deleted == False
+        low, high, total = db.query(func.min(model.id), func.max(model.id), func.count(model.id)).filter(active).one()
+        db.query(job_model).filter(job_model.id == job_id).update({"status": RUNNING, "total": total})
+        db.commit()
+        return low, high
+
+
+def _soft_delete_chunk(session_factory, job_model, job_id: str, model, after: int, high: int) -> int:
+    """
+    Soft delete the next JOB_CHUNK_SIZE active rows with after < id <= high,
+    and record the progress in the same transaction. Returns the last id
+    covered. The chunk ends at the JOB_CHUNK_SIZE-th active id, found by
+    keyset, so gaps in the ids cost nothing.
+    """
+    with session_factory() as db:
+        remaining = (model.id > after, model.id <= high, model.is_deleted == False)
+        last = db.query(model.id).filter(*remaining).order_by(model.id)\
+            .offset(JOB_CHUNK_SIZE - 1).limit(1).scalar()
+        if last is None:
+            last = high
+        deleted = db.query(model)\
+            .filter(*remaining, model.id <= last)\
+            .update({"is_deleted": True}, synchronize_session=False)
+        db.query(job_model).filter(job_model.id == job_id)\
+            .update({"processed": job_model.processed + deleted}, synchronize_session=False)
+        db.commit()
+        return last
+
+
+def _finish(session_factory, job_model, job_id: str, status: str, error: Optional[str] = None):
+    with session_factory() as db:
+        db.query(job_model).filter(job_model.id == job_id)\
+            .update({"status": status, "error": error, "finished_at": func.now()}, synchronize_session=False)
+        db.commit()
+
+
+async def _run_soft_delete(session_factory, job_model, job_id: str, model, on_progress: Optional[Callable[[], None]]):
+    global _job_threads
+    # Started by a request, but not bound by its deadline
+    request_deadline.set(None)
+    if _job_threads is None:
+        _job_threads = anyio.CapacityLimiter(JOB_WORKERS)
+
+    async def run(fn, *args):
+        return await anyio.to_thread.run_sync(fn, *args, limiter=_job_threads)
+
+    try:
+        low, high = await run(_start, session_factory, job_model, job_id, model)
+        last = None if low is None else low - 1
+        while last is not None and last < high:
+            last = await run(_soft_delete_chunk, session_factory, job_model, job_id, model, last, high)
+            if on_progress:
+                on_progress()
+        await run(_finish, session_factory, job_model, job_id, SUCCEEDED)
+        logger.info(f"Job {job_id} finished")
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        await run(_finish, session_factory, job_model, job_id, FAILED, str(e))
+    finally:
+        if on_progress:
+            on_progress()
+
+
+def start_soft_delete(session_factory, job_model, job_id: str, model,
+                      on_progress: Optional[Callable[[], None]] = None):
+    """
+    Soft delete every row of model that is active when the job starts,
+    JOB_CHUNK_SIZE rows at a time in id order, each chunk in its own short
+    transaction.
+    on_progress is called on the event loop after every chunk.
+    """
+    task = asyncio.ensure_future(_run_soft_delete(session_factory, job_model, job_id, model, on_progress))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
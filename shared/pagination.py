@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import String, literal, tuple_
+import base64
+import json
+from .error_handling import ValidationError
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing just past the row with this (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid pagination cursor", {"cursor": cursor})
+
+
+def created_at_value(query, created_at: datetime):
+    # SQLite keeps CURRENT_TIMESTAMP defaults as UTC text without fractional
+    # seconds, so compare against the same text rather than SQLAlchemy's format
+    if query.session.get_bind().dialect.name == "sqlite":
+        if created_at.tzinfo:
+            created_at = created_at.astimezone(timezone.utc)
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if created_at.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(created_at.strftime(fmt), String)
+    return created_at
+
+
+def keyset_page(query, created_at_column, id_column, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Return one page of query, newest first, starting after cursor, and the
+    cursor of the next page (None on the last page). The row comparison lets
+    an index on (..., created_at DESC, id DESC) seek straight to the page, so
+    deep pages cost the same as the first one. The plain created_at bound
+    repeats part of it so that partitions of later months are pruned, which
+    PostgreSQL does not do from a row comparison.
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        value = created_at_value(query, created_at)
+        query = query.filter(tuple_(created_at_column, id_column) < tuple_(value, id), created_at_column <= value)
+    rows = query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_at_column.key), getattr(last, id_column.key))